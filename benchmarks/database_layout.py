@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : database_layout.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Benchmark of the flattening of the database when entering running mode.
+
+The databases mimic the ones of large hierarchies : groups of entries, each
+group exposing one entry to the root through an access exception. The time
+needed by prepare_for_running is compared between a first run (the layout
+of the flat database is computed) and the following runs of identically
+structured databases (the cached layout is reused).
+
+Run from the root of the repository :
+
+    python benchmarks/database_layout.py
+
+"""
+from timeit import default_timer
+
+from hqc_meas.tasks.tools import task_database
+from hqc_meas.tasks.tools.task_database import TaskDatabase
+
+
+#: Number of entries of the benchmarked databases.
+SIZES = (1000, 10000, 50000)
+
+#: Number of entries in each group.
+GROUP_SIZE = 10
+
+#: Number of runs over which the times are averaged.
+REPEAT = 10
+
+
+def build_database(size):
+    """ Build a database holding about size entries.
+
+    """
+    database = TaskDatabase()
+    for i in range(size // GROUP_SIZE):
+        node = 'root/group{}'.format(i)
+        database.create_node('root', 'group{}'.format(i))
+        for j in range(GROUP_SIZE):
+            database.set_value(node, 'value{}'.format(j), float(j))
+        database.add_access_exception('root', 'value0', node)
+
+    return database
+
+
+def bench_prepare(size, cached):
+    """ Time entering the running mode.
+
+    """
+    total = 0.0
+    for _ in range(REPEAT):
+        if not cached:
+            del task_database._LAYOUTS_CACHE[:]
+        database = build_database(size)
+        tic = default_timer()
+        database.prepare_for_running()
+        total += default_timer() - tic
+
+    return total/REPEAT
+
+
+if __name__ == '__main__':
+    print '{:<10}{:>14}{:>14}{:>12}'.format('Entries', 'computed (ms)',
+                                           'cached (ms)', 'speed-up')
+    for size in SIZES:
+        t_computed = bench_prepare(size, False)
+        t_cached = bench_prepare(size, True)
+        print '{:<10}{:>14.2f}{:>14.2f}{:>12.1f}'.format(
+            size, t_computed*1e3, t_cached*1e3, t_computed/t_cached)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : hierarchy_building.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Benchmark of the building of large task hierarchies.
+
+The hierarchies are made of groups (ComplexTask) of formula tasks declaring
+one database entry each, every group exposing the entry of its first task to
+the root through an access exception. The groups are first built without
+root, the time needed to attach them one at a time to a root task is then
+compared to the time needed to attach them in a batch build. The time
+needed to rebuild the whole hierarchy from its config (which uses a batch
+build) is also reported. The incremental attachment is quadratic and hence
+only timed for the smaller hierarchies.
+
+Run from the root of the repository :
+
+    python benchmarks/hierarchy_building.py
+
+"""
+from copy import deepcopy
+from timeit import default_timer
+
+from hqc_meas.tasks.api import RootTask, ComplexTask
+from hqc_meas.tasks.tasks_util.formula_task import FormulaTask
+
+
+#: Number of tasks of the benchmarked hierarchies.
+SIZES = (1000, 10000)
+
+#: Largest hierarchy for which the incremental attachment is timed.
+MAX_INCREMENTAL = 2000
+
+#: Number of formula tasks in each group.
+GROUP_SIZE = 9
+
+DEPENDENCIES = {'tasks': {'ComplexTask': ComplexTask,
+                          'FormulaTask': FormulaTask}}
+
+
+def build_config(size):
+    """ Build the config of a hierarchy holding about size tasks.
+
+    """
+    config = {}
+    for i in range(size // (GROUP_SIZE + 1)):
+        group = {'task_class': 'ComplexTask',
+                 'task_name': 'group{}'.format(i),
+                 'access_exs': "['g{}_0_value']".format(i)}
+        for j in range(GROUP_SIZE):
+            group['children_task_{}'.format(j)] = {
+                'task_class': 'FormulaTask',
+                'task_name': 'g{}_{}'.format(i, j),
+                'formulas': "[('value', '{}')]".format(j)}
+        config['children_task_{}'.format(i)] = group
+
+    return config
+
+
+def bench_attach(config, batch):
+    """ Time the attachment of the groups to a root task.
+
+    """
+    groups = []
+    i = 0
+    while 'children_task_{}'.format(i) in config:
+        group_config = deepcopy(config['children_task_{}'.format(i)])
+        del group_config['task_class']
+        groups.append(ComplexTask.build_from_config(group_config,
+                                                    DEPENDENCIES))
+        i += 1
+
+    root = RootTask()
+    tic = default_timer()
+    if batch:
+        with root.batch_build():
+            for group in groups:
+                root.children_task.append(group)
+    else:
+        for group in groups:
+            root.children_task.append(group)
+    duration = default_timer() - tic
+
+    assert root.task_database.get_value('root', 'g0_0_value') == 1.0
+    return duration
+
+
+def bench_config(config):
+    """ Time the rebuilding of the hierarchy from its config.
+
+    """
+    tic = default_timer()
+    root = RootTask.build_from_config(deepcopy(config), DEPENDENCIES)
+    duration = default_timer() - tic
+
+    assert root.task_database.get_value('root', 'g0_0_value') == 1.0
+    return duration
+
+
+if __name__ == '__main__':
+    print '{:<10}{:>16}{:>12}{:>12}{:>16}'.format('Tasks', 'incremental (s)',
+                                                 'batch (s)', 'speed-up',
+                                                 'from config (s)')
+    for size in SIZES:
+        config = build_config(size)
+        t_batch = bench_attach(config, True)
+        t_config = bench_config(config)
+        if size <= MAX_INCREMENTAL:
+            t_incr = bench_attach(config, False)
+            incr = '{:.2f}'.format(t_incr)
+            speed_up = '{:.1f}'.format(t_incr/t_batch)
+        else:
+            incr = speed_up = '-'
+        print '{:<10}{:>16}{:>12.2f}{:>12}{:>16.2f}'.format(size, incr,
+                                                           t_batch, speed_up,
+                                                           t_config)
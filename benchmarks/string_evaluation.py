@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : string_evaluation.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Benchmark of the evaluation of the strings used in the tasks.
+
+Compare the previous evaluation (eval of the source string in the module
+namespace for each call) to the restricted compiled functions now cached by
+the tasks, on the strings used in tests/tasks/test_string_ops.py.
+
+Run from the root of the repository :
+
+    python benchmarks/string_evaluation.py
+
+"""
+from timeit import repeat
+
+from hqc_meas.tasks.tools import string_evaluation
+from hqc_meas.tasks.tools.string_evaluation import compile_eval
+
+
+#: Expressions (entries replaced by variables) and the values of the
+#: variables.
+EXPRESSIONS = [('_a0/_a1', {'_a0': 1, '_a1': 10.0}),
+               ('cos(_a0/_a1)', {'_a0': 1, '_a1': 10.0}),
+               ('cm.sqrt(_a0/_a1)', {'_a0': 10.0, '_a1': 10.0}),
+               ('np.abs(_a0)', {'_a0': [1.0, -1.0]}),
+               ('np.abs(_a0)[_a1]', {'_a0': [2.0, -1.0], '_a1': 0}),
+               ('_a0 < 5', {'_a0': 1}),
+               ('2*Pi', {})]
+
+NUMBER = 100000
+
+
+def bench_eval(expr, local_var):
+    """ Time the evaluation of the source string at each call.
+
+    """
+    namespace = vars(string_evaluation)
+    return min(repeat(lambda: eval(expr, namespace, local_var),
+                      number=NUMBER, repeat=3))
+
+
+def bench_compiled(expr, local_var):
+    """ Time the call of the compiled function.
+
+    """
+    names = list(local_var)
+    values = [local_var[n] for n in names]
+    func = compile_eval(expr, names)
+    return min(repeat(lambda: func(*values), number=NUMBER, repeat=3))
+
+
+if __name__ == '__main__':
+    print '{:<20}{:>12}{:>12}{:>10}'.format('Expression', 'eval (us)',
+                                           'compiled', 'speed-up')
+    for expr, local_var in EXPRESSIONS:
+        t_eval = bench_eval(expr, local_var)/NUMBER*1e6
+        t_comp = bench_compiled(expr, local_var)/NUMBER*1e6
+        print '{:<20}{:>12.2f}{:>12.2f}{:>10.1f}'.format(expr, t_eval, t_comp,
+                                                        t_eval/t_comp)
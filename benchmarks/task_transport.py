@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : task_transport.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Benchmark of the hand off of a task hierarchy to the engine subprocess.
+
+The hierarchies are the ones of the hierarchy_building benchmark. The time
+needed to serialize a hierarchy, pickle the result (as the pipe does) and
+rebuild the hierarchy is compared between the config (strings) and binary
+(typed values) transports, along with the size of the pickled data.
+
+Run from the root of the repository :
+
+    python benchmarks/task_transport.py
+
+"""
+import cPickle
+from timeit import default_timer
+
+from hqc_meas.tasks.api import RootTask
+from hqc_meas.tasks.tools.serialization import (task_state, dump_state,
+                                                load_state,
+                                                build_task_from_state)
+
+from hierarchy_building import SIZES, DEPENDENCIES, build_config
+
+
+def bench_config(root):
+    """ Time the transport of a hierarchy through its config.
+
+    """
+    tic = default_timer()
+    root.update_preferences_from_members()
+    data = cPickle.dumps(root.task_preferences, 2)
+    config = cPickle.loads(data)
+    config.pop('task_class')
+    RootTask.build_from_config(config, DEPENDENCIES)
+    return default_timer() - tic, len(data)
+
+
+def bench_binary(root):
+    """ Time the transport of a hierarchy through its binary state.
+
+    """
+    tic = default_timer()
+    data = cPickle.dumps(dump_state(task_state(root)), 2)
+    state = load_state(cPickle.loads(data))
+    build_task_from_state(state, DEPENDENCIES, True)
+    return default_timer() - tic, len(data)
+
+
+if __name__ == '__main__':
+    print '{:<10}{:>12}{:>12}{:>12}{:>14}{:>14}'.format('Tasks', 'config (s)',
+                                                       'binary (s)',
+                                                       'speed-up',
+                                                       'config (kB)',
+                                                       'binary (kB)')
+    for size in SIZES:
+        root = RootTask.build_from_config(build_config(size), DEPENDENCIES)
+        t_config, s_config = bench_config(root)
+        t_binary, s_binary = bench_binary(root)
+        print '{:<10}{:>12.2f}{:>12.2f}{:>12.1f}{:>14.0f}{:>14.0f}'.format(
+            size, t_config, t_binary, t_config/t_binary, s_config/1e3,
+            s_binary/1e3)
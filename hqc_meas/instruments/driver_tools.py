@@ -26,12 +26,17 @@ the VISA library.
     secure_communication :
         decorator making sure that a communication error cannot simply be
         resolved by attempting again to send a message.
+    set_io_listener :
+        function registering a callable notified of the time spent
+        communicating with the instruments.
 
 """
 from textwrap import fill
 from inspect import cleandoc
 import inspect
 from functools import wraps
+from threading import local
+from timeit import default_timer
 
 
 class InstrError(Exception):
@@ -46,6 +51,51 @@ class InstrIOError(InstrError):
     pass
 
 
+#: Callable notified of the duration of each communication with an
+#: instrument, None if no one is listening.
+_IO_LISTENER = None
+
+#: Thread local storage used to avoid timing nested communications twice.
+_IO_STATE = local()
+
+
+def set_io_listener(listener):
+    """ Register a callable notified of the time spent communicating with the
+    instruments.
+
+    The time spent in the non cached gets and in the sets of the instrument
+    properties and in the methods decorated with secure_communication is
+    reported.
+
+    Parameters
+    ----------
+    listener : callable or None
+        Callable taking the duration in seconds as single argument. None
+        disables the timing.
+
+    """
+    global _IO_LISTENER
+    _IO_LISTENER = listener
+
+
+def _timed_io(func, *args, **kwargs):
+    """ Call a function communicating with an instrument and report the time
+    it took to the io listener.
+
+    """
+    listener = _IO_LISTENER
+    if listener is None or getattr(_IO_STATE, 'busy', False):
+        return func(*args, **kwargs)
+
+    _IO_STATE.busy = True
+    tic = default_timer()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _IO_STATE.busy = False
+        listener(default_timer() - tic)
+
+
 class instrument_property(property):
     """Property allowing to cache the result of a get operation and return it
     on the next get. The cache can be cleared.
@@ -70,16 +120,16 @@ class instrument_property(property):
         """
         if obj is not None:
             name = self.name
+            getter = super(instrument_property, self).__get__
             if name in obj._caching_permissions:
                 try:
                     return obj._cache[name]
                 except KeyError:
-                    aux = super(instrument_property, self).__get__(obj,
-                                                                   objtype)
+                    aux = _timed_io(getter, obj, objtype)
                     obj._cache[name] = aux
                     return aux
             else:
-                return super(instrument_property, self).__get__(obj, objtype)
+                return _timed_io(getter, obj, objtype)
 
         else:
             return self
@@ -88,16 +138,17 @@ class instrument_property(property):
         """
         """
         name = self.name
+        setter = super(instrument_property, self).__set__
         if name in obj._caching_permissions:
             try:
                 if obj._cache[name] == value:
                     return
             except KeyError:
                 pass
-            super(instrument_property, self).__set__(obj, value)
+            _timed_io(setter, obj, value)
             obj._cache[name] = value
         else:
-            super(instrument_property, self).__set__(obj, value)
+            _timed_io(setter, obj, value)
 
 
 def secure_communication(max_iter=2):
@@ -119,7 +170,7 @@ def secure_communication(max_iter=2):
             # Try at most `max_iter` times to excute method
             while i < max_iter + 1:
                 try:
-                    return method(self, *args, **kwargs)
+                    return _timed_io(method, self, *args, **kwargs)
 
                 # Catch all the exception specified by the driver
                 except self.secure_com_except as e:
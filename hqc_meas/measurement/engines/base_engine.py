@@ -36,6 +36,11 @@ class BaseEngine(Atom):
     #: infos of the measure being processed.
     measure_status = Tuple()
 
+    #: Whether the next measure should resume from its last checkpoint (if
+    #: any) instead of starting from scratch. Engines not supporting the
+    #: checkpoints can ignore it.
+    resume_from_checkpoint = Bool()
+
     def prepare_to_run(self, name, root, monitored_entries, build_deps):
         """ Make the engine ready to perform a measure.
 
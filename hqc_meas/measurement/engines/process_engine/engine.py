@@ -15,6 +15,7 @@ from threading import Event as tEvent
 import logging
 
 from hqc_meas.utils.log.tools import QueueLoggerThread
+from hqc_meas.tasks.tools.serialization import task_state, dump_state
 
 from ..base_engine import BaseEngine
 from ..tools import ThreadMeasureMonitor
@@ -35,18 +36,19 @@ class ProcessEngine(BaseEngine):
 
         runtime_deps = root.run_time
 
-        # Get ConfigObj describing measure.
-        root.update_preferences_from_members()
-        config = root.task_preferences
+        # Get the binary state describing the measure.
+        state = dump_state(task_state(root))
 
         # Make infos tuple to send to the subprocess.
-        self._temp = (name, config, build_deps, runtime_deps,
-                      monitored_entries)
+        self._temp = (name, state, build_deps, runtime_deps,
+                      monitored_entries, self.resume_from_checkpoint)
+        self.resume_from_checkpoint = False
 
         # Clear all the flags.
         self._meas_pause.clear()
         self._meas_paused.clear()
         self._meas_stop.clear()
+        self._meas_wake.clear()
         self._stop.clear()
         self._force_stop.clear()
         self._stop_requested = False
@@ -60,6 +62,7 @@ class ProcessEngine(BaseEngine):
                                         self._meas_pause,
                                         self._meas_paused,
                                         self._meas_stop,
+                                        self._meas_wake,
                                         self._stop)
             self._process.daemon = True
 
@@ -96,21 +99,25 @@ class ProcessEngine(BaseEngine):
     def pause(self):
         self.measure_status = ('PAUSING', 'Waiting for measure to pause.')
         self._meas_pause.set()
+        self._meas_wake.set()
 
         self._pause_thread = Thread(target=self._wait_for_pause)
         self._pause_thread.start()
 
     def resume(self):
         self._meas_pause.clear()
+        self._meas_wake.set()
         self.measure_status = ('RUNNING', 'Measure have been resumed.')
 
     def stop(self):
         self._stop_requested = True
         self._meas_stop.set()
+        self._meas_wake.set()
 
     def exit(self):
         self._stop_requested = True
         self._meas_stop.set()
+        self._meas_wake.set()
         self._stop.set()
         # Everything else handled by the _com_thread and the process.
 
@@ -157,6 +164,10 @@ class ProcessEngine(BaseEngine):
     #: Interprocess event used to stop the subprocess current measure.
     _meas_stop = Typed(Event, ())
 
+    #: Interprocess event set each time the pause or stop event of the
+    #: current measure is modified, so that the subprocess does not poll them.
+    _meas_wake = Typed(Event, ())
+
     #: Interprocess event used to stop the subprocess.
     _stop = Typed(Event, ())
 
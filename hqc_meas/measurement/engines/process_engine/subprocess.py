@@ -14,7 +14,8 @@ from logging.handlers import RotatingFileHandler
 from multiprocessing import Process
 
 from hqc_meas.utils.log.tools import (StreamToLogRedirector)
-from hqc_meas.tasks.manager.building import build_task_from_config
+from hqc_meas.tasks.tools.serialization import (load_state,
+                                                build_task_from_state)
 from ..tools import MeasureSpy
 
 
@@ -24,13 +25,14 @@ class TaskProcess(Process):
     When started this process sets up a logger redirecting all records to a
     queue. It then redirects stdout and stderr to the logging system. Then as
     long as it is not stopped it waits for the main process to send a
-    measures through the pipe. Upon reception of the `ConfigObj` object
-    describing the measure it rebuilds it, set up a logger for that specific
-    measure and if necessary starts a spy transmitting the value of all
-    monitored entries to the main process. It finally run the checks of the
-    measure and run it. It can be interrupted by setting an event and upon
-    exit close the communication pipe and signal all listeners that it is
-    closing.
+    measures through the pipe. Upon reception of the binary state describing
+    the measure it rebuilds it, set up a logger for that specific measure and
+    if necessary starts a spy transmitting the value of all monitored entries
+    to the main process. It finally run the checks of the
+    measure and run it, after restoring the state saved in the last checkpoint
+    of the measure if it was asked to resume it. It can be interrupted by
+    setting an event and upon exit close the communication pipe and signal
+    all listeners that it is closing.
 
     Parameters
     ----------
@@ -49,6 +51,8 @@ class TaskProcess(Process):
         Event set when the current measure is paused.
     task_stop : multiprocessing event
         Event set when the user asked the running measurement to stop.
+    task_wake : multiprocessing event
+        Event set each time task_pause or task_stop is modified.
     process_stop : multiprocessing event
         Event set when the user asked the process to stop.
 
@@ -66,12 +70,13 @@ class TaskProcess(Process):
     """
 
     def __init__(self, pipe, log_queue, monitor_queue, task_pause, task_paused,
-                 task_stop, process_stop):
+                 task_stop, task_wake, process_stop):
         super(TaskProcess, self).__init__(name='MeasureProcess')
         self.daemon = True
         self.task_pause = task_pause
         self.task_paused = task_paused
         self.task_stop = task_stop
+        self.task_wake = task_wake
         self.process_stop = process_stop
         self.pipe = pipe
         self.log_queue = log_queue
@@ -113,10 +118,11 @@ class TaskProcess(Process):
                     break
 
                 # Get the measure.
-                name, config, build, runtime, mon_entries = self.pipe.recv()
+                (name, state, build, runtime, mon_entries,
+                 resume) = self.pipe.recv()
 
                 # Build it by using the given build dependencies.
-                root = build_task_from_config(config, build, True)
+                root = build_task_from_state(load_state(state), build, True)
 
                 # Give all runtime dependencies to the root task.
                 root.run_time = runtime
@@ -136,13 +142,16 @@ class TaskProcess(Process):
                     self.meas_log_handler.close()
                     self.meas_log_handler = None
 
-                log_path = os.path.join(
-                    root.get_from_database('default_path'),
-                    name + '.log')
-                if os.path.isfile(log_path):
+                default_path = root.get_from_database('default_path')
+                ckpt_path = os.path.join(default_path, name + '.ckpt')
+                resume = resume and os.path.isfile(ckpt_path)
+                # The log of a resumed measure is continued.
+                log_path = os.path.join(default_path, name + '.log')
+                if not resume and os.path.isfile(log_path):
                     os.remove(log_path)
+                log_mode = 'a' if resume else 'w'
                 self.meas_log_handler = RotatingFileHandler(log_path,
-                                                            mode='w',
+                                                            mode=log_mode,
                                                             maxBytes=10**6,
                                                             backupCount=10)
                 aux = '%(asctime)s | %(levelname)s | %(message)s'
@@ -155,6 +164,7 @@ class TaskProcess(Process):
                 root.should_pause = self.task_pause
                 root.paused = self.task_paused
                 root.should_stop = self.task_stop
+                root.wake_up = self.task_wake
                 root.task_database.prepare_for_running()
 
                 # Perform the checks.
@@ -163,7 +173,19 @@ class TaskProcess(Process):
                 # They pass perform the measure.
                 if check:
                     logger.info('Check successful')
+                    root.checkpoint_path = ckpt_path
+                    root.profile_path = os.path.join(default_path,
+                                                     name + '_profile.txt')
+                    root.journal_path = os.path.join(default_path,
+                                                     name + '.journal')
+                    if resume:
+                        root.load_checkpoint()
+                        logger.info('Measure resumed from checkpoint')
                     root.perform_(root)
+                    cache = root.expression_cache
+                    mes = 'Expression cache : {} hits, {} misses, {:.3g} s'
+                    logger.debug(mes.format(cache.hits, cache.misses,
+                                            cache.compile_time))
                     result = ['', '', '']
                     if self.task_stop.is_set():
                         result[0] = 'INTERRUPTED'
@@ -171,6 +193,9 @@ class TaskProcess(Process):
                     else:
                         result[0] = 'COMPLETED'
                         result[2] = 'Measure {} succeeded'.format(name)
+                        # A completed measure must never be resumed.
+                        if os.path.isfile(ckpt_path):
+                            os.remove(ckpt_path)
 
                     if self.process_stop.is_set():
                         result[1] = 'STOPPING'
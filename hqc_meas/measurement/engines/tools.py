@@ -25,6 +25,8 @@ class MeasureSpy(Atom):
         self.queue = queue
         self.observed_entries = set(observed_entries)
         self.observed_database = observed_database
+        # Only the observed entries need to be notified in running mode.
+        self.observed_database.watch_entries(self.observed_entries)
         self.observed_database.observe('notifier', self.enqueue_update)
 
     def enqueue_update(self, change):
@@ -9,6 +9,10 @@ from configobj import ConfigObj
 import logging
 
 from hqc_meas.tasks.api import RootTask
+from hqc_meas.tasks.tools.serialization import (task_state, dump_state,
+                                                load_state, is_serialized,
+                                                build_task_from_state,
+                                                dependencies_config)
 from hqc_meas.utils.configobj_ops import include_configobj
 
 
@@ -53,7 +57,7 @@ class Measure(Atom):
     #: Dict to store useful runtime infos
     store = Dict(Str())
 
-    def save_measure(self, path):
+    def save_measure(self, path, binary=False):
         """ Save the measure as a ConfigObj object.
 
         Parameters
@@ -61,14 +65,23 @@ class Measure(Atom):
         path : unicode
             Path of the file to which save the measure.
 
+        binary : bool, optional
+            Whether to save the measure in the compact binary format of
+            hqc_meas.tasks.tools.serialization rather than as an ini file. The
+            task hierarchy is then saved with its values typed, which is much
+            faster to save and load for large measures.
+
         """
-        config = ConfigObj(indent_type='    ')
-        core = self.plugin.workbench.get_plugin(u'enaml.workbench.core')
-        cmd = u'hqc_meas.task_manager.save_task'
-        config['root_task'] = {}
-        task_prefs = core.invoke_command(cmd, {'task': self.root_task,
-                                               'mode': 'config'}, self)
-        include_configobj(config['root_task'], task_prefs)
+        if binary:
+            config = {'root_task': task_state(self.root_task)}
+        else:
+            config = ConfigObj(indent_type='    ')
+            core = self.plugin.workbench.get_plugin(u'enaml.workbench.core')
+            cmd = u'hqc_meas.task_manager.save_task'
+            config['root_task'] = {}
+            task_prefs = core.invoke_command(cmd, {'task': self.root_task,
+                                                   'mode': 'config'}, self)
+            include_configobj(config['root_task'], task_prefs)
 
         i = 0
         for id, monitor in self.monitors.iteritems():
@@ -82,14 +95,18 @@ class Measure(Atom):
         config['headers'] = repr(self.headers.keys())
         config['name'] = self.name
 
-        with open(path, 'w') as f:
-            config.write(f)
+        if binary:
+            with open(path, 'wb') as f:
+                f.write(dump_state(config))
+        else:
+            with open(path, 'w') as f:
+                config.write(f)
 
         self.path = path
 
     @classmethod
     def load_measure(cls, measure_plugin, path, build_dep=None):
-        """ Build a measure from a ConfigObj file.
+        """ Build a measure from a ConfigObj or binary file.
 
         Parameters
         ----------
@@ -99,20 +116,37 @@ class Measure(Atom):
         path : unicode
             Path of the file from which to load the measure.
 
+        build_dep : dict, optional
+            Build dependencies of the measure, collected if not provided.
+
         """
         logger = logging.getLogger(__name__)
         measure = cls()
-        config = ConfigObj(path)
+        with open(path, 'rb') as f:
+            data = f.read()
+        binary = is_serialized(data)
+        config = load_state(data) if binary else ConfigObj(path)
         measure.name = config['name']
         measure.plugin = measure_plugin
         measure.path = path
 
         workbench = measure_plugin.workbench
         core = workbench.get_plugin(u'enaml.workbench.core')
-        cmd = u'hqc_meas.task_manager.build_root'
-        kwarg = {'mode': 'config', 'config': config['root_task'],
-                 'build_dep': build_dep}
-        measure.root_task = core.invoke_command(cmd, kwarg, measure)
+        if binary:
+            root_state = config['root_task']
+            if build_dep is None:
+                cmd = u'hqc_meas.dependencies.collect_build_dep_from_config'
+                dep_config = dependencies_config(root_state)
+                build_dep = core.invoke_command(cmd, {'config': dep_config},
+                                                measure)
+            if build_dep is not None:
+                measure.root_task = build_task_from_state(root_state,
+                                                          build_dep, True)
+        else:
+            cmd = u'hqc_meas.task_manager.build_root'
+            kwarg = {'mode': 'config', 'config': config['root_task'],
+                     'build_dep': build_dep}
+            measure.root_task = core.invoke_command(cmd, kwarg, measure)
         database = measure.root_task.task_database
         entries = database.list_all_entries(values=True)
 
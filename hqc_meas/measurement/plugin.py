@@ -266,6 +266,7 @@ class MeasurePlugin(HasPrefPlugin):
         engine = self.engine_instance
 
         # Call engine prepare to run method.
+        engine.resume_from_checkpoint = measure.store.pop('resume', False)
         entries = measure.collect_entries_to_observe()
         engine.prepare_to_run(measure.name, measure.root_task, entries,
                               measure.store['build_deps'])
@@ -346,6 +346,22 @@ class MeasureSpace(Workspace):
 
         self.plugin.start_measure(measure)
 
+    def resume_interrupted_measure(self, measure):
+        """ Performs again an interrupted measure from its last checkpoint.
+
+        If no checkpoint was saved the measure is performed from scratch.
+
+        Parameters
+        ----------
+        measure : Measure
+            Interrupted measure to resume.
+
+        """
+        self.reenqueue_measure(measure)
+        measure.infos = 'Measure resumed by the user'
+        measure.store['resume'] = True
+        self.process_single_measure(measure)
+
     def pause_current_measure(self):
         """ Pause the currently active measure.
 
@@ -9,25 +9,155 @@
 from atom.api\
     import (Atom, Str, Int, Instance, Bool, Value, observe, Unicode, List,
             ForwardTyped, Typed, ContainerList, set_default, Callable, Dict,
-            Tuple, Coerced)
+            Tuple, Coerced, Float, Enum)
 
 from configobj import Section, ConfigObj
+from contextlib import contextmanager
 from inspect import cleandoc
 from copy import deepcopy
 import os
 import logging
+from timeit import default_timer
+from weakref import ref
 
 from ..utils.atom_util import member_from_str, tagged_members
 from .tools.task_database import TaskDatabase
 from .tools.task_decorator import (make_parallel, make_wait, make_stoppable,
-                                   smooth_crash)
-from .tools.string_evaluation import safe_eval
+                                   smooth_crash, run_plan, run_graph,
+                                   handle_stop_pause, wait_on_pools)
+from .tools.string_evaluation import (safe_eval, compile_eval,
+                                      vectorize_eval, is_constant,
+                                      CONSTANT_TYPES)
 from .tools.shared_resources import SharedDict, SharedCounter
+from .tools.expression_cache import ExpressionCache, CachedExpression
+from .tools.thread_pools import ThreadPool
+from .tools.task_profiler import TaskProfiler
+from .tools.coroutines import CoroutineScheduler
+from .tools.dependency_graph import build_dependency_graph
+from ..instruments.driver_tools import set_io_listener, InstrIOError
 
 
 PREFIX = '_a'
 
 
+#: Strings already split around the references to database entries. The
+#: cache is bounded as the strings formatted in edition mode or built at
+#: runtime can be arbitrarily many.
+_PARSED_STRINGS = ExpressionCache(size=5000)
+
+
+def _parse_string(string):
+    """ Split a string around the references to database entries.
+
+    Returns
+    -------
+    elements : list(str)
+        Parts of the string, odd elements being the names of the referenced
+        entries. The result is cached and must not be modified.
+
+    """
+    elements = _PARSED_STRINGS.get(string)
+    if elements is None:
+        elements = [el for aux in string.split('{') for el in aux.split('}')]
+        _PARSED_STRINGS.add(string, elements)
+    return elements
+
+
+def _weak_entry(cache, string, entry):
+    """ Build a weak reference to a cached expression which removes itself
+    from the cache of the task once the expression is freed.
+
+    """
+    def remove(entry_ref):
+        if cache.get(string) is entry_ref:
+            cache.pop(string, None)
+
+    return ref(entry, remove)
+
+
+def _iter_strings(value):
+    """ Iterate on the strings held by a preference, including the ones
+    stored in lists and tuples.
+
+    """
+    if isinstance(value, basestring):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for string in _iter_strings(item):
+                yield string
+
+
+def _unique(indexes):
+    """ Remove the duplicates from a list of indexes preserving the order.
+
+    """
+    seen = set()
+    return [i for i in indexes if not (i in seen or seen.add(i))]
+
+
+def _preformat(elements, database_indexes):
+    """ Build the string to format using the values of the database entries.
+
+    Returns
+    -------
+    preformatted : str
+        String whose positional fields match the indexes.
+
+    indexes : list(int)
+        Indexes of the entries whose values must be used for formatting.
+
+    """
+    indexes = _unique(database_indexes.values())
+    positions = {index: str(i) for i, index in enumerate(indexes)}
+    str_to_format = ''
+    length = len(elements)
+    for i in range(0, length, 2):
+        if i + 1 < length:
+            repl = positions[database_indexes[elements[i + 1]]]
+            str_to_format += elements[i] + '{' + repl + '}'
+        else:
+            str_to_format += elements[i]
+
+    return str_to_format, indexes
+
+
+def _compile(string, elements, database_indexes):
+    """ Compile a string referring to database entries into a function.
+
+    Returns
+    -------
+    func : callable
+        Function evaluating the string and taking the values of the entries
+        as positional arguments.
+
+    indexes : list(int)
+        Indexes of the entries whose values the function expects.
+
+    """
+    if len(elements) == 1:
+        func = compile_eval(string)
+        # Fold expressions which do not depend on the database.
+        if is_constant(string):
+            value = func()
+            if isinstance(value, CONSTANT_TYPES):
+                func = lambda: value
+        return func, []
+
+    str_to_eval = ''
+    length = len(elements)
+    for i in range(0, length, 2):
+        if i + 1 < length:
+            repl = PREFIX + str(database_indexes[elements[i + 1]])
+            str_to_eval += elements[i] + repl
+        else:
+            str_to_eval += elements[i]
+
+    indexes = _unique(database_indexes.values())
+    func = compile_eval(str_to_eval, [PREFIX + str(i) for i in indexes])
+    return func, indexes
+
+
 class BaseTask(Atom):
     """Base  class defining common members of all Tasks.
 
@@ -89,6 +219,18 @@ class BaseTask(Atom):
     #: - 'no_wait' : the list should specify which pool not to wait on.
     wait = Dict(Str()).tag(pref=True)
 
+    #: Class attribute specifying if the task can be executed out of order
+    #: when its parent schedules its children according to their
+    #: dependencies.
+    reorderable = True
+
+    #: Class attribute listing the entries (as passed to get_from_database)
+    #: the task reads in addition to the ones referred to in its string
+    #: preferences, None if they are unknown. A task whose reads are unknown
+    #: is executed alone when its parent schedules its children according to
+    #: their dependencies, as it may read any entry from its perform method.
+    database_reads = None
+
     def __init__(self, **kwargs):
         """ Overridden init to make sure perform is wrapped correctly.
 
@@ -140,6 +282,30 @@ class BaseTask(Atom):
         answers.update({k: c(self) for k, c in callables.iteritems()})
         return answers
 
+    def checkpoint_state(self):
+        """ Get the runtime state of the task to save in a checkpoint.
+
+        Tasks whose behaviour depends on the iterations already performed
+        (and not only on the database) should override this method and
+        restore_checkpoint_state.
+
+        Returns
+        -------
+        state : object or None
+            Picklable state passed to restore_checkpoint_state when the
+            measure is resumed, None if there is nothing to save.
+
+        """
+        return None
+
+    def restore_checkpoint_state(self, state):
+        """ Restore the runtime state saved by checkpoint_state.
+
+        Called when a measure is resumed before it is performed.
+
+        """
+        pass
+
     def register_in_database(self):
         """ Method used to create entries in the database.
 
@@ -203,6 +369,35 @@ class BaseTask(Atom):
         """
         return self.task_database.list_accessible_entries(self.task_path)
 
+    def entry_accessor(self, name):
+        """ Get an accessor to one of the database entries of the task.
+
+        This is the fastest way to repeatedly access an entry (in a loop for
+        example) as in running mode the accessor is bound to the entry slot in
+        the flat database.
+
+        Parameters
+        ----------
+        name : str
+            Simple name of the entry, ie no task name required.
+
+        Returns
+        -------
+        accessor : EntryAccessor
+            Accessor whose read and write methods give access to the entry.
+
+        """
+        try:
+            return self._entry_accessors[name]
+        except KeyError:
+            database = self.task_database
+            accessor = database.get_entry_accessor(self.task_path,
+                                                   self.task_name + '_' + name)
+            # Only cache accessors bound to the flat database.
+            if database.running:
+                self._entry_accessors[name] = accessor
+            return accessor
+
     def format_string(self, string):
         """ Replace values in {} by their corresponding database value.
 
@@ -218,47 +413,28 @@ class BaseTask(Atom):
 
         """
         # If a cache evaluation of the string already exists use it.
-        if string in self._format_cache:
-            preformatted, ids = self._format_cache[string]
-            vals = self.task_database.get_values_by_index(ids, PREFIX)
-            return preformatted.format(**vals)
+        entry = self._format_cache.get(string)
+        if entry is not None:
+            entry = entry()
+        if entry is not None:
+            vals = self.task_database.get_values_by_index(entry.indexes)
+            return entry.value.format(*vals)
 
         # Otherwise if we are in running mode build a cache formatting.
         elif self.task_database.running:
-            database = self.task_database
-            aux_strings = string.split('{')
-            if len(aux_strings) > 1:
-                elements = [el
-                            for aux in aux_strings
-                            for el in aux.split('}')]
-                database_indexes = database.get_entries_indexes(self.task_path,
-                                                                elements[1::2])
-                str_to_format = ''
-                length = len(elements)
-                for i in range(0, length, 2):
-                    if i + 1 < length:
-                        repl = PREFIX + str(database_indexes[elements[i + 1]])
-                        str_to_format += elements[i] + '{' + repl + '}'
-                    else:
-                        str_to_format += elements[i]
-
-                indexes = database_indexes.values()
-                self._format_cache[string] = (str_to_format, indexes)
-                vals = self.task_database.get_values_by_index(indexes, PREFIX)
-                return str_to_format.format(**vals)
-            else:
-                self._format_cache[string] = (string, [])
-                return string
+            elements = _parse_string(string)
+            entry = self._cached_expression('format', string, elements)
+            self._format_cache[string] = _weak_entry(self._format_cache,
+                                                     string, entry)
+            vals = self.task_database.get_values_by_index(entry.indexes)
+            return entry.value.format(*vals)
 
         # In edition mode simply perfom the formatting as execution time is not
         # critical.
         else:
             database = self.task_database
-            aux_strings = string.split('{')
-            if len(aux_strings) > 1:
-                elements = [el
-                            for aux in aux_strings
-                            for el in aux.split('}')]
+            elements = _parse_string(string)
+            if len(elements) > 1:
                 replacement_values = [database.get_value(self.task_path, key)
                                       for key in elements[1::2]]
                 str_to_format = ''
@@ -285,48 +461,41 @@ class BaseTask(Atom):
             Formatted version of the input.
 
         """
-        # If a cache evaluation of the string already exists use it.
-        if string in self._eval_cache:
-            preformatted, ids = self._eval_cache[string]
-            vals = self.task_database.get_values_by_index(ids, PREFIX)
-            return safe_eval(preformatted, vals)
-
-        # Otherwise if we are in running mode build a cache evaluation.
+        # If a compiled version of the string already exists use it.
+        entry = self._eval_cache.get(string)
+        if entry is not None:
+            entry = entry()
+        if entry is not None:
+            func, ids = entry.value, entry.indexes
+            # Expressions depending only on the value of a running loop are
+            # evaluated once for the whole sweep.
+            sweeps = self.root_task.sweeps
+            if sweeps and len(ids) == 1 and ids[0] in sweeps:
+                sweep = sweeps[ids[0]]
+                cached = self._sweep_cache.get(string)
+                if cached is None or cached[0] is not sweep:
+                    cached = (sweep, vectorize_eval(func, sweep[0]))
+                    self._sweep_cache[string] = cached
+                if cached[1] is not None:
+                    return cached[1][sweep[1]() - 1]
+            return func(*self.task_database.get_values_by_index(ids))
+
+        # Otherwise if we are in running mode compile the string and cache
+        # the result.
         elif self.task_database.running:
-            database = self.task_database
-            aux_strings = string.split('{')
-            if len(aux_strings) > 1:
-                elements = [el
-                            for aux in aux_strings
-                            for el in aux.split('}')]
-                database_indexes = database.get_entries_indexes(self.task_path,
-                                                                elements[1::2])
-                str_to_eval = ''
-                length = len(elements)
-                for i in range(0, length, 2):
-                    if i + 1 < length:
-                        repl = PREFIX + str(database_indexes[elements[i + 1]])
-                        str_to_eval += elements[i] + repl
-                    else:
-                        str_to_eval += elements[i]
-
-                indexes = database_indexes.values()
-                self._eval_cache[string] = (str_to_eval, indexes)
-                vals = self.task_database.get_values_by_index(indexes, PREFIX)
-                return safe_eval(str_to_eval, vals)
-            else:
-                self._eval_cache[string] = (string, [])
-                return safe_eval(string)
+            elements = _parse_string(string)
+            entry = self._cached_expression('eval', string, elements)
+            self._eval_cache[string] = _weak_entry(self._eval_cache, string,
+                                                   entry)
+            return entry.value(*self.task_database.get_values_by_index(
+                entry.indexes))
 
         # In edition mode simply perfom the evaluation as execution time is not
         # critical.
         else:
             database = self.task_database
-            aux_strings = string.split('{')
-            if len(aux_strings) > 1:
-                elements = [el
-                            for aux in aux_strings
-                            for el in aux.split('}')]
+            elements = _parse_string(string)
+            if len(elements) > 1:
                 replacement_token = [PREFIX + str(i)
                                      for i in xrange(len(elements[1::2]))]
                 repl = {PREFIX + str(i): database.get_value(self.task_path,
@@ -343,15 +512,116 @@ class BaseTask(Atom):
             else:
                 return safe_eval(string)
 
+    def analyse_strings(self):
+        """ Record the database entries referred to by the string members.
+
+        All the preferences of the task (and of its interface if any) holding
+        strings (possibly in lists or tuples) referring to database entries
+        are parsed and the entries, along with the ones listed in
+        database_reads, are recorded as dependencies of the task by the root
+        task. Only available in running mode.
+
+        """
+        objs = [self]
+        interface = getattr(self, 'interface', None)
+        if interface is not None:
+            objs.append(interface)
+
+        database = self.task_database
+        indexes = []
+        entries_lists = [self.database_reads or ()]
+        for obj in objs:
+            for name in tagged_members(obj, 'pref'):
+                for string in _iter_strings(getattr(obj, name)):
+                    if '{' in string:
+                        entries_lists.append(_parse_string(string)[1::2])
+
+        for entries in entries_lists:
+            try:
+                indexes.extend(database.get_entries_indexes(
+                    self.task_path, entries).values())
+            except (KeyError, ValueError):
+                # The string does not refer to database entries.
+                pass
+
+        self.root_task.add_dependencies(self, indexes)
+
     # --- Private API ---------------------------------------------------------
 
-    #: Dictionary storing in infos necessary to perform fast formatting.
-    #: Only used in running mode.
-    _format_cache = Dict()
+    #: Weak references to the preformatted strings of the root task
+    #: expression cache, keyed by source string. Entries discarded by the
+    #: root cache disappear. Only used in running mode.
+    _format_cache = Value(factory=dict)
+
+    #: Weak references to the compiled expressions of the root task
+    #: expression cache, keyed by source string. Entries discarded by the
+    #: root cache disappear. Only used in running mode.
+    _eval_cache = Value(factory=dict)
+
+    #: Results of the expressions evaluated over a whole sweep as tuples
+    #: (sweep, results), results being None if the expression cannot be
+    #: evaluated at once. Only used in running mode.
+    _sweep_cache = Dict()
+
+    #: Accessors to the task own database entries. Only used in running mode.
+    _entry_accessors = Dict()
+
+    #: Accessors to the database entries read by the task. Only used in
+    #: running mode.
+    _read_accessors = Dict()
+
+    def _cached_expression(self, kind, string, elements):
+        """ Get the preformatted or compiled version of a string from the
+        cache of the root task, building it if necessary.
+
+        Parameters
+        ----------
+        kind : {'format', 'eval'}
+            Kind of processing the string should undergo.
+
+        string : str
+            String to process.
+
+        elements : list(str)
+            String split around its references to database entries.
+
+        Returns
+        -------
+        entry : CachedExpression
+            Preformatted string or compiled function along with the indexes of
+            the entries whose values it expects.
+
+        """
+        names = elements[1::2]
+        database_indexes = self.task_database.get_entries_indexes(
+            self.task_path, names)
+        key = (kind, tuple(database_indexes[name] for name in names), string)
+        cache = self.root_task.expression_cache
+        entry = cache.get(key)
+        if entry is None:
+            tic = default_timer()
+            if kind == 'format':
+                entry = _preformat(elements, database_indexes)
+            else:
+                entry = _compile(string, elements, database_indexes)
+            entry = CachedExpression(*entry)
+            cache.add(key, entry, default_timer() - tic)
+
+        self.root_task.add_dependencies(self, entry.indexes)
+        return entry
 
-    #: Dictionary storing in infos necessary to perform fast evaluation.
-    #: Only used in running mode.
-    _eval_cache = Dict()
+    def _read_accessor(self, full_name):
+        """ Get a cached accessor to an entry read by the task.
+
+        """
+        try:
+            return self._read_accessors[full_name]
+        except KeyError:
+            accessor = self.task_database.get_entry_accessor(self.task_path,
+                                                             full_name)
+            self._read_accessors[full_name] = accessor
+            self.root_task.add_dependencies(self, (accessor.index,))
+            return accessor
 
     def _default_task_class(self):
         """ Default value for the task_class member.
@@ -388,11 +658,23 @@ class BaseTask(Atom):
         """
         self._redefine_perform_()
 
+    def _base_perform(self):
+        """ Get the function implementing perform, instrumented if the measure
+        is being profiled.
+
+        """
+        func = self.perform.__func__
+        root = self.root_task
+        if root is not None and root.profiler and root.profiler.running:
+            func = root.profiler.wrap(func,
+                                      self.task_path + '/' + self.task_name)
+        return func
+
     def _redefine_perform_(self):
         """ Make perform_ refects the parallel/wait settings.
 
         """
-        perform_func = self.perform.__func__
+        perform_func = self._base_perform()
         parallel = self.parallel
         if parallel.get('activated') and parallel.get('pool'):
             perform_func = make_parallel(perform_func, parallel['pool'])
@@ -443,6 +725,8 @@ class SimpleTask(BaseTask):
             Value to give to the entry.
 
         """
+        if self.task_database.running:
+            return self.entry_accessor(name).write(value)
         value_name = self.task_name + '_' + name
         return self.task_database.set_value(self.task_path, value_name, value)
 
@@ -457,6 +741,8 @@ class SimpleTask(BaseTask):
             the database.
 
         """
+        if self.task_database.running:
+            return self._read_accessor(full_name).read()
         return self.task_database.get_value(self.task_path, full_name)
 
     def remove_from_database(self, full_name):
@@ -553,6 +839,17 @@ class ComplexTask(BaseTask):
     #: Flag indicating whether or not the task has a root task.
     has_root = Bool(False)
 
+    #: Whether or not to execute the children as soon as the siblings they
+    #: depend on are over rather than sequentially. Dependencies are inferred
+    #: from the database entries the children read and write, and are only
+    #: known in running mode (the children are executed sequentially
+    #: otherwise). The reads are found by parsing the string preferences so
+    #: the children which may read other entries (the tasks whose class does
+    #: not declare its database_reads) are executed alone.
+    auto_parallel = Bool(False).tag(pref=True)
+
+    database_reads = ()
+
     def __init__(self, *args, **kwargs):
         super(ComplexTask, self).__init__(*args, **kwargs)
         self.observe('task_name', self._update_paths)
@@ -560,11 +857,113 @@ class ComplexTask(BaseTask):
         self.observe('task_depth', self._update_paths)
 
     def perform(self):
-        """ Run sequentially all child tasks.
+        """ Run all child tasks, sequentially or as allowed by their
+        dependencies.
+
+        """
+        root = self.root_task
+        if self._graph is not None:
+            graph, barriers = self._graph
+            pool = root.get_pool(self.task_path + '/' + self.task_name)
+            run_graph(root, self._plan, graph, barriers, pool)
+        else:
+            run_plan(root, self.execution_plan())
+
+    def compile_plan(self):
+        """ Flatten the children of the task into an execution plan.
+
+        Children which are plain ComplexTask not executed in parallel and not
+        waiting are replaced by their own children, unless the children of
+        one of the tasks are scheduled according to their dependencies. The
+        wrapping of perform is used only for the tasks executed in parallel or
+        waiting, for the others the check of the stop and pause events is
+        done by run_plan.
+
+        Returns
+        -------
+        plan : tuple
+            Tuple of operations (check, perform, task) where check indicates
+            whether the stop and pause events should be checked before
+            calling perform with the task as single argument.
 
         """
+        plan = []
         for child in self.children_task:
-            child.perform_(child)
+            decorated = ((child.parallel.get('activated') and
+                          child.parallel.get('pool')) or
+                         child.wait.get('activated'))
+            if decorated:
+                plan.append((False, child.perform_, child))
+            elif (type(child) is ComplexTask and not self.auto_parallel and
+                    not child.auto_parallel):
+                plan.extend(child.compile_plan())
+            else:
+                plan.append((child.stoppable, child._base_perform(), child))
+
+        return tuple(plan)
+
+    def compile_graph(self):
+        """ Infer the dependencies between the children of the task.
+
+        A child depends on a previous sibling if it reads a database entry the
+        sibling writes or writes an entry the sibling reads or writes. The
+        entries written by a task are the ones it declares, the ones it reads
+        are the ones recorded by the root task (see analyse_dependencies).
+        Tasks using the same instrument profile are considered as writing the
+        same entry. Children waiting on execution pools or containing a task
+        which cannot be reordered or whose reads are unknown are barriers.
+
+        Returns
+        -------
+        graph : tuple
+            Indexes of the children each child directly depends on.
+
+        barriers : frozenset
+            Indexes of the children which must be executed alone.
+
+        """
+        dependencies = self.root_task.database_dependencies
+        accesses = []
+        for child in self.children_task:
+            reads = set()
+            writes = set()
+            barrier = []
+
+            def gather(obj):
+                if not isinstance(obj, BaseTask):
+                    return
+                name = obj.task_path + '/' + obj.task_name
+                reads.update(dependencies.get(name, ()))
+                writes.update(name + '_' + entry
+                              for entry in obj.task_database_entries)
+                profile = getattr(obj, 'selected_profile', None)
+                if profile:
+                    writes.add('instr:' + profile)
+                if (not obj.reorderable or obj.database_reads is None or
+                        obj.wait.get('activated')):
+                    barrier.append(obj)
+
+            if isinstance(child, ComplexTask):
+                child.walk(callables={'accesses': gather})
+            else:
+                gather(child)
+            accesses.append((reads, writes, bool(barrier)))
+
+        barriers = frozenset(i for i, access in enumerate(accesses)
+                             if access[2])
+        return build_dependency_graph(accesses), barriers
+
+    def execution_plan(self):
+        """ Get the execution plan of the children of the task.
+
+        The plan compiled when the root task started performing is used if it
+        exists, otherwise the perform_ method of each child is used.
+
+        """
+        if self._plan is not None:
+            return self._plan
+        return tuple((False, child.perform_, child)
+                     for child in self.children_task)
 
     def check(self, *args, **kwargs):
         """ Run test of all child tasks.
@@ -633,6 +1032,8 @@ class ComplexTask(BaseTask):
             Value to give to the entry.
 
         """
+        if self.task_database.running:
+            return self.entry_accessor(name).write(value)
         value_name = self.task_name + '_' + name
         return self.task_database.set_value(self.task_path, value_name, value)
 
@@ -647,6 +1048,8 @@ class ComplexTask(BaseTask):
             the database.
 
         """
+        if self.task_database.running:
+            return self._read_accessor(full_name).read()
         return self.task_database.get_value(self.task_path, full_name)
 
     def remove_from_database(self, full_name):
@@ -816,6 +1219,31 @@ class ComplexTask(BaseTask):
                         child.task_preferences = self.task_preferences[name]
                         child.register_preferences()
 
+    @contextmanager
+    def batch_build(self):
+        """ Context manager deferring the registration of the children added
+        to the hierarchy till the context is exited.
+
+        When a child is added to a task having a root, it is registered in the
+        database and the preferences of its parent are rebuilt, which makes
+        building a large hierarchy one task at a time quadratic. Inside this
+        context the registrations are performed in a single pass when the
+        outermost context is exited. It has no effect on a task without root.
+
+        """
+        root = self.root_task
+        if root is None:
+            yield
+            return
+
+        root._batch_depth += 1
+        try:
+            yield
+        finally:
+            root._batch_depth -= 1
+            if not root._batch_depth:
+                root._register_batch()
+
     def update_preferences_from_members(self):
         """ Update the values stored in the preference system.
 
@@ -859,48 +1287,50 @@ class ComplexTask(BaseTask):
 
         """
         task = cls()
-        for name, member in task.members().iteritems():
+        # Children added to a root task are all registered at the end.
+        with task.batch_build():
+            for name, member in task.members().iteritems():
 
-            # First we set the preference members
-            meta = member.metadata
-            if meta and 'pref' in meta:
-                if name not in config:
-                    continue
-
-                # member_from_str handle containers
-                value = config[name]
-                validated = member_from_str(member, value)
+                # First we set the preference members
+                meta = member.metadata
+                if meta and 'pref' in meta:
+                    if name not in config:
+                        continue
 
-                setattr(task, name, validated)
+                    # member_from_str handle containers
+                    value = config[name]
+                    validated = member_from_str(member, value)
+
+                    setattr(task, name, validated)
+
+                # Then we deal with the child tasks
+                elif meta and 'child' in meta:
+                    if isinstance(member, (ContainerList, List)):
+                        i = 0
+                        pref = name + '_{}'
+                        validated = []
+                        while True:
+                            child_name = pref.format(i)
+                            if child_name not in config:
+                                break
+                            child_config = config[child_name]
+                            class_name = child_config.pop('task_class')
+                            child_class = dependencies['tasks'][class_name]
+                            child = child_class.build_from_config(child_config,
+                                                                  dependencies)
+                            validated.append(child)
+                            i += 1
 
-            # Then we deal with the child tasks
-            elif meta and 'child' in meta:
-                if isinstance(member, (ContainerList, List)):
-                    i = 0
-                    pref = name + '_{}'
-                    validated = []
-                    while True:
-                        child_name = pref.format(i)
-                        if child_name not in config:
-                            break
-                        child_config = config[child_name]
+                    else:
+                        if name not in config:
+                            continue
+                        child_config = config[name]
                         child_class_name = child_config.pop('task_class')
                         child_class = dependencies['tasks'][child_class_name]
-                        child = child_class.build_from_config(child_config,
-                                                              dependencies)
-                        validated.append(child)
-                        i += 1
+                        validated = child_class.build_from_config(child_config,
+                                                                  dependencies)
 
-                else:
-                    if name not in config:
-                        continue
-                    child_config = config[name]
-                    child_class_name = child_config.pop('task_class')
-                    child_class = dependencies['tasks'][child_class_name]
-                    validated = child_class.build_from_config(child_config,
-                                                              dependencies)
-
-                setattr(task, name, validated)
+                    setattr(task, name, validated)
 
         return task
 
@@ -917,6 +1347,13 @@ class ComplexTask(BaseTask):
     #: child disabled some access_exs.
     _disabled_exs = List()
 
+    #: Execution plan compiled when the measure starts, None otherwise.
+    _plan = Value()
+
+    #: Dependency graph and barriers of the children compiled when the
+    #: measure starts if auto_parallel is set, None otherwise.
+    _graph = Value()
+
     # @observe('task_name, task_path, task_depth')
     def _update_paths(self, change):
         """Takes care that the paths, the database and the task names remains
@@ -1046,10 +1483,30 @@ class ComplexTask(BaseTask):
         child.root_task = self.root_task
         child.parent_task = self
 
+        if not self.root_task._defer_registration(child):
+            self._register_child(child)
+
+    def _register_child(self, child, database=True, preferences=True):
+        """ Register a newly added child in the database and the preferences.
+
+        Parameters
+        ----------
+        child : BaseTask
+            Child which was added.
+
+        database : bool, optional
+            Whether or not to register the child in the database.
+
+        preferences : bool, optional
+            Whether or not to register anew the preferences of the task.
+
+        """
         # Ask the child to register in database
-        child.register_in_database()
+        if database:
+            child.register_in_database()
         # Register anew preferences to keep the right ordering for the childs
-        self.register_preferences()
+        if preferences:
+            self.register_preferences()
 
         if child is self._last_removed[0]:
             entries = self._last_removed[1]
@@ -1066,6 +1523,11 @@ class ComplexTask(BaseTask):
         """Update the database, depth and preferences when a child is removed.
 
         """
+        # The children added in a batch must be registered before any of them
+        # can be unregistered.
+        if self.root_task._batch_added:
+            self.root_task._register_batch()
+
         # List all the task database entries associated with the child just
         # removed.
         access_obs = False
@@ -1164,6 +1626,8 @@ class ComplexTask(BaseTask):
 
         database = self.task_database
         ex_path = self.task_path
+        # Owners of the entries, built at most once.
+        owners = None
         if added:
             for entry in added:
                 # If a child is provided assume it is the one declaring the
@@ -1179,20 +1643,15 @@ class ComplexTask(BaseTask):
                 # Find the child declaring the entry to determine if the
                 # entry is an access exception.
                 else:
-                    for child in self._gather_children_task():
-                        entries = [child.task_name + '_' + e
-                                   for e in child.task_database_entries]
-                        if entry in entries:
-                            database.add_access_exception(ex_path,
-                                                          entry,
-                                                          child.task_path)
-
-                        elif hasattr(child, 'access_exs') and\
-                                entry in child.access_exs:
-                            database.add_access_exception(ex_path,
-                                                          entry,
-                                                          child.task_path)
-                            child.observe('access_exs',
+                    if owners is None:
+                        owners = self._entries_owners()
+                    if entry in owners:
+                        owner, exposed = owners[entry]
+                        database.add_access_exception(ex_path,
+                                                      entry,
+                                                      owner.task_path)
+                        if exposed:
+                            owner.observe('access_exs',
                                           self._child_access_exs_changed)
 
         else:
@@ -1216,20 +1675,35 @@ class ComplexTask(BaseTask):
                 # Find the child declaring the entry to determine if the
                 # entry is an access exception.
                 else:
-                    for child in self._gather_children_task():
-                        entries = [child.task_name + '_' + e
-                                   for e in child.task_database_entries]
-                        if entry in entries:
-                            database.remove_access_exception(ex_path,
-                                                             entry)
-
-                        elif hasattr(child, 'access_exs') and\
-                                entry in child.access_exs:
-                            database.remove_access_exception(ex_path,
-                                                             entry)
-                            child.unobserve('access_exs',
+                    if owners is None:
+                        owners = self._entries_owners()
+                    if entry in owners:
+                        owner, exposed = owners[entry]
+                        database.remove_access_exception(ex_path,
+                                                         entry)
+                        if exposed:
+                            owner.unobserve('access_exs',
                                             self._child_access_exs_changed)
 
+    def _entries_owners(self):
+        """ Map the entries declared or exposed by the children to them.
+
+        Returns
+        -------
+        owners : dict
+            Dict mapping the full names of the entries to a tuple (child,
+            exposed) where exposed indicates whether the child exposes the
+            entry through an access exception rather than declaring it.
+
+        """
+        owners = {}
+        for child in reversed(self._gather_children_task()):
+            for entry in getattr(child, 'access_exs', ()):
+                owners[entry] = (child, True)
+            for entry in child.task_database_entries:
+                owners[child.task_name + '_' + entry] = (child, False)
+        return owners
+
     def _child_access_exs_changed(self, change):
         """ Observer connected to ComplexTask children to watch their
         access_exs.
@@ -1281,6 +1755,7 @@ class ComplexTask(BaseTask):
 
 from multiprocessing.synchronize import Event
 from threading import Event as tEvent
+from threading import Lock, Condition, Thread
 
 
 class RootTask(ComplexTask):
@@ -1310,13 +1785,40 @@ class RootTask(ComplexTask):
     #: Inter-process event signaling the task is paused.
     paused = Instance(Event)
 
-    #: Inter-Thread event signaling the main thread is done, handling the
-    #: measure resuming.
+    #: Inter-process event set whenever should_stop or should_pause is
+    #: modified, so that the measure can react without polling them. If it is
+    #: not provided the events are polled every poll_interval seconds by a
+    #: single thread.
+    wake_up = Instance(Event)
+
+    #: Time in seconds between two checks of the stop and pause events when
+    #: no wake up event is provided.
+    poll_interval = Float(0.05)
+
+    #: Current execution state of the measure. 'IDLE' outside perform,
+    #: 'PAUSING' when a pause was requested but some threads are still
+    #: working, 'PAUSED' once all threads are paused.
+    execution_state = Enum('IDLE', 'RUNNING', 'PAUSING', 'PAUSED',
+                           'STOPPING')
+
+    #: Inter-Thread event signaling the instruments have been re-initialized
+    #: after a pause and that the measure is resuming.
     resume = Value()
 
-    #: Dict like object used to store references to all running threads.
-    #: Keys are pools ids, values list of threads. Keys are never deleted.
-    threads = Typed(SharedDict, (list,))
+    #: Dict like object holding the thread pools executing the parallel
+    #: tasks. Keys are pools ids, values ThreadPool. Keys are never deleted.
+    threads = Typed(SharedDict, ())
+
+    #: Maximal number of worker threads of each execution pool.
+    pool_workers = Int(8).tag(pref=True)
+
+    #: Whether or not the parallel tasks implementing perform_async should be
+    #: executed as coroutines by a single scheduler thread, so that their
+    #: waits overlap without occupying the workers of the pools.
+    cooperative = Bool(False).tag(pref=True)
+
+    #: Scheduler executing the coroutines of the parallel tasks.
+    scheduler = Typed(CoroutineScheduler)
 
     #: Dict like object used to store references to used instruments.
     #: Keys are instrument profile names, values instr instance. Keys are never
@@ -1334,6 +1836,49 @@ class RootTask(ComplexTask):
     #: Counter keeping track of the paused threads.
     paused_threads_counter = Typed(SharedCounter, ())
 
+    #: Minimal time in seconds between two checkpoints of the measure. Zero
+    #: disables the checkpoints.
+    checkpoint_interval = Float(0.0).tag(pref=True)
+
+    #: Path of the file in which the checkpoints are written. Checkpoints are
+    #: saved only if this is set (usually by the engine).
+    checkpoint_path = Unicode()
+
+    #: Full paths of the database entries read by each task, keyed by the
+    #: full name (path and name) of the tasks. Filled in running mode.
+    database_dependencies = Dict()
+
+    #: Cache of the preformatted and compiled strings shared by all the tasks.
+    expression_cache = Typed(ExpressionCache, ())
+
+    #: Whether or not to record the time spent in each task during the
+    #: measure.
+    profiling = Bool(False).tag(pref=True)
+
+    #: Path of the file in which the profiling report is written at the end
+    #: of the measure. If empty the report is logged.
+    profile_path = Unicode()
+
+    #: Whether or not to record all the writes to the database in a journal
+    #: during the measure.
+    journal = Bool(False).tag(pref=True)
+
+    #: Path of the journal file. The journal is written only if this is set
+    #: (usually by the engine).
+    journal_path = Unicode()
+
+    #: Profiler of the last profiled measure.
+    profiler = Typed(TaskProfiler)
+
+    #: Maximal time in seconds allowed to connect to the instruments when
+    #: testing them during the checks.
+    instr_test_timeout = Float(10.0).tag(pref=True)
+
+    #: Sweeps performed by the running loops, keyed by the index of the loop
+    #: value entry in the flat database. Values are tuples (values, callable
+    #: returning the loop index).
+    sweeps = Dict()
+
     # Setting default values for the root task.
     has_root = set_default(True)
     task_name = set_default('Root')
@@ -1358,7 +1903,14 @@ class RootTask(ComplexTask):
             traceback[self.task_path + '/' + self.task_name] =\
                 'The provided default path is not a valid directory'
         self.task_database.set_value('root', 'default_path', self.default_path)
-        check = super(RootTask, self).check(*args, **kwargs)
+        if self.task_database.running:
+            self.analyse_dependencies()
+        if kwargs.get('test_instr'):
+            self.check_instruments()
+        try:
+            check = super(RootTask, self).check(*args, **kwargs)
+        finally:
+            self.release_checked_instruments()
         test = test and check[0]
         traceback.update(check[1])
         return test, traceback
@@ -1368,25 +1920,49 @@ class RootTask(ComplexTask):
         """ Run sequentially all child tasks, and close ressources.
 
         """
+        self._next_checkpoint = default_timer() + self.checkpoint_interval
+        if self.journal and self.journal_path:
+            self.task_database.start_journal(self.journal_path)
+        self._start_watcher()
+        if self.profiling:
+            self._start_profiling()
         try:
-            for child in self.children_task:
-                child.perform_(child)
+            # Create the pools used by the parallel tasks.
+            def create_pool(obj):
+                if isinstance(obj, BaseTask):
+                    parallel = obj.parallel
+                    if parallel.get('activated') and parallel.get('pool'):
+                        self.get_pool(parallel['pool'])
+
+            self.walk(callables={'pool': create_pool})
+            self._compile_plans()
+
+            super(RootTask, self).perform()
         except Exception:
             log = logging.getLogger(__name__)
             mes = 'The following unhandled exception occured:'
             log.exception(mes)
-            self.should_stop.set()
+            self.request_stop()
         finally:
-            # Wait for all threads to terminate.
-            for pool_name in self.threads:
-                with self.threads.safe_access(pool_name) as pool:
-                    for thread in pool:
-                        try:
-                            thread.join()
-                        except Exception:
-                            log = logging.getLogger(__name__)
-                            mes = 'Failed to close join thread:'
-                            log.exception(mes)
+            # Wait for all works to complete and stop the workers.
+            for pool_name in list(self.threads):
+                try:
+                    self.threads[pool_name].shutdown()
+                except Exception:
+                    log = logging.getLogger(__name__)
+                    mes = 'Failed to shut down thread pool:'
+                    log.exception(mes)
+
+            # The works of the pools may have scheduled coroutines so the
+            # scheduler is stopped last.
+            if self.scheduler:
+                self.scheduler.shutdown()
+                self.scheduler = None
+
+            self._stop_watcher()
+            if self.profiler and self.profiler.running:
+                self._stop_profiling()
+            self._compile_plans(clear=True)
 
             # Close connection to all instruments.
             instrs = self.instrs
@@ -1408,6 +1984,377 @@ class RootTask(ComplexTask):
                     mes = 'Failed to close file handler:'
                     log.exception(mes)
 
+            # Close the database journal if one was started.
+            try:
+                self.task_database.stop_journal()
+            except Exception:
+                log = logging.getLogger(__name__)
+                mes = 'Failed to close database journal:'
+                log.exception(mes)
+
+    def request_stop(self):
+        """ Ask the measure to stop.
+
+        This sets the should_stop event and immediately wakes up the paused
+        threads. Tasks should use it rather than setting should_stop
+        directly.
+
+        """
+        self.should_stop.set()
+        with self._state_cond:
+            if self.execution_state != 'IDLE':
+                self._set_state('STOPPING')
+        if self.wake_up is not None:
+            self.wake_up.set()
+
+    def wait_for_resume(self):
+        """ Block the calling thread while the measure is paused.
+
+        Returns
+        -------
+        stop : bool
+            Whether or not the measure should stop.
+
+        """
+        cond = self._state_cond
+        with cond:
+            if self.execution_state not in ('PAUSING', 'PAUSED'):
+                return self.execution_state == 'STOPPING'
+
+            self.paused_threads_counter.increment()
+            try:
+                while self.execution_state in ('PAUSING', 'PAUSED'):
+                    cond.wait()
+            finally:
+                self.paused_threads_counter.decrement()
+
+            return self.execution_state == 'STOPPING'
+
+    def checkpoint(self):
+        """ Save a checkpoint if the checkpoint interval is elapsed.
+
+        This is called by the loops at the beginning of each iteration and is
+        cheap when no checkpoint is due. Before saving, the works submitted to
+        the execution pools used by the bodies of the running loops are waited
+        for, so that the parallel tasks of the previous iteration are not
+        caught while writing.
+
+        """
+        interval = self.checkpoint_interval
+        if not interval or not self.checkpoint_path:
+            return
+        now = default_timer()
+        if now < self._next_checkpoint:
+            return
+        # Another thread is already saving a checkpoint.
+        if not self._checkpoint_lock.acquire(False):
+            return
+        try:
+            self._next_checkpoint = now + interval
+            pools = set()
+            for loop_infos in self._active_loops.values():
+                pools.update(loop_infos[2])
+            if pools:
+                wait_on_pools(self, pools.__contains__)
+                if self.execution_state == 'STOPPING':
+                    return
+            self.save_checkpoint()
+        except Exception:
+            log = logging.getLogger(__name__)
+            mes = 'Failed to save checkpoint:'
+            log.exception(mes)
+        finally:
+            self._checkpoint_lock.release()
+
+    def save_checkpoint(self):
+        """ Save the database, the positions of the running loops and the
+        runtime states of the tasks.
+
+        The current iteration of each running loop is recorded so that, when
+        resuming, it is performed again from its start.
+
+        """
+        database = self.task_database
+        positions = {}
+        for key, (path, name, _) in self._active_loops.items():
+            positions[key] = database.get_value(path, name + '_index')
+
+        states = {}
+
+        # The callables are also called on the interfaces.
+        def get_state(task):
+            if isinstance(task, BaseTask):
+                state = task.checkpoint_state()
+                if state is not None:
+                    key = task.task_path + '/' + task.task_name
+                    states[key] = state
+
+        self.walk(callables={'state': get_state})
+        database.save_checkpoint(self.checkpoint_path,
+                                 {'loops': positions, 'tasks': states})
+
+    def load_checkpoint(self):
+        """ Restore the database, the loops positions and the tasks states
+        from the checkpoint.
+
+        Must be called after the database entered the running mode and before
+        the measure is performed.
+
+        """
+        infos = self.task_database.load_checkpoint(self.checkpoint_path)
+        self._resume_positions = infos['loops'] if infos else {}
+        states = infos.get('tasks', {}) if infos else {}
+
+        def restore_state(task):
+            if isinstance(task, BaseTask):
+                key = task.task_path + '/' + task.task_name
+                if key in states:
+                    task.restore_checkpoint_state(states[key])
+
+        self.walk(callables={'state': restore_state})
+
+    def enter_loop(self, loop):
+        """ Signal that a loop is starting.
+
+        Parameters
+        ----------
+        loop : ComplexTask
+            Loop task which is starting. It must have an 'index' entry in the
+            database holding the number of the current iteration (starting at
+            1).
+
+        Returns
+        -------
+        skipped : int
+            Number of iterations the loop should skip because they were
+            already performed before the checkpoint from which the measure is
+            resumed.
+
+        """
+        key = loop.task_path + '/' + loop.task_name
+        pools = set()
+        if self.checkpoint_interval and self.checkpoint_path:
+            # Execution pools used by the body of the loop, waited for before
+            # saving a checkpoint.
+            def collect_pool(obj):
+                if isinstance(obj, BaseTask) and obj is not loop:
+                    parallel = obj.parallel
+                    if parallel.get('activated') and parallel.get('pool'):
+                        pools.add(parallel['pool'])
+
+            loop.walk(callables={'pool': collect_pool})
+        self._active_loops[key] = (loop.task_path, loop.task_name, pools)
+        if key in self._resume_positions:
+            return max(self._resume_positions.pop(key) - 1, 0)
+        return 0
+
+    def exit_loop(self, loop):
+        """ Signal that a loop is over.
+
+        """
+        key = loop.task_path + '/' + loop.task_name
+        self._active_loops.pop(key, None)
+
+    def add_dependencies(self, task, indexes):
+        """ Record that a task reads some database entries.
+
+        Parameters
+        ----------
+        task : BaseTask
+            Task reading the entries.
+
+        indexes : iterable(int)
+            Indexes of the entries in the flat database.
+
+        """
+        key = task.task_path + '/' + task.task_name
+        paths = self.task_database.get_paths_by_index(indexes)
+        self.database_dependencies.setdefault(key, set()).update(paths)
+
+    def get_pool(self, name):
+        """ Get the thread pool executing the works of an execution pool.
+
+        The pool is created if it does not exist yet or was shut down.
+
+        Parameters
+        ----------
+        name : str
+            Id of the execution pool.
+
+        Returns
+        -------
+        pool : ThreadPool
+            Pool of worker threads associated with the id.
+
+        """
+        pools = self.threads
+        with pools.locked():
+            if name not in pools or pools[name].closed:
+                pools[name] = ThreadPool(name=name,
+                                         max_workers=self.pool_workers,
+                                         active_counter=
+                                         self.active_threads_counter)
+            return pools[name]
+
+    def get_scheduler(self):
+        """ Get the scheduler executing the coroutines, creating it if
+        necessary.
+
+        """
+        with self.threads.locked():
+            if self.scheduler is None:
+                def stop_check():
+                    return handle_stop_pause(self)
+
+                self.scheduler = CoroutineScheduler(
+                    stop_check=stop_check,
+                    error_handler=lambda e: self.request_stop(),
+                    active_counter=self.active_threads_counter)
+            return self.scheduler
+
+    def check_instruments(self):
+        """ Test the connection to the instruments used by the hierarchy.
+
+        Each profile is tested once, the different profiles being tested
+        concurrently. The connections are kept open till
+        release_checked_instruments is called so that the tasks can query the
+        instruments during the checks (see checked_instrument). A connection
+        which cannot be established within instr_test_timeout is considered
+        as failed.
+
+        """
+        profiles = self.run_time.get('profiles', {})
+        drivers = self.run_time.get('drivers', {})
+        used = {}
+
+        def collect(obj):
+            profile = getattr(obj, 'selected_profile', None)
+            driver = getattr(obj, 'selected_driver', None)
+            if profile in profiles and driver in drivers:
+                used.setdefault(profile, set()).add(driver)
+
+        self.walk(callables={'instrs': collect})
+        if not used:
+            return
+
+        results = self._checked_instrs
+        lock = Lock()
+        abandoned = []
+
+        def connect(profile, names):
+            for name in sorted(names):
+                try:
+                    result = drivers[name](profiles[profile])
+                except Exception as e:
+                    result = e
+                with lock:
+                    if not abandoned:
+                        results[(profile, name)] = result
+                    elif not isinstance(result, Exception):
+                        result.close_connection()
+
+        pool = ThreadPool(name='instr_checks', max_workers=len(used))
+        futures = [pool.submit(connect, profile, names)
+                   for profile, names in used.iteritems()]
+        end = default_timer() + self.instr_test_timeout
+        for future in futures:
+            future.wait(max(end - default_timer(), 0))
+        pool.shutdown(wait=False)
+
+        with lock:
+            abandoned.append(True)
+            for profile, names in used.iteritems():
+                for name in names:
+                    if (profile, name) not in results:
+                        mes = 'Connection to {} timed out'.format(profile)
+                        logging.getLogger(__name__).warn(mes)
+                        results[(profile, name)] = InstrIOError(mes)
+
+    def checked_instrument(self, profile, driver):
+        """ Access an instrument connected by check_instruments.
+
+        Parameters
+        ----------
+        profile : str
+            Name of the instrument profile.
+
+        driver : str
+            Name of the driver.
+
+        Returns
+        -------
+        instr : BaseInstrument or None
+            Driver connected to the instrument, None if the connection was not
+            tested.
+
+        Raises
+        ------
+        InstrIOError :
+            If the connection failed or timed out.
+
+        """
+        result = self._checked_instrs.get((profile, driver))
+        if isinstance(result, InstrIOError):
+            raise result
+        elif isinstance(result, Exception):
+            raise InstrIOError(str(result))
+        return result
+
+    def release_checked_instruments(self):
+        """ Close the connections opened by check_instruments.
+
+        """
+        for result in self._checked_instrs.values():
+            if not isinstance(result, Exception):
+                try:
+                    result.close_connection()
+                except Exception:
+                    log = logging.getLogger(__name__)
+                    mes = 'Failed to close connection to instr:'
+                    log.exception(mes)
+        self._checked_instrs = {}
+
+    def analyse_dependencies(self):
+        """ Record the dependencies of all the tasks of the hierarchy.
+
+        The string members of all tasks are parsed, so that the dependencies
+        are known before the measure is performed. Only available in running
+        mode.
+
+        """
+        # Interfaces are also called by walk but are handled by their task.
+        def analyse(obj):
+            if isinstance(obj, BaseTask):
+                obj.analyse_strings()
+
+        self.walk(callables={'dependencies': analyse})
+
+    def register_sweep(self, loop, values):
+        """ Declare the values a loop is going to write in its value entry.
+
+        This allows the expressions depending only on the loop value to be
+        evaluated once for all the points.
+
+        Parameters
+        ----------
+        loop : ComplexTask
+            Loop task which is starting. It must have an 'index' entry in the
+            database holding the number of the current iteration (starting at
+            1) and a 'value' entry holding the current value.
+
+        values : iterable
+            Values the loop will iterate on.
+
+        """
+        index = loop.entry_accessor('value').index
+        self.sweeps[index] = (values, loop.entry_accessor('index').read)
+
+    def unregister_sweep(self, loop):
+        """ Signal that a loop stopped writing the values of its sweep.
+
+        """
+        self.sweeps.pop(loop.entry_accessor('value').index, None)
+
     def register_in_database(self):
         """ Create a node in the database and register all entries.
 
@@ -1439,6 +2386,40 @@ class RootTask(ComplexTask):
 
     # --- Private API ---------------------------------------------------------
 
+    #: Time after which the next checkpoint should be saved.
+    _next_checkpoint = Float()
+
+    #: Lock preventing two threads from saving a checkpoint at the same time.
+    _checkpoint_lock = Value(factory=Lock)
+
+    #: Condition protecting the execution state and on which the paused
+    #: threads wait.
+    _state_cond = Value(factory=Condition)
+
+    #: Thread translating the stop and pause events into execution states.
+    _watcher = Typed(Thread)
+
+    #: Event signaling the watcher it should exit.
+    _watcher_done = Value(factory=tEvent)
+
+    #: Running loops keyed by their full name, values are (task_path,
+    #: task_name, pools used by the body) tuples.
+    _active_loops = Dict()
+
+    #: Iterations at which the loops should resume, keyed by the loops full
+    #: names. Each position is discarded once used.
+    _resume_positions = Dict()
+
+    #: Number of nested batch_build contexts being executed.
+    _batch_depth = Int()
+
+    #: Children added in a batch build whose registration is deferred.
+    _batch_added = List()
+
+    #: Outcome of the connection tests keyed by (profile, driver), values are
+    #: connected drivers or the exception raised when connecting.
+    _checked_instrs = Dict()
+
     # Overrided here to give the child its root task right away.
     def _child_added(self, child):
         # Give the child all the info it needs to register
@@ -1451,10 +2432,59 @@ class RootTask(ComplexTask):
         child.parent_task = self
         child.root_task = self.root_task
 
-        # Ask the child to register in database
-        child.register_in_database()
-        # Register anew preferences to keep the right ordering for the childs
-        self.register_preferences()
+        if not self._defer_registration(child):
+            self._register_child(child)
+
+    def _defer_registration(self, child):
+        """ Record a child added during a batch build.
+
+        Returns
+        -------
+        deferred : bool
+            Whether or not the registration of the child is deferred.
+
+        """
+        if not self._batch_depth:
+            return False
+        self._batch_added.append(child)
+        return True
+
+    def _register_batch(self):
+        """ Register the children added during a batch build.
+
+        The children already registered along with one of their ancestors are
+        not registered again in the database and the preferences are rebuilt
+        only by the outermost tasks whose children changed.
+
+        """
+        added = self._batch_added
+        self._batch_added = []
+        added_set = set(added)
+        parents = []
+        for child in added:
+            parent = child.parent_task
+            covered = self._has_ancestor_in(parent, added_set)
+            parent._register_child(child, database=not covered,
+                                   preferences=False)
+            if parent not in parents:
+                parents.append(parent)
+
+        parents_set = set(parents)
+        for parent in parents:
+            if (parent is self or
+                    not self._has_ancestor_in(parent.parent_task,
+                                              parents_set)):
+                parent.register_preferences()
+
+    def _has_ancestor_in(self, task, tasks):
+        """ Whether a task or one of its ancestors belongs to a set of tasks.
+
+        """
+        while task not in tasks:
+            if task is self:
+                return False
+            task = task.parent_task
+        return True
 
     def _default_task_class(self):
         return ComplexTask.__name__
@@ -1476,17 +2506,164 @@ class RootTask(ComplexTask):
 
     @observe('active_threads_counter.count', 'paused_threads_counter.count')
     def _state(self, change):
-        """
+        """ Signal the measure is paused once all active threads are.
 
         """
         p_count = self.paused_threads_counter.count
         a_count = self.active_threads_counter.count
         if a_count == p_count:
-            self.paused.set()
+            with self._state_cond:
+                if self.execution_state == 'PAUSING':
+                    self._set_state('PAUSED')
+                paused = self.execution_state == 'PAUSED'
+            # The counts are also equal when the only active thread waits on
+            # the others while the measure runs.
+            if paused:
+                self.paused.set()
 
         if p_count == 0:
             self.paused.clear()
 
+    def _set_state(self, state):
+        """ Update the execution state and wake up the paused threads.
+
+        Must be called with the state condition held.
+
+        """
+        old = self.execution_state
+        if state == old:
+            return
+
+        if state == 'PAUSING':
+            self.resume.clear()
+        elif state == 'RUNNING' and old in ('PAUSING', 'PAUSED'):
+            # Prevent some issues if a stupid user changes a value on an
+            # instr previously set by a task.
+            instrs = self.instrs
+            for instr_id in instrs:
+                instrs[instr_id].owner = ''
+                instrs[instr_id].clear_cache()
+            self.resume.set()
+
+        self.execution_state = state
+        self._state_cond.notify_all()
+
+    def _sync_state(self):
+        """ Update the execution state from the stop and pause events.
+
+        """
+        with self._state_cond:
+            state = self.execution_state
+            if state in ('IDLE', 'STOPPING'):
+                return
+
+            if self.should_stop.is_set():
+                self._set_state('STOPPING')
+            elif self.should_pause.is_set():
+                if state == 'RUNNING':
+                    self._set_state('PAUSING')
+            else:
+                self._set_state('RUNNING')
+
+    def _start_profiling(self):
+        """ Instrument the perform methods of all the tasks.
+
+        """
+        self.profiler = TaskProfiler()
+        self.profiler.start()
+        set_io_listener(self.profiler.add_io)
+        self._redefine_performs()
+
+    def _stop_profiling(self):
+        """ Remove the instrumentation and write the report.
+
+        """
+        self.profiler.stop()
+        set_io_listener(None)
+        self._redefine_performs()
+
+        report = self.profiler.report()
+        log = logging.getLogger(__name__)
+        if self.profile_path:
+            try:
+                with open(self.profile_path, 'w') as f:
+                    f.write(report.encode('utf-8'))
+            except IOError:
+                mes = 'Failed to write the profiling report:'
+                log.exception(mes)
+        else:
+            log.info('Profiling report :\n' + report)
+
+    def _redefine_performs(self):
+        """ Rebuild the perform_ methods of all the tasks of the hierarchy.
+
+        """
+        def redefine(obj):
+            if isinstance(obj, BaseTask) and obj is not self:
+                obj._redefine_perform_()
+
+        self.walk(callables={'perform': redefine})
+
+    def _compile_plans(self, clear=False):
+        """ Compile (or discard) the execution plans of the hierarchy.
+
+        """
+        running = self.task_database.running
+        if not clear and running and not self.database_dependencies:
+            self.analyse_dependencies()
+
+        def compile_plan(obj):
+            if isinstance(obj, ComplexTask):
+                obj._plan = None if clear else obj.compile_plan()
+                if not clear and running and obj.auto_parallel:
+                    obj._graph = obj.compile_graph()
+                else:
+                    obj._graph = None
+
+        self.walk(callables={'plan': compile_plan})
+
+    def _start_watcher(self):
+        """ Enter the running state and start watching the events.
+
+        """
+        with self._state_cond:
+            self.execution_state = 'RUNNING'
+        self._sync_state()
+
+        self._watcher_done.clear()
+        self._watcher = Thread(target=self._watch_events,
+                               name='ExecutionStateWatcher')
+        self._watcher.daemon = True
+        self._watcher.start()
+
+    def _stop_watcher(self):
+        """ Stop watching the events and go back to the idle state.
+
+        """
+        self._watcher_done.set()
+        if self.wake_up is not None:
+            self.wake_up.set()
+        self._watcher.join()
+        with self._state_cond:
+            self.execution_state = 'IDLE'
+
+    def _watch_events(self):
+        """ Translate the changes of the stop and pause events into
+        execution states.
+
+        Executed by the _watcher thread.
+
+        """
+        wake_up = self.wake_up
+        done = self._watcher_done
+        while not done.is_set():
+            if wake_up is not None:
+                wake_up.wait()
+                wake_up.clear()
+            else:
+                done.wait(self.poll_interval)
+            self._sync_state()
+
     def _default_resume(self):
         return tEvent()
 
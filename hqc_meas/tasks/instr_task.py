@@ -31,6 +31,8 @@ class InstrumentTask(SimpleTask):
     #: Instance of instrument driver.
     driver = Instance(BaseInstrument)
 
+    database_reads = ()
+
     def check(self, *args, **kwargs):
         """
         """
@@ -56,9 +58,13 @@ class InstrumentTask(SimpleTask):
             return False, traceback
 
         if kwargs.get('test_instr') and config:
+            # The root task tests each profile once for the whole check pass.
             try:
-                instr = driver_class(config)
-                instr.close_connection()
+                instr = self.root_task.checked_instrument(
+                    self.selected_profile, self.selected_driver)
+                if instr is None:
+                    instr = driver_class(config)
+                    instr.close_connection()
             except InstrIOError:
                 traceback[self.task_path + '/' + self.task_name] =\
                     cleandoc('''Failed to establish the connection with the
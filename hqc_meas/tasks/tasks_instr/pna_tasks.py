@@ -15,6 +15,7 @@ from inspect import cleandoc
 import numpy as np
 
 from hqc_meas.tasks.api import InstrumentTask, InstrTaskInterface
+from hqc_meas.tasks.tools.coroutines import run_coroutine
 from hqc_meas.instruments.driver_tools import InstrIOError
 
 
@@ -38,7 +39,10 @@ def check_channels_presence(task, channels, *args, **kwargs):
             return False, traceback
 
         try:
-            instr = driver_class(config)
+            instr = task.root_task.checked_instrument(task.selected_profile,
+                                                      task.selected_driver)
+            if instr is None:
+                instr = driver_class(config)
         except InstrIOError:
             return False, traceback
 
@@ -313,6 +317,12 @@ class PNASweepTask(SingleChannelPNATask):
 
     def perform(self):
         """
+        """
+        run_coroutine(self.perform_async())
+
+    def perform_async(self):
+        """ Perform the sweep yielding while the PNA is acquiring.
+
         """
         if not self.driver:
             self.start_driver()
@@ -371,9 +381,9 @@ class PNASweepTask(SingleChannelPNATask):
 
         waiting_time = self.channel_driver.sweep_time
         self.driver.fire_trigger(self.channel)
-        time.sleep(waiting_time)
+        yield waiting_time
         while not self.driver.check_operation_completion():
-            time.sleep(0.1*waiting_time)
+            yield 0.1*waiting_time
 
         data = [np.linspace(start, stop, points)]
         for i, meas_name in enumerate(meas_names):
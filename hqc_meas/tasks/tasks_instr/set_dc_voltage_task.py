@@ -71,7 +71,7 @@ class SetDCVoltageTask(InterfaceableTaskMixin, InstrumentTask):
                 mes = cleandoc('''Instrument assigned to task {} is not
                     configured to output a voltage'''.format(self.task_name))
                 log.fatal(mes)
-                self.root_task.should_stop.set()
+                self.root_task.request_stop()
 
         setter = lambda value: setattr(self.driver, 'voltage', value)
         current_value = getattr(self.driver, 'voltage')
@@ -167,7 +167,7 @@ class MultiChannelVoltageSourceInterface(InstrTaskInterface):
                 mes = cleandoc('''Instrument assigned to task {} is not
                     configured to output a voltage'''.format(task.task_name))
                 log.fatal(mes)
-                task.root_task.should_stop.set()
+                task.root_task.request_stop()
 
         setter = lambda value: setattr(self.channel_driver, 'voltage', value)
         current_value = getattr(self.channel_driver, 'voltage')
@@ -198,11 +198,18 @@ class MultiChannelVoltageSourceInterface(InstrTaskInterface):
                 return True, traceback
 
             try:
-                instr = driver_class(config)
+                root = task.root_task
+                instr = root.checked_instrument(task.selected_profile,
+                                                task.selected_driver)
+                shared = instr is not None
+                if not shared:
+                    instr = driver_class(config)
                 if self.channel not in instr.defined_channels:
                     key = task.task_path + '/' + task.task_name + '_interface'
                     traceback[key] = 'Missing channel {}'.format(self.channel)
-                instr.close_connection()
+                # The connection opened by the root task is closed by it.
+                if not shared:
+                    instr.close_connection()
             except Exception:
                 return False, traceback
 
@@ -9,6 +9,7 @@
 from atom.api import (Str)
 
 from ..base_tasks import ComplexTask
+from ..tools.task_decorator import run_plan
 
 
 class ConditionalTask(ComplexTask):
@@ -42,8 +43,7 @@ class ConditionalTask(ComplexTask):
 
         """
         if self.format_and_eval_string(self.condition):
-            for child in self.children_task:
-                child.perform_(child)
+            run_plan(self.root_task, self.execution_plan())
 
 
 KNOWN_PY_TASKS = [ConditionalTask]
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : loop_adaptive_interface.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+"""
+"""
+from atom.api import Str, Enum
+from inspect import cleandoc
+
+from ..task_interface import TaskInterface
+from ..tools.adaptive_sampling import AdaptiveSampler
+
+
+class AdaptiveLoopInterface(TaskInterface):
+    """ Loop on a grid refined where an observable varies the most.
+
+    The loop starts with a coarse regular grid and then inserts new points
+    in the middle of the intervals on which the observable varies the most,
+    up to a point budget. The observable is evaluated after each iteration,
+    so the database entries it refers to must be accessible to the loop
+    (using access exceptions for the entries of its children).
+
+    """
+    #: Value at which to start the loop.
+    start = Str('0.0').tag(pref=True)
+
+    #: Value at which to stop the loop (included).
+    stop = Str('1.0').tag(pref=True)
+
+    #: Number of points of the initial regular grid.
+    initial_points = Str('11').tag(pref=True)
+
+    #: Maximal number of points of the loop.
+    max_points = Str('101').tag(pref=True)
+
+    #: Minimal distance between two points of the loop.
+    min_step = Str('0.0').tag(pref=True)
+
+    #: Expression evaluating to the real value used to refine the grid.
+    observable = Str().tag(pref=True)
+
+    #: Criterion used to choose where to refine the grid : 'gradient' to
+    #: refine where the observable varies the fastest, 'curvature' to refine
+    #: where its linear interpolation is the least accurate.
+    criterion = Enum('gradient', 'curvature').tag(pref=True)
+
+    def check(self, *args, **kwargs):
+        """ Check evaluation of all loop parameters.
+
+        """
+        test = True
+        traceback = {}
+        task = self.task
+        err_path = task.task_path + '/' + task.task_name
+        values = {}
+        for name in ('start', 'stop', 'initial_points', 'max_points',
+                     'min_step'):
+            try:
+                values[name] = task.format_and_eval_string(getattr(self,
+                                                                   name))
+            except Exception as e:
+                test = False
+                mess = 'Loop task did not succeed to compute the {}: {}'
+                traceback[err_path + '-' + name] = mess.format(name, e)
+
+        try:
+            float(task.format_and_eval_string(self.observable))
+        except Exception as e:
+            test = False
+            mess = 'Loop task did not succeed to compute the observable: {}'
+            traceback[err_path + '-observable'] = mess.format(e)
+
+        if not test:
+            return test, traceback
+
+        if 'value' in task.task_database_entries:
+            task.write_in_database('value', values['start'])
+
+        initial = values['initial_points']
+        maximum = values['max_points']
+        if not 2 <= initial <= maximum:
+            test = False
+            mess = cleandoc('''The initial number of points must be at least
+                            2 and at most the maximal number of points.''')
+            traceback[err_path + '-points'] = mess.replace('\n', ' ')
+        else:
+            task.write_in_database('point_number', maximum)
+
+        return test, traceback
+
+    def perform(self):
+        """
+        """
+        task = self.task
+        evaluate = task.format_and_eval_string
+        sampler = AdaptiveSampler(
+            start=float(evaluate(self.start)),
+            stop=float(evaluate(self.stop)),
+            initial_points=int(evaluate(self.initial_points)),
+            max_points=int(evaluate(self.max_points)),
+            min_step=float(evaluate(self.min_step)),
+            criterion=self.criterion,
+            measure=lambda: evaluate(self.observable))
+
+        task.perform_loop(sampler, adaptive=True)
+
+INTERFACES = {'LoopTask': [AdaptiveLoopInterface]}
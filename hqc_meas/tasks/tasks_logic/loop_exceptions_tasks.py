@@ -23,6 +23,10 @@ class BreakTask(SimpleTask):
 
     logic_task = True
 
+    reorderable = False
+
+    database_reads = ()
+
     condition = Str().tag(pref=True)
 
     parallel = set_default({'forbidden': True})
@@ -67,6 +71,10 @@ class ContinueTask(SimpleTask):
 
     logic_task = True
 
+    reorderable = False
+
+    database_reads = ()
+
     condition = Str().tag(pref=True)
 
     parallel = set_default({'forbidden': True})
@@ -9,10 +9,11 @@
 from atom.api import (Instance, Bool, set_default)
 
 from timeit import default_timer
+from itertools import islice
 
 from ..base_tasks import (SimpleTask, ComplexTask)
 from ..task_interface import InterfaceableTaskMixin
-from ..tools.task_decorator import handle_stop_pause
+from ..tools.task_decorator import handle_stop_pause, run_plan
 from .loop_exceptions import BreakException, ContinueException
 
 
@@ -56,7 +57,7 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
 
         return test, traceback
 
-    def perform_loop(self, iterable):
+    def perform_loop(self, iterable, adaptive=False):
         """ Perform the loop on the iterable calling all child tasks at each
         iteration.
 
@@ -65,115 +66,157 @@ class LoopTask(InterfaceableTaskMixin, ComplexTask):
         iterable : iterable
             Iterable on which the loop should be performed.
 
+        adaptive : bool, optional
+            Whether the values of the iterable are computed on the fly from
+            the results of the previous iterations. Such loops do not declare
+            their sweep and, as their values cannot be replayed, are performed
+            again from their start when resuming from a checkpoint. The length
+            of their iterable is only an upper bound so the number of points
+            actually performed is written in the database once the loop is
+            over.
+
         """
-        if self.timing:
-            if self.task:
-                self._perform_loop_timing_task(iterable)
-            else:
-                self._perform_loop_timing(iterable)
-        else:
-            if self.task:
-                self._perform_loop_task(iterable)
+        root = self.root_task
+        # When resuming from a checkpoint the iterations already performed are
+        # skipped.
+        skipped = root.enter_loop(self)
+        if adaptive:
+            skipped = 0
+        elif not self.task:
+            root.register_sweep(self, iterable)
+        try:
+            if self.timing:
+                if self.task:
+                    self._perform_loop_timing_task(iterable, skipped)
+                else:
+                    self._perform_loop_timing(iterable, skipped)
             else:
-                self._perform_loop(iterable)
+                if self.task:
+                    self._perform_loop_task(iterable, skipped)
+                else:
+                    self._perform_loop(iterable, skipped)
+        finally:
+            if not self.task and not adaptive:
+                root.unregister_sweep(self)
+            root.exit_loop(self)
+
+        if adaptive:
+            self.write_in_database('point_number',
+                                   self.entry_accessor('index').read())
 
     # --- Private API ---------------------------------------------------------
 
-    def _perform_loop(self, iterable):
+    def _perform_loop(self, iterable, skipped=0):
         """
 
         """
         self.write_in_database('point_number', len(iterable))
+        write_index = self.entry_accessor('index').write
+        write_value = self.entry_accessor('value').write
 
         root = self.root_task
-        for i, value in enumerate(iterable):
+        checkpoint = root.checkpoint
+        plan = self.execution_plan()
+        for i, value in islice(enumerate(iterable), skipped, None):
 
             if handle_stop_pause(root):
                 return
 
-            self.write_in_database('index', i+1)
-            self.write_in_database('value', value)
+            write_index(i+1)
+            write_value(value)
+            checkpoint()
             try:
-                for child in self.children_task:
-                    child.perform_(child)
+                run_plan(root, plan)
             except BreakException:
                 break
             except ContinueException:
                 continue
 
-    def _perform_loop_task(self, iterable):
+    def _perform_loop_task(self, iterable, skipped=0):
         """
 
         """
         self.write_in_database('point_number', len(iterable))
+        write_index = self.entry_accessor('index').write
 
         root = self.root_task
-        for i, value in enumerate(iterable):
+        checkpoint = root.checkpoint
+        plan = self.execution_plan()
+        for i, value in islice(enumerate(iterable), skipped, None):
 
             if handle_stop_pause(root):
                 return
 
-            self.write_in_database('index', i+1)
+            write_index(i+1)
+            checkpoint()
             self.task.perform_(self.task, value)
             try:
-                for child in self.children_task:
-                    child.perform_(child)
+                run_plan(root, plan)
             except BreakException:
                 break
             except ContinueException:
                 continue
 
-    def _perform_loop_timing(self, iterable):
+    def _perform_loop_timing(self, iterable, skipped=0):
         """
 
         """
         self.write_in_database('point_number', len(iterable))
+        write_index = self.entry_accessor('index').write
+        write_value = self.entry_accessor('value').write
+        write_elapsed = self.entry_accessor('elapsed_time').write
 
         root = self.root_task
-        for i, value in enumerate(iterable):
+        checkpoint = root.checkpoint
+        plan = self.execution_plan()
+        for i, value in islice(enumerate(iterable), skipped, None):
 
             if handle_stop_pause(root):
                 return
 
-            self.write_in_database('index', i+1)
-            self.write_in_database('value', value)
+            write_index(i+1)
+            write_value(value)
+            checkpoint()
             tic = default_timer()
             try:
-                for child in self.children_task:
-                    child.perform_(child)
+                run_plan(root, plan)
             except BreakException:
-                self.write_in_database('elapsed_time', default_timer()-tic)
+                write_elapsed(default_timer()-tic)
                 break
             except ContinueException:
-                self.write_in_database('elapsed_time', default_timer()-tic)
+                write_elapsed(default_timer()-tic)
                 continue
-            self.write_in_database('elapsed_time', default_timer()-tic)
+            write_elapsed(default_timer()-tic)
 
-    def _perform_loop_timing_task(self, iterable):
+    def _perform_loop_timing_task(self, iterable, skipped=0):
         """
 
         """
         self.write_in_database('point_number', len(iterable))
+        write_index = self.entry_accessor('index').write
+        write_elapsed = self.entry_accessor('elapsed_time').write
 
         root = self.root_task
-        for i, value in enumerate(iterable):
+        checkpoint = root.checkpoint
+        plan = self.execution_plan()
+        for i, value in islice(enumerate(iterable), skipped, None):
 
             if handle_stop_pause(root):
                 return
 
-            self.write_in_database('index', i+1)
+            write_index(i+1)
+            checkpoint()
             tic = default_timer()
             self.task.perform_(self.task, value)
             try:
-                for child in self.children_task:
-                    child.perform_(child)
+                run_plan(root, plan)
             except BreakException:
-                self.write_in_database('elapsed_time', default_timer()-tic)
+                write_elapsed(default_timer()-tic)
                 break
             except ContinueException:
-                self.write_in_database('elapsed_time', default_timer()-tic)
+                write_elapsed(default_timer()-tic)
                 continue
-            self.write_in_database('elapsed_time', default_timer()-tic)
+            write_elapsed(default_timer()-tic)
 
     def _observe_task(self, change):
         """ Keep the database entries in sync with the task member.
@@ -11,7 +11,7 @@ from atom.api import (Str, set_default)
 
 from ..base_tasks import ComplexTask
 from .loop_exceptions import BreakException, ContinueException
-from ..tools.task_decorator import handle_stop_pause
+from ..tools.task_decorator import handle_stop_pause, run_plan
 
 class WhileTask(ComplexTask):
     """ Task breaking out of a loop when a condition is met.
@@ -45,23 +45,31 @@ class WhileTask(ComplexTask):
         """
 
         """
-        i = 1
         root = self.root_task
-        while True:
-            self.write_in_database('index', i)
-            i += 1
-            if not self.format_and_eval_string(self.condition):
-                break
-
-            if handle_stop_pause(root):
-                return
-
-            try:
-                for child in self.children_task:
-                    child.perform_(child)
-            except BreakException:
-                break
-            except ContinueException:
-                continue
+        # When resuming from a checkpoint the iterations already performed are
+        # skipped.
+        i = root.enter_loop(self) + 1
+        try:
+            write_index = self.entry_accessor('index').write
+            checkpoint = root.checkpoint
+            plan = self.execution_plan()
+            while True:
+                write_index(i)
+                i += 1
+                if not self.format_and_eval_string(self.condition):
+                    break
+
+                if handle_stop_pause(root):
+                    return
+
+                checkpoint()
+                try:
+                    run_plan(root, plan)
+                except BreakException:
+                    break
+                except ContinueException:
+                    continue
+        finally:
+            root.exit_loop(self)
 
 KNOWN_PY_TASKS = [WhileTask]
@@ -30,6 +30,8 @@ class ArrayExtremaTask(SimpleTask):
 
     task_database_entries = set_default({'max_ind': 0, 'max_value': 1.0})
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
@@ -121,6 +123,8 @@ class ArrayFindValueTask(SimpleTask):
 
     task_database_entries = set_default({'index': 0})
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
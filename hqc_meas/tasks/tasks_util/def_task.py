@@ -21,6 +21,8 @@ class DefinitionTask(SimpleTask):
     # List of definitions.
     definitions = ContainerList(Tuple()).tag(pref=True)
 
+    database_reads = ()
+
     def perform(self):
         """ Do nothing.
 
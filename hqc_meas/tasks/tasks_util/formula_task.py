@@ -18,6 +18,8 @@ class FormulaTask(SimpleTask):
     #: List of formulas.
     formulas = ContainerList(Tuple()).tag(pref=True)
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
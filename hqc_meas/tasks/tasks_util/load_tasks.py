@@ -39,6 +39,8 @@ class LoadArrayTask(InterfaceableTaskMixin, SimpleTask):
     task_database_entries = set_default({'array': _make_array(['var1',
                                                                'var2'])})
 
+    database_reads = ()
+
     def check(self, *args, **kwargs):
         """
         """
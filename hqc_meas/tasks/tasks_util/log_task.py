@@ -23,6 +23,8 @@ class LogTask(SimpleTask):
     loopable = True
     task_database_entries = set_default({'message': ''})
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self, *args, **kwargs):
@@ -66,6 +66,8 @@ class SaveTask(SimpleTask):
 
     task_database_entries = set_default({'file': None})
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
@@ -78,7 +80,11 @@ class SaveTask(SimpleTask):
         # Initialisation.
         if not self.initialized:
 
-            self.line_index = 0
+            # State saved in the checkpoint from which the measure is resumed.
+            resumed = self._resumed_state
+            self._resumed_state = None
+
+            self.line_index = resumed['line_index'] if resumed else 0
             size_str = self.array_size
             if size_str:
                 self.array_length = self.format_and_eval_string(size_str)
@@ -89,7 +95,8 @@ class SaveTask(SimpleTask):
                 full_folder_path = self.format_string(self.folder)
                 filename = self.format_string(self.filename)
                 full_path = os.path.join(full_folder_path, filename)
-                mode = 'wb' if self.file_mode == 'New' else 'ab'
+                new = self.file_mode == 'New' and not resumed
+                mode = 'wb' if new else 'ab'
 
                 try:
                     self.file_object = open(full_path, mode)
@@ -98,24 +105,35 @@ class SaveTask(SimpleTask):
                     mes = cleandoc('''In {}, failed to open the specified
                                     file {}'''.format(self.task_name, e))
                     log.error(mes)
-                    self.root_task.should_stop.set()
+                    self.root_task.request_stop()
 
                 self.root_task.files[full_path] = self.file_object
-                if self.header:
-                    h = self.format_string(self.header)
-                    for line in h.split('\n'):
-                        self.file_object.write('# ' + line + '\n')
-                labels = [s[0] for s in self.saved_values]
-                self.file_object.write('\t'.join(labels) + '\n')
-                self.file_object.flush()
+                if resumed:
+                    # Drop the lines written after the checkpoint, they will
+                    # be written again.
+                    self.file_object.truncate(resumed['position'])
+                else:
+                    if self.header:
+                        h = self.format_string(self.header)
+                        for line in h.split('\n'):
+                            self.file_object.write('# ' + line + '\n')
+                    labels = [s[0] for s in self.saved_values]
+                    self.file_object.write('\t'.join(labels) + '\n')
+                    self.file_object.flush()
 
             if self.saving_target != 'File':
                 # TODO add more flexibilty on the dtype (possible complex
                 # values)
-                array_type = numpy.dtype([(str(s[0]), 'f8')
-                                          for s in self.saved_values])
-                self.array = numpy.empty((self.array_length),
-                                         dtype=array_type)
+                if resumed and resumed['array'] is not None:
+                    self.array = resumed['array']
+                else:
+                    array_type = numpy.dtype([(str(s[0]), 'f8')
+                                              for s in self.saved_values])
+                    # The lines which are not written (if the loop providing
+                    # the size stops early) are left to nan.
+                    self.array = numpy.empty((self.array_length),
+                                             dtype=array_type)
+                    self.array.fill(numpy.nan)
                 self.write_in_database('array', self.array)
             self.initialized = True
 
@@ -137,6 +155,30 @@ class SaveTask(SimpleTask):
                 self.file_object.close()
             self.initialized = False
 
+    def checkpoint_state(self):
+        """ Save the number of lines written, the position in the file and
+        the array.
+
+        """
+        if not self.initialized:
+            return None
+
+        position = None
+        if self.saving_target != 'Array':
+            position = self.file_object.tell()
+        array = None
+        if self.saving_target != 'File':
+            array = self.array
+        return {'line_index': self.line_index, 'position': position,
+                'array': array}
+
+    def restore_checkpoint_state(self, state):
+        """ Resume writing where the checkpoint was saved.
+
+        """
+        self.initialized = False
+        self._resumed_state = state
+
     def check(self, *args, **kwargs):
         """
         """
@@ -223,6 +265,11 @@ class SaveTask(SimpleTask):
         else:
             self.task_database_entries = {}
 
+    # --- Private API ---------------------------------------------------------
+
+    #: State saved in the checkpoint from which the measure is resumed.
+    _resumed_state = Value()
+
 
 class SaveFileTask(SimpleTask):
     """ Save the specified entries in a CSV file.
@@ -258,6 +305,8 @@ class SaveFileTask(SimpleTask):
 
     task_database_entries = set_default({'file': None})
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
@@ -267,40 +316,50 @@ class SaveFileTask(SimpleTask):
         # Initialisation.
         if not self.initialized:
 
+            # State saved in the checkpoint from which the measure is resumed.
+            resumed = self._resumed_state
+            self._resumed_state = None
+
             full_folder_path = self.format_string(self.folder)
             filename = self.format_string(self.filename)
             full_path = os.path.join(full_folder_path, filename)
             try:
-                self.file_object = open(full_path, 'wb')
+                self.file_object = open(full_path, 'ab' if resumed else 'wb')
             except IOError as e:
                 log = logging.getLogger()
                 mes = cleandoc('''In {}, failed to open the specified
                                 file {}'''.format(self.task_name, e))
                 log.error(mes)
-                self.root_task.should_stop.set()
+                self.root_task.request_stop()
 
             self.root_task.files[full_path] = self.file_object
 
-            if self.header:
-                h = self.format_string(self.header)
-                for line in h.split('\n'):
-                    self.file_object.write('# ' + line + '\n')
-
-            labels = []
-            self.array_values = set()
-            for i, s in enumerate(self.saved_values):
-                value = self.format_and_eval_string(s[1])
-                if isinstance(value, numpy.ndarray):
-                    names = value.dtype.names
-                    self.array_values.add(i)
-                    if names:
-                        labels.extend([s[0] + '_' + m for m in names])
+            if resumed:
+                # Drop the lines written after the checkpoint, they will be
+                # written again.
+                self.file_object.truncate(resumed['position'])
+                self.array_values = set(resumed['array_values'])
+            else:
+                if self.header:
+                    h = self.format_string(self.header)
+                    for line in h.split('\n'):
+                        self.file_object.write('# ' + line + '\n')
+
+                labels = []
+                self.array_values = set()
+                for i, s in enumerate(self.saved_values):
+                    value = self.format_and_eval_string(s[1])
+                    if isinstance(value, numpy.ndarray):
+                        names = value.dtype.names
+                        self.array_values.add(i)
+                        if names:
+                            labels.extend([s[0] + '_' + m for m in names])
+                        else:
+                            labels.append(s[0])
                     else:
                         labels.append(s[0])
-                else:
-                    labels.append(s[0])
-            self.file_object.write('\t'.join(labels) + '\n')
-            self.file_object.flush()
+                self.file_object.write('\t'.join(labels) + '\n')
+                self.file_object.flush()
 
             self.initialized = True
 
@@ -319,7 +378,7 @@ class SaveFileTask(SimpleTask):
                                 arrays of different sizes
                                 '''.format(self.task_name))
                 log.error(mes)
-                self.root_task.should_stop.set()
+                self.root_task.request_stop()
             else:
                 length = lengths.pop()
 
@@ -341,6 +400,23 @@ class SaveFileTask(SimpleTask):
             numpy.savetxt(self.file_object, array_to_save, delimiter='\t')
             self.file_object.flush()
 
+    def checkpoint_state(self):
+        """ Save the position in the file and the columns holding arrays.
+
+        """
+        if not self.initialized:
+            return None
+
+        return {'position': self.file_object.tell(),
+                'array_values': sorted(self.array_values)}
+
+    def restore_checkpoint_state(self, state):
+        """ Resume writing where the checkpoint was saved.
+
+        """
+        self.initialized = False
+        self._resumed_state = state
+
     def check(self, *args, **kwargs):
         """
         """
@@ -397,6 +473,11 @@ class SaveFileTask(SimpleTask):
 
         return test, traceback
 
+    # --- Private API ---------------------------------------------------------
+
+    #: State saved in the checkpoint from which the measure is resumed.
+    _resumed_state = Value()
+
 
 class SaveArrayTask(SimpleTask):
     """Save the specified array either in a CSV file or as a .npy binary file.
@@ -420,6 +501,8 @@ class SaveArrayTask(SimpleTask):
     #: Flag indicating whether to save as csv or .npy.
     mode = Enum('Text file', 'Binary file').tag(pref=True)
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
@@ -474,7 +557,7 @@ class SaveArrayTask(SimpleTask):
                 log = logging.getLogger()
                 log.error(mes)
 
-                self.root_task.should_stop.set()
+                self.root_task.request_stop()
                 return
 
             numpy.save(full_path, array_to_save)
@@ -22,6 +22,8 @@ class SleepTask(SimpleTask):
     #: Time during which to sleep.
     time = Float().tag(pref=True)
 
+    database_reads = ()
+
     wait = set_default({'activated': True})  # Wait on all pools by default.
 
     def perform(self):
@@ -30,6 +32,12 @@ class SleepTask(SimpleTask):
         """
         sleep(self.time)
 
+    def perform_async(self):
+        """ Let the other coroutines run during the specified time.
+
+        """
+        yield self.time
+
     def check(self, *args, **kwargs):
         if self.time < 0:
             return False, {self.task_path + '/' + self.task_name:
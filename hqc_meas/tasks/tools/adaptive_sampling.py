@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : adaptive_sampling.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Adaptive refinement of a one dimensional grid.
+
+"""
+from atom.api import Atom, Float, Int, Enum, Callable, List
+from bisect import bisect
+from numpy import array, diff, hypot, lexsort, linspace, maximum, zeros
+
+
+class AdaptiveSampler(Atom):
+    """ Iterable yielding the points of an adaptively refined grid.
+
+    The sampler first yields the points of a coarse regular grid. It then
+    repeatedly yields the middle of the interval between two measured points
+    on which the measured quantity varies the most, till the point budget is
+    exhausted. The quantity is measured by calling measure when the iteration
+    is resumed, ie once the work for the previous point is done.
+
+    The variation on an interval is estimated, in units normalised by the
+    extent of the grid and of the measured values, either by its length on
+    the curve (gradient criterion), which still refines the flat regions
+    slowly, or by the error of the linear interpolation estimated from the
+    second derivatives at its ends (curvature criterion).
+
+    """
+    #: First point of the grid.
+    start = Float()
+
+    #: Last point of the grid (included).
+    stop = Float(1.0)
+
+    #: Number of points of the initial regular grid.
+    initial_points = Int(11)
+
+    #: Maximal number of points.
+    max_points = Int(101)
+
+    #: Minimal distance between two points.
+    min_step = Float()
+
+    #: Criterion used to choose the interval to refine.
+    criterion = Enum('gradient', 'curvature')
+
+    #: Callable returning the value measured at the last point yielded.
+    measure = Callable()
+
+    #: Measured points in increasing order.
+    points = List()
+
+    #: Values measured at the points.
+    values = List()
+
+    def __len__(self):
+        """ Maximal number of points. The refinement stops earlier if no
+        interval can be split without going below the minimal step.
+
+        """
+        return self.max_points
+
+    def __iter__(self):
+        self.points = []
+        self.values = []
+        for point in linspace(self.start, self.stop, self.initial_points):
+            yield point
+            self._record(point)
+
+        while len(self.points) < self.max_points:
+            point = self.next_point()
+            if point is None:
+                return
+            yield point
+            self._record(point)
+
+    def next_point(self):
+        """ Compute the next point to measure.
+
+        Returns
+        -------
+        point : float or None
+            Middle of the interval to refine, None if no interval can be split
+            without going below the minimal step.
+
+        """
+        if len(self.points) < 2:
+            return None
+
+        x = array(self.points)
+        y = array(self.values)
+        widths = diff(x)
+        dx = widths/(abs(self.stop - self.start) or 1.0)
+        dy = diff(y)/((y.max() - y.min()) or 1.0)
+
+        if self.criterion == 'gradient':
+            loss = hypot(dx, dy)
+        else:
+            curvature = zeros(len(x))
+            curvature[1:-1] = abs(diff(dy/dx))/((dx[1:] + dx[:-1])/2)
+            loss = dx**2*maximum(curvature[:-1], curvature[1:])
+
+        loss[widths < 2*self.min_step] = -1
+        # Among intervals with the same loss the widest is refined first.
+        i = lexsort((widths, loss))[-1]
+        point = (x[i] + x[i+1])/2
+        if loss[i] < 0 or not x[i] < point < x[i+1]:
+            return None
+
+        return point
+
+    # --- Private API ---------------------------------------------------------
+
+    def _record(self, point):
+        """ Measure the value at a point and insert them in the lists.
+
+        """
+        value = float(self.measure())
+        i = bisect(self.points, point)
+        self.points.insert(i, point)
+        self.values.insert(i, value)
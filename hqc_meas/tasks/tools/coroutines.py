@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : coroutines.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Generator based coroutines used to overlap the waits of parallel tasks.
+
+A task can implement a perform_async method : a generator function taking the
+same arguments as perform, which yields the time in seconds it needs to wait
+(or None to simply let the other coroutines run) instead of sleeping. When the
+root task runs in cooperative mode, the parallel tasks implementing it are
+executed as coroutines by a single scheduler thread so that their waits
+overlap. Otherwise run_coroutine executes them synchronously.
+
+"""
+import logging
+from atom.api import Atom, Int, Bool, Value, Typed, Callable, List
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+from threading import Thread, Condition, Lock
+from time import sleep
+from timeit import default_timer
+
+from .shared_resources import SharedCounter
+
+
+def run_coroutine(coroutine):
+    """ Execute a coroutine synchronously, sleeping when it asks to wait.
+
+    Parameters
+    ----------
+    coroutine : generator
+        Coroutine yielding the time to wait in seconds or None.
+
+    """
+    for delay in coroutine:
+        if delay:
+            sleep(delay)
+
+
+class CoroutineScheduler(Atom):
+    """ Scheduler executing coroutines in a single thread.
+
+    The coroutines are resumed in turn, a coroutine asking to wait being put
+    aside till the delay is elapsed.
+
+    """
+    #: Callable called before resuming a coroutine. It should handle the
+    #: pause and return True if the coroutine should be stopped.
+    stop_check = Callable()
+
+    #: Callable called with the exception raised by a coroutine.
+    error_handler = Callable()
+
+    #: Counter incremented while the scheduler has coroutines to run.
+    active_counter = Typed(SharedCounter)
+
+    #: Whether or not the scheduler was shut down.
+    closed = Bool()
+
+    def __init__(self, **kwargs):
+        super(CoroutineScheduler, self).__init__(**kwargs)
+        # Lazy defaults could be built concurrently by several threads.
+        self._lock = Lock()
+        self._cond = Condition(self._lock)
+        self._ready = deque()
+        self._sleeping = []
+        self._ids = count()
+
+    def submit(self, coroutine, future, callback=None):
+        """ Schedule a coroutine.
+
+        Parameters
+        ----------
+        coroutine : generator
+            Coroutine to execute.
+
+        future : TaskFuture
+            Future to complete when the coroutine is exhausted.
+
+        callback : callable, optional
+            Callable called without arguments once the coroutine is done.
+
+        """
+        with self._lock:
+            if self.closed:
+                raise RuntimeError('Scheduler is closed.')
+            self._ready.append((coroutine, future, callback))
+            self._running += 1
+            if self._running == 1 and self.active_counter is not None:
+                self.active_counter.increment()
+            if self._thread is None:
+                self._thread = Thread(target=self._loop,
+                                      name='CoroutineScheduler')
+                self._thread.daemon = True
+                self._thread.start()
+            self._cond.notify()
+
+    def shutdown(self):
+        """ Wait for all the coroutines to complete and stop the scheduler.
+
+        """
+        with self._lock:
+            self.closed = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join()
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Number of coroutines not completed yet.
+    _running = Int()
+
+    #: Thread running the coroutines.
+    _thread = Typed(Thread)
+
+    #: Coroutines ready to be resumed as tuples (coroutine, future, callback).
+    _ready = Value()
+
+    #: Heap of the waiting coroutines as tuples (wake up time, id, coroutine,
+    #: future, callback).
+    _sleeping = List()
+
+    #: Counter used to order the coroutines waking up at the same time.
+    _ids = Value()
+
+    #: Lock protecting the state of the scheduler.
+    _lock = Value()
+
+    #: Condition used to wake up the scheduler.
+    _cond = Value()
+
+    def _loop(self):
+        """ Main loop of the scheduler thread.
+
+        """
+        ready = self._ready
+        sleeping = self._sleeping
+        while True:
+            with self._lock:
+                while True:
+                    now = default_timer()
+                    while sleeping and sleeping[0][0] <= now:
+                        ready.append(heappop(sleeping)[2:])
+                    if ready:
+                        break
+                    if not sleeping and self.closed:
+                        return
+                    timeout = sleeping[0][0] - now if sleeping else None
+                    self._cond.wait(timeout)
+                batch = list(ready)
+                ready.clear()
+
+            for item in batch:
+                self._step(*item)
+
+    def _step(self, coroutine, future, callback):
+        """ Resume a coroutine till it asks to wait or is exhausted.
+
+        """
+        try:
+            if self.stop_check and self.stop_check():
+                coroutine.close()
+                raise StopIteration()
+            delay = next(coroutine)
+        except StopIteration:
+            self._finish(future, callback, None)
+        except BaseException as e:
+            log = logging.getLogger(__name__)
+            log.exception('Coroutine failed :')
+            self._finish(future, callback, e)
+            if self.error_handler:
+                self.error_handler(e)
+        else:
+            with self._lock:
+                if delay:
+                    heappush(self._sleeping,
+                             (default_timer() + delay, next(self._ids),
+                              coroutine, future, callback))
+                else:
+                    self._ready.append((coroutine, future, callback))
+
+    def _finish(self, future, callback, exception):
+        """ Mark a coroutine as completed.
+
+        """
+        future._set_done(exception)
+        if callback is not None:
+            callback()
+        with self._lock:
+            self._running -= 1
+            if self._running == 0 and self.active_counter is not None:
+                self.active_counter.decrement()
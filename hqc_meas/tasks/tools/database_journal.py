@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : database_journal.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Append-only binary journal of the writes performed on a running database.
+
+A journal file starts with a header holding the paths of the entries of the
+flat database and their values when the journal was started. It is then made
+of records (timestamp, slot index, slot version, value) appended to a
+memory-mapped file so that the records already written survive a crash of the
+process. The payload of a record is written before its header and the marker
+starting the record last, so that a record is never seen before being
+complete.
+
+"""
+import mmap
+import struct
+import cPickle
+from threading import Condition
+from time import time
+
+from atom.api import Atom, Value, Int, Unicode
+
+
+#: Magic string identifying a journal file.
+MAGIC = 'HQCJ'
+
+#: Version of the file format.
+VERSION = 2
+
+#: Header of the file : magic string, version, length of the pickled header.
+FILE_HEADER = struct.Struct('<4sHI')
+
+#: Header of a record : marker, timestamp, slot index, slot version, value
+#: type, length of the value payload.
+RECORD_HEADER = struct.Struct('<BdIQcI')
+
+#: Marker starting each record. The unused part of the file is filled with
+#: zeros which allows to detect the end of the journal.
+RECORD_MARKER = 0xA5
+
+#: Size by which the file is extended each time it is full.
+CHUNK_SIZE = 2**20
+
+#: Struct used to pack the values of the simple types, keyed by type code.
+_PACKERS = {'d': struct.Struct('<d'), 'q': struct.Struct('<q'),
+            'D': struct.Struct('<dd'), '?': struct.Struct('<?')}
+
+
+def _encode(value):
+    """ Encode a value as a type code and a payload.
+
+    """
+    kind = type(value)
+    if kind is float:
+        return 'd', _PACKERS['d'].pack(value)
+    elif kind is bool:
+        return '?', _PACKERS['?'].pack(value)
+    elif kind is int:
+        return 'q', _PACKERS['q'].pack(value)
+    elif kind is complex:
+        return 'D', _PACKERS['D'].pack(value.real, value.imag)
+    elif kind is str:
+        return 's', value
+    try:
+        return 'p', cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL)
+    except Exception:
+        return 'r', repr(value)
+
+
+def _decode(code, payload):
+    """ Decode a value encoded by _encode.
+
+    """
+    if code == 'D':
+        return complex(*_PACKERS['D'].unpack(payload))
+    elif code in _PACKERS:
+        return _PACKERS[code].unpack(payload)[0]
+    elif code in ('s', 'r'):
+        return payload
+    return cPickle.loads(payload)
+
+
+class JournalWriter(Atom):
+    """ Writer appending the records of a journal to a memory mapped file.
+
+    Records can be written concurrently : the space of a record is reserved
+    under a lock but the record itself is written outside of it.
+
+    Parameters
+    ----------
+    path : unicode
+        Path of the file in which to write the journal. It is overwritten if
+        it exists.
+
+    paths : list(str)
+        Full paths of the entries of the flat database.
+
+    values : list
+        Values of the entries of the flat database when the journal starts.
+
+    """
+    #: Path of the journal file.
+    path = Unicode()
+
+    #: Number of bytes of the file used so far.
+    used = Int()
+
+    def __init__(self, path, paths, values):
+        super(JournalWriter, self).__init__(path=path)
+        values = [v if _encode(v)[0] != 'r' else repr(v) for v in values]
+        header = cPickle.dumps({'paths': list(paths), 'values': values,
+                                'start': time()},
+                               cPickle.HIGHEST_PROTOCOL)
+        self._cond = Condition()
+        self._file = open(path, 'w+b')
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION, len(header)))
+        self._file.write(header)
+        self._file.flush()
+        self.used = FILE_HEADER.size + len(header)
+        self._map_file(self.used + CHUNK_SIZE)
+
+    def record(self, index, value, version):
+        """ Append a record to the journal.
+
+        Parameters
+        ----------
+        index : int
+            Index of the written slot in the flat database.
+
+        value :
+            Value written.
+
+        version : int
+            Version of the slot after the write. As records are not written
+            under the slot lock it is used to order the writes of a slot.
+
+        """
+        timestamp = time()
+        code, payload = _encode(value)
+        size = RECORD_HEADER.size + len(payload)
+        with self._cond:
+            while True:
+                if self._map is None:
+                    return
+                start = self.used
+                if start + size < len(self._map):
+                    break
+                # The file can only be remapped once the pending records are
+                # written.
+                if self._writers:
+                    self._cond.wait()
+                else:
+                    self._map_file(start + size + CHUNK_SIZE)
+            self.used = start + size
+            self._writers += 1
+            journal_map = self._map
+
+        try:
+            end = start + RECORD_HEADER.size
+            journal_map[end:end + len(payload)] = payload
+            RECORD_HEADER.pack_into(journal_map, start, 0, timestamp, index,
+                                    version, code, len(payload))
+            journal_map[start] = chr(RECORD_MARKER)
+        finally:
+            with self._cond:
+                self._writers -= 1
+                if not self._writers:
+                    self._cond.notify_all()
+
+    def close(self):
+        """ Flush the records and shrink the file to its used size.
+
+        """
+        with self._cond:
+            while self._writers:
+                self._cond.wait()
+            if self._map is None:
+                return
+            self._map.flush()
+            self._map.close()
+            self._map = None
+            self._file.truncate(self.used)
+            self._file.close()
+
+    # --- Private API ---------------------------------------------------------
+
+    #: File object of the journal.
+    _file = Value()
+
+    #: Memory map of the journal file.
+    _map = Value()
+
+    #: Condition protecting the reservation of the space of the records and
+    #: the remapping of the file.
+    _cond = Value()
+
+    #: Number of records whose space is reserved but which are not written
+    #: yet.
+    _writers = Int()
+
+    def _map_file(self, size):
+        """ Extend the file to the specified size and map it in memory.
+
+        """
+        if self._map is not None:
+            self._map.flush()
+            self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+
+def read_journal(path):
+    """ Read a journal file.
+
+    Parameters
+    ----------
+    path : unicode
+        Path of the journal file.
+
+    Returns
+    -------
+    header : dict
+        Header of the journal holding the paths ('paths') and initial values
+        ('values') of the entries and the time at which the journal started
+        ('start').
+
+    records : list(tuple)
+        List of the records as tuples (timestamp, slot index, slot version,
+        value). Reading stops at the first record which is incomplete or
+        cannot be decoded.
+
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+
+    magic, version, length = FILE_HEADER.unpack_from(content)
+    if magic != MAGIC:
+        raise ValueError('{} is not a database journal'.format(path))
+    if version > VERSION:
+        raise ValueError('Unsupported journal version {}'.format(version))
+    start = FILE_HEADER.size
+    header = cPickle.loads(content[start:start + length])
+
+    records = []
+    pos = start + length
+    size = len(content)
+    while pos + RECORD_HEADER.size <= size:
+        marker, timestamp, index, version, code, length = \
+            RECORD_HEADER.unpack_from(content, pos)
+        # Either the end of the journal or a record which was not completely
+        # written because the process crashed.
+        if marker != RECORD_MARKER:
+            break
+        pos += RECORD_HEADER.size
+        if pos + length > size:
+            break
+        try:
+            value = _decode(code, content[pos:pos + length])
+        except Exception:
+            break
+        records.append((timestamp, index, version, value))
+        pos += length
+
+    return header, records
+
+
+def replay_journal(path, until=None):
+    """ Rebuild the state of the database from a journal.
+
+    Parameters
+    ----------
+    path : unicode
+        Path of the journal file.
+
+    until : float, optional
+        Time (as returned by time.time) up to which to replay the records. By
+        default all the records are replayed.
+
+    Returns
+    -------
+    values : dict
+        Dict mapping the full paths of the entries to their values.
+
+    """
+    header, records = read_journal(path)
+    values = list(header['values'])
+    versions = [0]*len(values)
+    for timestamp, index, version, value in records:
+        if until is not None and timestamp > until:
+            continue
+        # Concurrent writes of a slot may be recorded out of order.
+        if version > versions[index]:
+            values[index] = value
+            versions[index] = version
+
+    return dict(zip(header['paths'], values))
+
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : dependency_graph.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Inference of the ordering constraints between sibling tasks.
+
+"""
+
+
+def build_dependency_graph(accesses):
+    """ Build the dependency graph of a sequence of operations.
+
+    An operation depends on a previous one if it reads a resource the previous
+    one writes (read after write), writes a resource the previous one reads
+    (write after read) or writes (write after write). A barrier depends on all
+    the previous operations and all the following operations depend on it.
+
+    Parameters
+    ----------
+    accesses : iterable
+        Tuples (reads, writes, barrier) describing the operations in their
+        sequential order, reads and writes being sets of resources names.
+
+    Returns
+    -------
+    graph : tuple
+        Tuple holding for each operation the tuple of the indexes of the
+        operations it directly depends on.
+
+    """
+    graph = []
+    # Last operation writing each resource and operations reading it since.
+    last_writer = {}
+    readers = {}
+    barrier_index = None
+    for i, (reads, writes, barrier) in enumerate(accesses):
+        if barrier:
+            # Depending on the operations which have no successor is enough.
+            depends = set(range(i))
+            for preds in graph:
+                depends.difference_update(preds)
+        else:
+            depends = set()
+            for res in reads:
+                if res in last_writer:
+                    depends.add(last_writer[res])
+            for res in writes:
+                if res in last_writer:
+                    depends.add(last_writer[res])
+                depends.update(readers.get(res, ()))
+            if barrier_index is not None:
+                depends.add(barrier_index)
+
+        graph.append(tuple(sorted(depends)))
+
+        if barrier:
+            barrier_index = i
+            last_writer.clear()
+            readers.clear()
+        else:
+            for res in reads:
+                readers.setdefault(res, set()).add(i)
+            for res in writes:
+                last_writer[res] = i
+                readers[res] = set()
+
+    return tuple(graph)
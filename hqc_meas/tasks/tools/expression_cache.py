@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : expression_cache.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Cache of the preformatted and compiled strings shared by all the tasks of
+a hierarchy.
+
+"""
+from atom.api import Atom, Int, Float, Value, Typed
+from collections import OrderedDict
+from threading import Lock
+
+
+class CachedExpression(object):
+    """ Preformatted string or compiled function along with the indexes of the
+    database entries whose values it expects.
+
+    The tasks keep weak references to the cached expressions so that the
+    expressions discarded by the cache can be freed, hence this is not an
+    Atom object (those do not support weak references).
+
+    """
+    __slots__ = ('value', 'indexes', '__weakref__')
+
+    def __init__(self, value, indexes):
+        self.value = value
+        self.indexes = indexes
+
+
+class ExpressionCache(Atom):
+    """ Thread safe LRU cache of the expressions used by the tasks.
+
+    Entries are keyed by a tuple (kind, indexes, source) where kind identifies
+    the type of processing ('format' or 'eval'), indexes are the indexes of
+    the database entries referred to by the source string in their order of
+    appearance and source is the string as written by the user. Hence the
+    same string used by tasks resolving its references to the same entries
+    is processed only once.
+
+    """
+    #: Maximal number of entries kept in the cache.
+    size = Int(1000)
+
+    #: Number of lookups which found an entry in the cache.
+    hits = Int()
+
+    #: Number of lookups which did not find an entry in the cache.
+    misses = Int()
+
+    #: Total time spent building the entries of the cache.
+    compile_time = Float()
+
+    def get(self, key):
+        """ Look for an entry in the cache.
+
+        Parameters
+        ----------
+        key : tuple
+            Key of the entry.
+
+        Returns
+        -------
+        entry :
+            Cached entry or None if the key is not in the cache.
+
+        """
+        with self._lock:
+            try:
+                record = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            self._entries[key] = record
+            self.hits += 1
+            record[1] += 1
+            return record[0]
+
+    def add(self, key, entry, compile_time=0.0):
+        """ Add an entry to the cache, discarding the least recently used
+        entries if the cache is full.
+
+        Parameters
+        ----------
+        key : tuple
+            Key of the entry.
+
+        entry :
+            Entry to cache.
+
+        compile_time : float, optional
+            Time it took to build the entry.
+
+        """
+        with self._lock:
+            self._entries[key] = [entry, 0, compile_time]
+            self.compile_time += compile_time
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def get_stats(self):
+        """ Get the statistics of the entries currently in the cache.
+
+        Returns
+        -------
+        stats : list(tuple)
+            Tuples (key, hits, compile_time) sorted by decreasing number of
+            hits.
+
+        """
+        with self._lock:
+            stats = [(key, record[1], record[2])
+                     for key, record in self._entries.iteritems()]
+        return sorted(stats, key=lambda s: s[1], reverse=True)
+
+    def clear(self):
+        """ Discard all the entries and reset the statistics.
+
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.compile_time = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Cached entries as lists [entry, hits, compile_time] ordered from the
+    #: least to the most recently used.
+    _entries = Typed(OrderedDict, ())
+
+    #: Lock protecting the entries and statistics.
+    _lock = Value(factory=Lock)
@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : serialization.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Compact binary serialization of task hierarchies.
+
+The state of a task is a dict holding the values of its preferences (with
+their own types rather than as strings), the states of its children and the
+preferences of its interface. It is serialized using the pickle protocol 2
+behind a short header holding a magic number and the version of the format.
+The loader only accepts the builtin types, sets, complex numbers and numpy
+arrays and scalars, so that loading a file cannot execute arbitrary code.
+
+"""
+import cPickle
+import struct
+from cStringIO import StringIO
+from importlib import import_module
+
+from atom.api import Dict, List
+from configobj import ConfigObj
+
+from hqc_meas.utils.atom_util import tagged_members, HasPrefAtom
+from ..base_tasks import ComplexTask, RootTask
+from ..task_interface import TaskInterface
+
+
+#: Bytes identifying the serialized states.
+MAGIC = 'HQCB'
+
+#: Version of the format, to increment when the layout of the states changes.
+VERSION = 1
+
+_HEADER = struct.Struct('<4sH')
+
+#: Globals which can be referenced by a serialized state.
+_SAFE_GLOBALS = {('__builtin__', 'set'), ('__builtin__', 'frozenset'),
+                 ('__builtin__', 'complex'),
+                 ('numpy', 'ndarray'), ('numpy', 'dtype'),
+                 ('numpy.core.multiarray', '_reconstruct'),
+                 ('numpy.core.multiarray', 'scalar')}
+
+
+def task_state(task):
+    """ Get the state of a task hierarchy.
+
+    Parameters
+    ----------
+    task : BaseTask
+        Task whose state should be captured along with the one of its
+        children.
+
+    Returns
+    -------
+    state : dict
+        Dict holding the values of the preferences ('prefs'), the states of
+        the children keyed by member names ('children') and the preferences of
+        the interface if any ('interface').
+
+    """
+    children = {}
+    for name, member in tagged_members(task, 'child').iteritems():
+        value = getattr(task, name)
+        if value is None:
+            continue
+        if isinstance(value, list):
+            children[name] = [task_state(child) for child in value]
+        else:
+            children[name] = task_state(value)
+
+    interface = getattr(task, 'interface', None)
+    if isinstance(interface, TaskInterface):
+        interface = _pref_values(interface)
+    else:
+        interface = None
+
+    return {'prefs': _pref_values(task), 'children': children,
+            'interface': interface}
+
+
+def build_task_from_state(state, dependencies, root=False):
+    """ Rebuild a task hierarchy from its state.
+
+    Parameters
+    ----------
+    state : dict
+        State of the hierarchy as returned by task_state.
+
+    dependencies : dict
+        Dictionary holding the classes needed when rebuilding. This is
+        assembled by the TaskManager.
+
+    root : bool, optional
+        Whether or not the state is the one of a RootTask.
+
+    Returns
+    -------
+    task : BaseTask
+        Newly built task.
+
+    """
+    if root:
+        task = RootTask()
+    else:
+        task = dependencies['tasks'][state['prefs']['task_class']]()
+
+    if isinstance(task, ComplexTask):
+        # Children added to a root task are all registered at the end.
+        with task.batch_build():
+            _restore(task, state, dependencies)
+    else:
+        _restore(task, state, dependencies)
+
+    return task
+
+
+def dependencies_config(state):
+    """ Build a config holding the string preferences of a hierarchy.
+
+    This config is enough to collect the build dependencies of the hierarchy
+    through the 'hqc_meas.dependencies.collect_build_dep_from_config' command.
+
+    Parameters
+    ----------
+    state : dict
+        State of the hierarchy as returned by task_state.
+
+    Returns
+    -------
+    config : ConfigObj
+        Config mirroring the structure of the one of the hierarchy.
+
+    """
+    config = ConfigObj()
+    _fill_config(config, state)
+    return config
+
+
+def is_serialized(data):
+    """ Whether or not some bytes start like a serialized state.
+
+    """
+    return data[:len(MAGIC)] == MAGIC
+
+
+def dump_state(state):
+    """ Serialize a state.
+
+    Parameters
+    ----------
+    state : dict
+        State to serialize, made only of builtin types, sets, complex numbers
+        and numpy arrays and scalars.
+
+    Returns
+    -------
+    data : str
+        Bytes holding the header and the serialized state.
+
+    """
+    return _HEADER.pack(MAGIC, VERSION) + cPickle.dumps(state, 2)
+
+
+def load_state(data):
+    """ Deserialize a state.
+
+    Parameters
+    ----------
+    data : str
+        Bytes produced by dump_state.
+
+    Returns
+    -------
+    state : dict
+        Deserialized state.
+
+    Raises
+    ------
+    ValueError :
+        If the data are not a serialized state or use an unsupported version
+        of the format.
+
+    """
+    if len(data) < _HEADER.size or not is_serialized(data):
+        raise ValueError('Data are not a serialized task state.')
+    _, version = _HEADER.unpack_from(data)
+    if version != VERSION:
+        msg = 'Unsupported task state version {} (expected {}).'
+        raise ValueError(msg.format(version, VERSION))
+
+    unpickler = cPickle.Unpickler(StringIO(data[_HEADER.size:]))
+    unpickler.find_global = _find_global
+    return unpickler.load()
+
+
+# --- Private API -------------------------------------------------------------
+
+def _pref_values(obj):
+    """ Get the values of the preferences of an object.
+
+    Atom containers are converted to builtin ones and the preferences which
+    are themselves HasPrefAtom are captured as dict.
+
+    """
+    values = {}
+    for name, member in tagged_members(obj, 'pref').iteritems():
+        value = getattr(obj, name)
+        if isinstance(value, HasPrefAtom):
+            value = _pref_values(value)
+        # Atom returns proxies for the dict members.
+        elif isinstance(member, Dict):
+            value = dict(value)
+        elif isinstance(member, List):
+            value = list(value)
+        values[name] = value
+
+    return values
+
+
+def _restore_prefs(obj, values):
+    """ Set the preferences of an object from their values.
+
+    """
+    for name in tagged_members(obj, 'pref'):
+        if name not in values:
+            continue
+        old_val = getattr(obj, name)
+        if isinstance(old_val, HasPrefAtom):
+            _restore_prefs(old_val, values[name])
+        else:
+            setattr(obj, name, values[name])
+
+
+def _restore(task, state, dependencies):
+    """ Restore the preferences, children and interface of a task.
+
+    """
+    _restore_prefs(task, state['prefs'])
+
+    for name, child_state in state['children'].iteritems():
+        if isinstance(child_state, list):
+            value = [build_task_from_state(s, dependencies)
+                     for s in child_state]
+        else:
+            value = build_task_from_state(child_state, dependencies)
+        setattr(task, name, value)
+
+    if state['interface'] is not None:
+        prefs = state['interface']
+        interface = dependencies['interfaces'][prefs['interface_class']]()
+        _restore_prefs(interface, prefs)
+        task.interface = interface
+
+
+def _fill_config(section, state):
+    """ Fill a config section with the string preferences of a task.
+
+    """
+    for name, value in state['prefs'].iteritems():
+        if isinstance(value, basestring):
+            section[name] = value
+
+    for name, child_state in state['children'].iteritems():
+        if isinstance(child_state, list):
+            for i, s in enumerate(child_state):
+                child_name = name + '_{}'.format(i)
+                section[child_name] = {}
+                _fill_config(section[child_name], s)
+        else:
+            section[name] = {}
+            _fill_config(section[name], child_state)
+
+    if state['interface'] is not None:
+        section['interface'] = {}
+        for name, value in state['interface'].iteritems():
+            if isinstance(value, basestring):
+                section['interface'][name] = value
+
+
+def _find_global(module, name):
+    """ Resolve the globals referenced by a state, rejecting unsafe ones.
+
+    """
+    if (module, name) not in _SAFE_GLOBALS:
+        msg = 'Forbidden global in task state : {}.{}'
+        raise cPickle.UnpicklingError(msg.format(module, name))
+    return getattr(import_module(module), name)
@@ -6,6 +6,9 @@
 #==============================================================================
 """
 """
+import ast
+import __builtin__
+from types import ModuleType
 from textwrap import fill
 from inspect import cleandoc
 from math import (cos, sin, tan, acos, asin, atan, sqrt, log10,
@@ -27,17 +30,422 @@ EVALUATER_TOOLTIP = '\n'.join([
     "- cos, sin, tan, acos, asin, atan, atan2",
     "- exp, log, log10, cosh, sinh, tanh, sqrt",
     "- complex math function are available under cm",
-    "- numpy function are avilable under np",
-    "- pi is available as Pi"])
+    "- common numpy function are avilable under np (and np.random,",
+    "  np.linalg, np.fft), the other members of numpy cannot be used",
+    "- pi is available as Pi",
+    "- common builtins (abs, min, max, len, range, round, ...)"])
 
 
-def safe_eval(expr, local_var=None):
+class RestrictedModule(object):
+    """ View on the members of a module which can be used in expressions.
+
+    Parameters
+    ----------
+    name : str
+        Name of the module.
+
+    members : dict
+        Members which can be accessed, keyed by name.
+
+    """
+    __slots__ = ('_name', '_members')
+
+    def __init__(self, name, members):
+        self._name = name
+        self._members = members
+
+    def __getattr__(self, name):
+        try:
+            return self._members[name]
+        except KeyError:
+            raise AttributeError(self._missing_message(name))
+
+    def _missing_message(self, name):
+        """ Message explaining that a member cannot be used.
+
+        """
+        mess = ("'{}' has no member '{}' usable in expressions (the usable "
+                "members are listed in {})")
+        return mess.format(self._name, name, __name__)
+
+    def __dir__(self):
+        return sorted(self._members)
+
+    def __repr__(self):
+        return "<restricted module '{}'>".format(self._name)
+
+
+def restrict_module(module, names, **submodules):
+    """ Build the view on some members of a module.
+
+    Parameters
+    ----------
+    module : module
+        Module whose members should be exposed.
+
+    names : iterable(str)
+        Names of the members to expose.
+
+    submodules : RestrictedModule
+        Views on the submodules to expose.
+
+    """
+    members = {name: getattr(module, name) for name in names}
+    members.update(submodules)
+    return RestrictedModule(module.__name__, members)
+
+
+#: Builtins which can be used in the evaluated expressions.
+SAFE_BUILTINS = {name: getattr(__builtin__, name)
+                 for name in ('abs', 'all', 'any', 'bin', 'bool', 'chr',
+                              'cmp', 'complex', 'dict', 'divmod', 'enumerate',
+                              'filter', 'float', 'format', 'frozenset', 'hex',
+                              'int', 'isinstance', 'iter', 'len', 'list',
+                              'long', 'map', 'max', 'min', 'next', 'oct',
+                              'ord', 'pow', 'range', 'reduce', 'repr',
+                              'reversed', 'round', 'set', 'slice', 'sorted',
+                              'str', 'sum', 'tuple', 'unichr', 'unicode',
+                              'xrange', 'zip', 'True', 'False', 'None')}
+
+#: Members of numpy which can be used in the evaluated expressions.
+NUMPY_NAMES = (
+    # Constants and types.
+    'pi', 'e', 'inf', 'nan', 'newaxis', 'bool_', 'int8', 'int16', 'int32',
+    'int64', 'uint8', 'uint16', 'uint32', 'uint64', 'float32', 'float64',
+    'complex64', 'complex128', 'float_', 'int_', 'complex_',
+    # Elementwise functions.
+    'abs', 'absolute', 'sign', 'sqrt', 'cbrt', 'square', 'reciprocal',
+    'negative', 'add', 'subtract', 'multiply', 'divide', 'power', 'exp',
+    'exp2', 'logaddexp', 'greater', 'greater_equal', 'less', 'less_equal',
+    'equal', 'not_equal',
+    'expm1', 'log', 'log2', 'log10', 'log1p', 'sin', 'cos', 'tan', 'arcsin',
+    'arccos', 'arctan', 'arctan2', 'sinh', 'cosh', 'tanh', 'arcsinh',
+    'arccosh', 'arctanh', 'hypot', 'deg2rad', 'rad2deg', 'degrees',
+    'radians', 'unwrap', 'floor', 'ceil', 'rint', 'trunc', 'fix', 'round',
+    'around', 'mod', 'fmod', 'remainder', 'floor_divide', 'true_divide',
+    'real', 'imag', 'conj', 'conjugate', 'angle', 'maximum', 'minimum',
+    'fmax', 'fmin', 'clip', 'isnan', 'isinf', 'isfinite', 'nan_to_num',
+    'logical_and', 'logical_or', 'logical_not', 'logical_xor', 'heaviside',
+    'sinc', 'isreal', 'iscomplex', 'isscalar', 'real_if_close',
+    # Reductions and statistics.
+    'sum', 'prod', 'cumsum', 'cumprod', 'mean', 'average', 'median', 'std',
+    'var', 'min', 'max', 'amin', 'amax', 'ptp', 'argmin', 'argmax', 'any',
+    'all', 'count_nonzero', 'nansum', 'nanprod', 'nancumsum', 'nanmean',
+    'nanmedian', 'nanstd', 'nanvar', 'nanmin', 'nanmax', 'nanargmin',
+    'nanargmax', 'percentile', 'nanpercentile', 'quantile', 'corrcoef',
+    'cov', 'correlate', 'allclose', 'isclose', 'array_equal', 'trapz',
+    'diff', 'ediff1d', 'gradient', 'bincount', 'digitize', 'histogram',
+    'histogram2d',
+    # Creation and manipulation of arrays.
+    'array', 'asarray', 'copy', 'zeros', 'ones', 'empty', 'full',
+    'zeros_like', 'ones_like', 'full_like', 'eye', 'identity', 'diag',
+    'diagonal', 'trace', 'arange', 'linspace', 'logspace', 'geomspace',
+    'meshgrid', 'mgrid', 'ogrid', 'r_', 'c_', 'concatenate', 'hstack',
+    'vstack', 'column_stack', 'stack', 'split', 'array_split', 'tile',
+    'repeat', 'append', 'insert', 'delete', 'take', 'reshape', 'ravel',
+    'squeeze', 'expand_dims', 'atleast_1d', 'atleast_2d', 'transpose',
+    'swapaxes', 'moveaxis', 'shape', 'size', 'ndim', 'flip', 'fliplr',
+    'flipud', 'rot90', 'roll', 'sort', 'argsort', 'unique', 'in1d',
+    'intersect1d', 'union1d', 'setdiff1d', 'where', 'select', 'nonzero',
+    'argwhere', 'flatnonzero', 'searchsorted', 'interp', 'convolve', 'dot',
+    'matmul', 'tensordot', 'kron', 'cross', 'inner', 'outer', 'polyfit',
+    'polyval', 'polyder', 'polyint', 'roots')
+
+#: Members of numpy.random which can be used in the evaluated expressions.
+NUMPY_RANDOM_NAMES = ('rand', 'randn', 'randint', 'random', 'uniform',
+                      'normal', 'choice', 'permutation')
+
+#: Members of numpy.linalg which can be used in the evaluated expressions.
+NUMPY_LINALG_NAMES = ('norm', 'det', 'inv', 'pinv', 'solve', 'eig', 'eigh',
+                      'eigvals', 'eigvalsh', 'svd')
+
+#: Members of numpy.fft which can be used in the evaluated expressions.
+NUMPY_FFT_NAMES = ('fft', 'ifft', 'rfft', 'irfft', 'fft2', 'ifft2',
+                   'fftfreq', 'rfftfreq', 'fftshift', 'ifftshift')
+
+
+def _guarded_getattr(obj, name):
+    """ Access an attribute in an expression, refusing to return a module.
+
     """
+    value = getattr(obj, name)
+    if isinstance(value, ModuleType):
+        mess = 'Module {} cannot be accessed in expressions'
+        raise AttributeError(mess.format(value.__name__))
+    return value
+
+
+#: Namespace in which the expressions are evaluated. Numpy and cmath are
+#: only exposed through views on their functions and constants as their
+#: submodules give access to the whole interpreter.
+EVAL_NAMESPACE = {
+    '__builtins__': SAFE_BUILTINS, '__getattr': _guarded_getattr,
+    'cos': cos, 'sin': sin, 'tan': tan, 'acos': acos, 'asin': asin,
+    'atan': atan, 'atan2': atan2, 'exp': exp, 'log': log, 'log10': log10,
+    'cosh': cosh, 'sinh': sinh, 'tanh': tanh, 'sqrt': sqrt, 'Pi': Pi,
+    'np': restrict_module(
+        np, NUMPY_NAMES,
+        random=restrict_module(np.random, NUMPY_RANDOM_NAMES),
+        linalg=restrict_module(np.linalg, NUMPY_LINALG_NAMES),
+        fft=restrict_module(np.fft, NUMPY_FFT_NAMES)),
+    # cmath only holds functions and constants.
+    'cm': restrict_module(cm, [name for name in dir(cm)
+                               if not name.startswith('_')])}
+
+#: Prefixes of the attributes of the functions, methods, generators, frames
+#: and code objects which give access to their internals.
+FORBIDDEN_PREFIXES = ('func_', 'im_', 'gi_', 'f_', 'tb_', 'co_')
+
+#: Nodes which can appear in an evaluated expression.
+ALLOWED_NODES = (ast.Expression, ast.BoolOp, ast.BinOp, ast.UnaryOp,
+                 ast.IfExp, ast.Dict, ast.Set, ast.Compare, ast.Call,
+                 ast.keyword, ast.Num, ast.Str, ast.Attribute, ast.Subscript,
+                 ast.Name, ast.List, ast.Tuple, ast.Index, ast.Slice,
+                 ast.ExtSlice, ast.Ellipsis, ast.ListComp, ast.SetComp,
+                 ast.DictComp, ast.GeneratorExp, ast.comprehension, ast.Load,
+                 ast.Store, ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+
+
+def parse_expression(expr):
+    """ Parse an expression and check it only uses allowed constructs.
+
+    Only expressions can be used (no lambda, yield, backquotes, ...),
+    private attributes and names (starting with an underscore) and the
+    internals of functions and frames cannot be accessed and attributes
+    cannot be assigned.
+
+    Parameters
+    ----------
+    expr : str
+        Expression to parse.
+
+    Returns
+    -------
+    tree : ast.Expression
+        Syntax tree of the expression.
+
+    Raises
+    ------
+    SyntaxError :
+        If the expression is invalid or uses a forbidden construct.
+
+    """
+    tree = ast.parse(expr.strip(), mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            mess = '{} are not allowed in expressions : {}'
+            raise SyntaxError(mess.format(type(node).__name__, expr))
+        if isinstance(node, ast.Attribute):
+            if node.attr.startswith('_'):
+                mess = 'Private attribute {} cannot be accessed : {}'
+                raise SyntaxError(mess.format(node.attr, expr))
+            if node.attr.startswith(FORBIDDEN_PREFIXES):
+                mess = 'Attribute {} cannot be accessed : {}'
+                raise SyntaxError(mess.format(node.attr, expr))
+            if not isinstance(node.ctx, ast.Load):
+                mess = 'Attribute {} cannot be assigned : {}'
+                raise SyntaxError(mess.format(node.attr, expr))
+        if isinstance(node, ast.Name) and node.id.startswith('__'):
+            mess = 'Private name {} cannot be accessed : {}'
+            raise SyntaxError(mess.format(node.id, expr))
+
+    return tree
+
+
+def safe_eval(expr, local_var=None):
+    """ Evaluate an expression in the restricted namespace.
+
+    Parameters
+    ----------
+    expr : str
+        Expression to evaluate. Purely alphabetic strings are returned as is.
+
+    local_var : dict, optional
+        Values of the variables used in the expression.
+
     """
     if expr.isalpha():
         return expr
 
-    if local_var:
-        return eval(expr, globals(), local_var)
-    else:
-        return eval(expr)
+    local_var = local_var or {}
+    names = list(local_var)
+    return compile_eval(expr, names)(*[local_var[n] for n in names])
+
+
+def compile_eval(expr, names=()):
+    """ Compile an expression into a function.
+
+    The expression is checked by parse_expression and compiled as the body of
+    a function taking the values of the variables used in the expression as
+    positional arguments. The function is evaluated in the restricted
+    namespace holding the math functions and views on numpy (np) and cmath
+    (cm). The members of the views used in the expression are looked up once
+    when compiling and the other attribute accesses are checked not to
+    return a module.
+
+    Parameters
+    ----------
+    expr : str
+        Expression to compile.
+
+    names : iterable(str), optional
+        Names of the variables used in the expression, in the order in which
+        their values will be passed to the function.
+
+    Returns
+    -------
+    func : callable
+        Function evaluating the expression.
+
+    """
+    if expr.isalpha():
+        return lambda *args: expr
+
+    tree = parse_expression(expr)
+    resolver = _AttributeResolver(names, tree)
+    body = resolver.visit(tree.body)
+    args = ast.arguments(args=[ast.Name(id=name, ctx=ast.Param())
+                               for name in names],
+                         vararg=None, kwarg=None, defaults=[])
+    func = ast.Expression(body=ast.Lambda(args=args, body=body))
+    ast.fix_missing_locations(func)
+    namespace = EVAL_NAMESPACE
+    if resolver.members:
+        namespace = dict(EVAL_NAMESPACE, **resolver.members)
+    return eval(compile(func, '<expression>', 'eval'), namespace)
+
+
+class _AttributeResolver(ast.NodeTransformer):
+    """ Rewrite the attribute accesses of an expression.
+
+    The accesses to the members of the restricted modules are replaced by
+    names bound to the members, the other ones by calls to the guarded
+    getattr.
+
+    """
+    def __init__(self, names, tree):
+        # Names which shadow the namespace.
+        self.local_names = set(names)
+        self.local_names.update(node.id for node in ast.walk(tree)
+                                if isinstance(node, ast.Name) and
+                                isinstance(node.ctx, ast.Store))
+        #: Members of the restricted modules used by the expression.
+        self.members = {}
+
+    def visit_Attribute(self, node):
+        member = self._resolve(node)
+        if member is not None:
+            name = '__member{}'.format(len(self.members))
+            self.members[name] = member
+            return ast.copy_location(ast.Name(id=name, ctx=ast.Load()), node)
+
+        self.generic_visit(node)
+        call = ast.Call(func=ast.Name(id='__getattr', ctx=ast.Load()),
+                        args=[node.value, ast.Str(s=node.attr)],
+                        keywords=[], starargs=None, kwargs=None)
+        return ast.copy_location(call, node)
+
+    def _resolve(self, node):
+        """ Get the object a node refers to if it is a member of a restricted
+        module, None otherwise.
+
+        """
+        if isinstance(node, ast.Name):
+            if node.id in self.local_names:
+                return None
+            return EVAL_NAMESPACE.get(node.id)
+        elif isinstance(node, ast.Attribute):
+            parent = self._resolve(node.value)
+            if isinstance(parent, RestrictedModule):
+                # Unavailable members are reported when compiling so that
+                # the tasks using them fail their checks.
+                if node.attr not in parent._members:
+                    raise AttributeError(parent._missing_message(node.attr))
+                return parent._members[node.attr]
+        return None
+
+
+def vectorize_eval(func, values):
+    """ Evaluate a compiled expression on all the values of a sweep at once.
+
+    Parameters
+    ----------
+    func : callable
+        Function returned by compile_eval taking a single argument.
+
+    values : numpy.ndarray
+        One dimensional array of the values taken by the argument.
+
+    Returns
+    -------
+    results : numpy.ndarray or None
+        Result of the expression for each value or None if the expression
+        does not support being evaluated on an array or if the results differ
+        from the ones obtained value by value.
+
+    """
+    if not isinstance(values, np.ndarray) or values.ndim != 1 or\
+            not len(values) or values.dtype.kind not in 'biufc':
+        return None
+
+    try:
+        results = func(values)
+    except Exception:
+        return None
+
+    if not isinstance(results, np.ndarray) or\
+            results.shape != values.shape or results.dtype.kind == 'O':
+        return None
+
+    # Check the results on some values against the scalar evaluation.
+    for i in set((0, len(values)//2, len(values) - 1)):
+        try:
+            expected = func(values[i])
+        except Exception:
+            return None
+        if type(expected) is not type(results[i]) or\
+                not expected == results[i]:
+            return None
+
+    return results
+
+
+#: Names which can appear in an expression whose value is constant.
+CONSTANT_NAMES = frozenset(('cos', 'sin', 'tan', 'acos', 'asin', 'atan',
+                            'sqrt', 'log10', 'exp', 'log', 'cosh', 'sinh',
+                            'tanh', 'atan2', 'Pi', 'True', 'False', 'None',
+                            'abs', 'int', 'float', 'complex', 'round', 'min',
+                            'max'))
+
+#: Nodes which can appear in an expression whose value is constant.
+CONSTANT_NODES = (ast.Expression, ast.Num, ast.Str, ast.Name, ast.Load,
+                  ast.Tuple, ast.BinOp, ast.UnaryOp, ast.BoolOp, ast.Compare,
+                  ast.Call, ast.operator, ast.unaryop, ast.boolop, ast.cmpop)
+
+#: Types of the results of constant expressions which can be safely cached.
+CONSTANT_TYPES = (int, long, float, complex, bool, basestring, np.number,
+                  np.bool_)
+
+
+def is_constant(expr):
+    """ Determine whether an expression always evaluates to the same value.
+
+    Only expressions made of literals and of calls to the math functions
+    (and a few builtins) are considered constant.
+
+    """
+    try:
+        tree = ast.parse(expr.strip(), mode='eval')
+    except SyntaxError:
+        return False
+
+    for node in ast.walk(tree):
+        if not isinstance(node, CONSTANT_NODES):
+            return False
+        if isinstance(node, ast.Name) and node.id not in CONSTANT_NAMES:
+            return False
+        if isinstance(node, ast.Call) and (node.keywords or node.starargs or
+                                           node.kwargs):
+            return False
+
+    return True
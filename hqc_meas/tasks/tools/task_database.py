@@ -6,8 +6,33 @@
 # =============================================================================
 """
 """
-from atom.api import Atom, Dict, Bool, Value, Event, List, Str, Typed
+from atom.api import (Atom, Dict, Bool, Value, Event, List, ContainerList,
+                      Str, Typed, Int)
 from threading import Lock
+from timeit import default_timer
+from itertools import izip, count
+from operator import itemgetter
+import os
+import cPickle
+import numpy as np
+
+from .database_journal import JournalWriter
+
+
+#: Types of the values which can be stored in the numeric part of the flat
+#: database, grouped by the numpy dtype used to store them.
+NUMERIC_TYPES = ((np.dtype('float64'), (float, np.float64)),
+                 (np.dtype('int64'), (int, long, np.int64)),
+                 (np.dtype('complex128'), (complex, np.complex128)))
+
+
+#: Version of the format used to save checkpoints.
+CHECKPOINT_VERSION = 1
+
+
+#: Placeholder stored in the regular storage for the entries whose value is
+#: stored in the numeric buffer.
+NUMERIC_PLACEHOLDER = object()
 
 
 class DatabaseNode(Atom):
@@ -19,6 +44,163 @@ class DatabaseNode(Atom):
     meta = Dict()
 
 
+#: Maximal number of flat database layouts kept in cache.
+LAYOUTS_CACHE_SIZE = 16
+
+#: Layouts of the databases recently flattened, the most recent last.
+_LAYOUTS_CACHE = []
+
+#: Lock protecting the access to the layouts cache.
+_LAYOUTS_LOCK = Lock()
+
+
+def _flatten(root):
+    """ Flatten a database using a cached layout when one matches it.
+
+    A layout describes each node by its parent, its name, the number of keys
+    it holds, the names of its entries and its access exceptions. Checking
+    that a database matches a layout and collecting its values only costs a
+    few operations per node, the entries of a node being fetched at once.
+    The paths and the path to index mapping of the layout are hence built
+    only once for identically structured databases (such as the ones of a
+    queue of measures built from the same template).
+
+    Parameters
+    ----------
+    root : DatabaseNode
+        Root node of the database.
+
+    Returns
+    -------
+    datas : list
+        Values of the entries, in the order of the flat database.
+
+    paths : list(str)
+        Full paths of the entries, in the same order. This list is shared and
+        should not be modified.
+
+    mapping : dict
+        Dict mapping the paths (including the access exceptions) to indexes.
+        This dict is shared and should not be modified.
+
+    """
+    key = frozenset(root.data)
+    with _LAYOUTS_LOCK:
+        candidates = [layout for layout in reversed(_LAYOUTS_CACHE)
+                      if layout[0] == key]
+
+    for layout in candidates:
+        datas = _read_layout(root, layout[1])
+        if datas is not None:
+            with _LAYOUTS_LOCK:
+                if layout in _LAYOUTS_CACHE:
+                    _LAYOUTS_CACHE.remove(layout)
+                _LAYOUTS_CACHE.append(layout)
+            return datas, layout[2], layout[3]
+
+    datas, nodes, paths, mapping = _build_layout(root)
+    with _LAYOUTS_LOCK:
+        _LAYOUTS_CACHE.append((key, nodes, paths, mapping))
+        del _LAYOUTS_CACHE[:-LAYOUTS_CACHE_SIZE]
+
+    return datas, paths, mapping
+
+
+def _build_layout(root):
+    """ Walk all the nodes of a database to build its flat layout.
+
+    Returns
+    -------
+    datas : list
+        Values of the entries.
+
+    nodes : list(tuple)
+        Description of the nodes, as tuples (index of the parent node, name,
+        number of keys, getter of the entries values, number of entries,
+        access exceptions).
+
+    paths : list(str)
+        Full paths of the entries.
+
+    mapping : dict
+        Dict mapping the paths (including the access exceptions) to indexes.
+
+    """
+    # Flattening the database by walking all the nodes, and collecting
+    # the access exceptions.
+    to_visit = [(-1, None, 'root', root)]
+    nodes = []
+    paths = []
+    datas = []
+    exceptions = []
+    for (parent, name, node_path, node) in to_visit:
+        index = len(nodes)
+        entries = []
+        for key, val in node.data.iteritems():
+            path = node_path + '/' + key
+            if isinstance(val, DatabaseNode):
+                to_visit.append((index, key, path, val))
+            else:
+                entries.append(key)
+                paths.append(path)
+                datas.append(val)
+        access = node.meta.get('access')
+        if access is not None:
+            access = dict(access)
+            exceptions.extend((node_path, entry, entry_node)
+                              for entry, entry_node in access.iteritems())
+        getter = itemgetter(*entries) if entries else None
+        nodes.append((parent, name, len(node.data), getter, len(entries),
+                      access))
+
+    mapping = dict(izip(paths, count()))
+    # Access exceptions are resolved in reverse order in case an entry has
+    # multiple exceptions.
+    for node_path, entry, entry_node in reversed(exceptions):
+        full_path = entry_node + '/' + entry
+        mapping[node_path + '/' + entry] = mapping[full_path]
+
+    return datas, nodes, paths, mapping
+
+
+def _read_layout(root, nodes):
+    """ Collect the values of a database following the description of its
+    nodes.
+
+    Returns None if the database does not have exactly the described
+    structure. As the number of keys of each node is checked, finding all the
+    described entries and children nodes ensures there is no other.
+
+    """
+    visited = []
+    datas = []
+    for parent, name, size, getter, n_entries, access in nodes:
+        if parent < 0:
+            node = root
+        else:
+            node = visited[parent].data.get(name)
+            if type(node) is not DatabaseNode:
+                return None
+        data = node.data
+        if len(data) != size or node.meta.get('access') != access:
+            return None
+        visited.append(node)
+        if getter is None:
+            continue
+        try:
+            values = getter(data)
+        except KeyError:
+            return None
+        if n_entries == 1:
+            values = (values,)
+        # An entry may have been replaced by a node with the same name.
+        if DatabaseNode in map(type, values):
+            return None
+        datas.extend(values)
+
+    return datas
+
+
 class TaskDatabase(Atom):
     """ A database for inter tasks communication.
 
@@ -28,22 +210,35 @@ class TaskDatabase(Atom):
         - a running mode in which the entries are fixed (only their values can
         change). In this mode the database is represented as a flat list.
         In running mode the database is thread safe but the object it contains
-        may not be so (dict, list, etc)
+        may not be so (dict, list, etc). Each slot of the flat list has its
+        own lock and version counter so that writes to different entries never
+        contend, and reads of several entries return a consistent snapshot.
 
     """
     # --- Public API ----------------------------------------------------------
 
     #: Event used to notify a value changed in the database. Thye update is
-    #: passed as a tuple (path, value)
+    #: passed as a tuple (path, value). In running mode, once some entries
+    #: are watched (see watch_entries) the notifier is fired only for those.
     notifier = Event()
 
-    #: List of root entries which should not be listed.
-    excluded = List(Str(), ['threads', 'instrs'])
+    #: List of root entries which should not be listed. In place
+    #: modifications are observed so that the listings stay up to date.
+    excluded = ContainerList(Str(), ['threads', 'instrs'])
 
     #: Flag indicating whether or not the database entered the running mode. In
     #: running mode the database is flattened into a list for faster acces.
     running = Bool(False)
 
+    #: Flag indicating whether or not to store the numeric scalars in a
+    #: contiguous array in running mode. The entries concerned are the ones
+    #: holding a float, an int or a complex when the database enters the
+    #: running mode (ie usually the default values declared by the tasks).
+    #: An entry is moved back to the regular storage if it is later given a
+    #: value of another type. This must be set before calling
+    #: prepare_for_running and cannot be changed in running mode.
+    numeric_layout = Bool(False)
+
     def set_value(self, node_path, value_name, value):
         """Method used to set the value of the entry at the specified path
 
@@ -71,17 +266,14 @@ class TaskDatabase(Atom):
         new_val = False
         if self.running:
             full_path = node_path + '/' + value_name
-            index = self._entry_index_map[full_path]
-            self._lock.acquire()
-            self._flat_database[index] = value
-            self.notifier = (node_path + '/' + value_name, value)
-            self._lock.release()
+            self._set_slot(self._entry_index_map[full_path], full_path, value)
         else:
             node = self._go_to_path(node_path)
             if value_name not in node.data:
                 new_val = True
             node.data[value_name] = value
             if new_val:
+                self._accessible_cache.clear()
                 self.notifier = (node_path + '/' + value_name, value)
 
         return new_val
@@ -109,7 +301,7 @@ class TaskDatabase(Atom):
         """
         if self.running:
             index = self._find_index(assumed_path, value_name)
-            return self._flat_database[index]
+            return self._read_slot(index)
 
         else:
             node = self._go_to_path(assumed_path)
@@ -155,6 +347,7 @@ class TaskDatabase(Atom):
 
             if value_name in node.data:
                 del node.data[value_name]
+                self._accessible_cache.clear()
                 self.notifier = (node_path + '/' + value_name,)
             else:
                 err_str = 'No entry {} in node {}'.format(value_name,
@@ -179,11 +372,103 @@ class TaskDatabase(Atom):
             List of requested values in the same order as indexes or dict if
             prefix was not None.
 
+        Notes
+        -----
+        The returned values form a consistent snapshot : no entry was
+        modified between the moment the first and the last values were read.
+
         """
+        values = self._read_slots(indexes)
         if prefix is None:
-            return [self._flat_database[i] for i in indexes]
+            return values
         else:
-            return {prefix + str(i): self._flat_database[i] for i in indexes}
+            return {prefix + str(i): v for i, v in zip(indexes, values)}
+
+    def get_paths_by_index(self, indexes):
+        """ Access to the full paths of some entries of the flat database.
+
+        Parameters
+        ----------
+        indexes : iterable(int)
+            Indexes of the entries whose paths should be returned.
+
+        Returns
+        -------
+        paths : list(str)
+            Full paths of the entries in the same order as indexes.
+
+        """
+        paths = self._slot_paths
+        return [paths[i] for i in indexes]
+
+    def get_versions_by_index(self, indexes):
+        """ Access to the version counters of some entries of the flat
+        database.
+
+        The version of an entry is incremented each time the entry is written,
+        comparing versions is hence a cheap way to detect a modification.
+
+        Parameters
+        ----------
+        indexes : list(int)
+            List of index for which versions should be returned.
+
+        Returns
+        -------
+        versions : list(int)
+            List of the versions in the same order as indexes.
+
+        """
+        versions = self._slot_versions
+        return [versions[i] // 2 for i in indexes]
+
+    def get_snapshot(self):
+        """ Get a copy of the whole flat database.
+
+        When the numeric layout is used the numeric entries are copied in a
+        single operation.
+
+        Returns
+        -------
+        snapshot : tuple
+            Tuple holding a copy of the numeric storage (None if the numeric
+            layout is not used) and a copy of the regular storage. The values
+            can be retrieved using expand_snapshot.
+
+        """
+        versions = self._slot_versions
+        buff = self._numeric_buffer
+        while True:
+            before = list(versions)
+            snapshot = (buff.copy() if buff is not None else None,
+                        list(self._flat_database))
+            if before == versions and not any(v & 1 for v in before):
+                return snapshot
+
+    def expand_snapshot(self, snapshot):
+        """ Extract the values stored in a snapshot.
+
+        Parameters
+        ----------
+        snapshot : tuple
+            Snapshot of the database as returned by get_snapshot.
+
+        Returns
+        -------
+        values : list
+            Values of all the entries in the order of the flat database.
+
+        """
+        buff, values = snapshot
+        values = list(values)
+        if buff is not None:
+            views = [np.frombuffer(buff, dtype, count, offset)
+                     for dtype, count, offset in self._numeric_regions]
+            for i, value in enumerate(values):
+                if value is NUMERIC_PLACEHOLDER:
+                    k, pos = self._numeric_positions[i]
+                    values[i] = views[k].item(pos)
+        return values
 
     def get_entries_indexes(self, assumed_path, entries):
         """ Access to the index in the flattened database for some entries.
@@ -206,6 +491,224 @@ class TaskDatabase(Atom):
         return {name: self._find_index(assumed_path, name)
                 for name in entries}
 
+    def get_entry_accessor(self, assumed_path, entry):
+        """ Get an accessor object giving fast access to an entry.
+
+        In running mode the accessor is bound to the slot of the entry in the
+        flat database so that reading or writing the entry does not require
+        any lookup. In edition mode the accessor simply relies on get_value
+        and set_value.
+
+        Parameters
+        ----------
+        assumed_path : str
+            Path where we start looking for the entry.
+
+        entry : str
+            Name of the entry.
+
+        Returns
+        -------
+        accessor : EntryAccessor
+            Accessor whose read and write methods can be used to access the
+            entry.
+
+        """
+        if self.running:
+            full_path, index = self._find_entry(assumed_path, entry)
+            return EntryAccessor(database=self, path=full_path, index=index)
+        else:
+            return EntryAccessor(database=self,
+                                 path=assumed_path + '/' + entry)
+
+    def watch_entries(self, entries):
+        """ Declare entries whose modifications should be notified in running
+        mode.
+
+        As long as this method has never been called all modifications are
+        notified. Once it has, writing an entry which is not watched in running
+        mode does not fire the notifier. This method can be called several
+        times, before or after entering the running mode, and only affects
+        the running mode.
+
+        Parameters
+        ----------
+        entries : iterable(str)
+            Full paths of the entries to watch.
+
+        """
+        if self._watched_entries is None:
+            self._watched_entries = set()
+        self._watched_entries.update(entries)
+        if self.running:
+            self._watched_slots = self._build_watched_slots()
+
+    def enable_history(self, path, size):
+        """ Keep the last values written to an entry in running mode.
+
+        The values are stored in preallocated buffers along with the time at
+        which they were written (as given by timeit.default_timer). Only the
+        values written in running mode are recorded.
+
+        Parameters
+        ----------
+        path : str
+            Full path of the entry.
+
+        size : int
+            Maximal number of values to keep, at least 1.
+
+        """
+        if size < 1:
+            mess = 'History size of entry {} must be at least 1, not {}'
+            raise ValueError(mess.format(path, size))
+        self._history_sizes[path] = size
+        if self.running:
+            self._slot_histories = self._build_histories()
+
+    def get_history(self, path, start=None, stop=None):
+        """ Access to the last values written to an entry.
+
+        Parameters
+        ----------
+        path : str
+            Full path of the entry, whose history must have been enabled.
+
+        start : int, optional
+            Number of the first write to return, the first write in running
+            mode being 0. Negative numbers are counted from the last write.
+            By default the oldest write still in the history is used.
+
+        stop : int, optional
+            Number of the write at which to stop (excluded). Negative numbers
+            are counted from the last write. By default the last write is the
+            last one returned.
+
+        Returns
+        -------
+        timestamps : numpy.ndarray
+            Time at which each value was written.
+
+        values : numpy.ndarray
+            Values written to the entry.
+
+        Both arrays are views on the history buffers and will be overwritten
+        by subsequent writes.
+
+        """
+        history = None
+        if self.running and self._slot_histories:
+            history = self._slot_histories[self._entry_index_map[path]]
+        if history is None:
+            raise KeyError('No history for entry {}'.format(path))
+        return history.get(start, stop)
+
+    def start_journal(self, path):
+        """ Record all the subsequent writes in an append-only journal file.
+
+        The journal starts with the current content of the flat database and
+        is then made of one binary record (timestamp, slot index, slot
+        version, value) per write. It can be read back using the functions of
+        the database_journal module. Only available in running mode.
+
+        Parameters
+        ----------
+        path : unicode
+            Path of the file in which to write the journal.
+
+        """
+        if not self.running:
+            raise RuntimeError('Journal can only be used in running mode.')
+        self.stop_journal()
+        snapshot = self.expand_snapshot(self.get_snapshot())
+        self._journal = JournalWriter(path, self._slot_paths, snapshot)
+
+    def stop_journal(self):
+        """ Stop recording the writes and close the journal file.
+
+        """
+        journal = self._journal
+        if journal is not None:
+            self._journal = None
+            journal.close()
+
+    def save_checkpoint(self, path, infos=None):
+        """ Persist the content of the flat database to a file.
+
+        The file is written using the pickle binary protocol and atomically
+        replaces any existing checkpoint. Values which cannot be pickled are
+        not saved. Only available in running mode.
+
+        Parameters
+        ----------
+        path : unicode
+            Path of the checkpoint file.
+
+        infos : dict, optional
+            Additional informations to store along the values of the entries.
+
+        """
+        if not self.running:
+            raise RuntimeError('Checkpoints can only be saved in running '
+                               'mode.')
+        values = self.expand_snapshot(self.get_snapshot())
+        data = {'version': CHECKPOINT_VERSION, 'infos': infos,
+                'values': dict(izip(self._slot_paths, values))}
+        try:
+            dump = cPickle.dumps(data, 2)
+        except Exception:
+            saved = data['values']
+            for path_, value in saved.items():
+                try:
+                    cPickle.dumps(value, 2)
+                except Exception:
+                    del saved[path_]
+            dump = cPickle.dumps(data, 2)
+
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(dump)
+            f.flush()
+            os.fsync(f.fileno())
+        # Windows does not allow to rename a file over an existing one.
+        if os.name == 'nt' and os.path.isfile(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+    def load_checkpoint(self, path):
+        """ Restore the content of the flat database from a checkpoint.
+
+        Entries which do not exist in the database are ignored. Restored
+        values are notified as any other write. Only available in running
+        mode.
+
+        Parameters
+        ----------
+        path : unicode
+            Path of the checkpoint file.
+
+        Returns
+        -------
+        infos : dict or None
+            Additional informations stored along the values.
+
+        """
+        if not self.running:
+            raise RuntimeError('Checkpoints can only be loaded in running '
+                               'mode.')
+        with open(path, 'rb') as f:
+            data = cPickle.load(f)
+        if data.get('version', 0) > CHECKPOINT_VERSION:
+            mess = 'Unsupported checkpoint version {}'
+            raise ValueError(mess.format(data['version']))
+
+        index_map = self._entry_index_map
+        for full_path, value in data['values'].iteritems():
+            if full_path in index_map:
+                self._set_slot(index_map[full_path], full_path, value)
+
+        return data['infos']
+
     def list_accessible_entries(self, node_path):
         """ Method used to get a list of all entries accessible from a node.
 
@@ -224,39 +727,31 @@ class TaskDatabase(Atom):
             List of entries accessible from the specified node
 
         """
-        entries = []
-        while node_path != 'root':
-            node = self._go_to_path(node_path)
-            keys = node.data.keys()
+        cache = self._accessible_cache
+        if node_path in cache:
+            return list(cache[node_path])
+
+        entries = set()
+        path = node_path
+        while True:
+            node = self._go_to_path(path)
             # Looking for the entries in the node.
-            for key in keys:
-                if not isinstance(node.data[key], DatabaseNode):
-                    entries.append(key)
+            entries.update(key for key, val in node.data.iteritems()
+                           if not isinstance(val, DatabaseNode))
 
-            # Adding the special access if they are not already in the list.
-            for entry in node.meta.get('access', []):
-                if entry not in entries:
-                    entries.append(entry)
+            # Adding the special access.
+            entries.update(node.meta.get('access', ()))
 
+            if path == 'root':
+                break
             # Going to the next node.
-            node_path = node_path.rpartition('/')[0]
-
-        node = self._go_to_path(node_path)
-        keys = node.data.keys()
-        for key in keys:
-            if not isinstance(node.data[key], DatabaseNode):
-                entries.append(key)
-
-        # Adding the special access if they are not already in the list.
-        for entry in node.meta.get('access', []):
-            if entry not in entries:
-                entries.append(entry)
+            path = path.rpartition('/')[0]
 
-        for entry in self.excluded:
-            if entry in entries:
-                entries.remove(entry)
+        entries.difference_update(self.excluded)
 
-        return sorted(entries)
+        accessible = sorted(entries)
+        cache[node_path] = accessible
+        return list(accessible)
 
     def list_all_entries(self, path='root', values=False):
         """ List all entries in the database.
@@ -324,6 +819,7 @@ class TaskDatabase(Atom):
             access_exceptions[entry] = entry_node
         else:
             node.meta['access'] = {entry: entry_node}
+        self._accessible_cache.clear()
 
     def remove_access_exception(self, node_path, entry=''):
         """ Remove an access exception from a node for a given entry.
@@ -344,6 +840,7 @@ class TaskDatabase(Atom):
             del access_exceptions[entry]
         else:
             del node.meta['access']
+        self._accessible_cache.clear()
 
     def create_node(self, parent_path, node_name):
         """Method used to create a new node in the database
@@ -366,6 +863,8 @@ class TaskDatabase(Atom):
             raise RuntimeError('Cannot create a node in running mode')
 
         parent_node = self._go_to_path(parent_path)
+        if node_name in parent_node.data:
+            self._clear_edition_caches()
         parent_node.data[node_name] = DatabaseNode()
 
     def rename_node(self, parent_path, new_name, old_name):
@@ -391,6 +890,7 @@ class TaskDatabase(Atom):
         parent_node = self._go_to_path(parent_path)
         parent_node.data[new_name] = parent_node.data[old_name]
         del parent_node.data[old_name]
+        self._clear_edition_caches()
 
     def delete_node(self, parent_path, node_name):
         """Method used to an existing node from the database
@@ -415,6 +915,7 @@ class TaskDatabase(Atom):
         parent_node = self._go_to_path(parent_path)
         if node_name in parent_node.data:
             del parent_node.data[node_name]
+            self._clear_edition_caches()
         else:
             err_str = 'No node {} at the path {}'.format(node_name,
                                                          parent_path)
@@ -423,46 +924,39 @@ class TaskDatabase(Atom):
     def prepare_for_running(self):
         """ Enter a thread safe, flat database state.
 
-        This is used when tasks are executed.
+        This is used when tasks are executed. The layout of the flat database
+        is cached and reused for identically structured databases.
 
         """
-        self._lock = Lock()
         self.running = True
 
-        # Flattening the database by walking all the nodes.
-        index = 0
-        nodes = [('root', self._database)]
-        mapping = {}
-        datas = []
-        for (node_path, node) in nodes:
-            for key, val in node.data.iteritems():
-                path = node_path + '/' + key
-                if isinstance(val, DatabaseNode):
-                    nodes.append((path, val))
-                else:
-                    mapping[path] = index
-                    index += 1
-                    datas.append(val)
-
-        # Walking a second time to add the exception to the _entry_index_map,
-        # in reverse order in case an entry has multiple exceptions.
-        for (node_path, node) in nodes[::-1]:
-            access = node.meta.get('access', [])
-            for entry in access:
-                short_path = node_path + '/' + entry
-                full_path = access[entry] + '/' + entry
-                mapping[short_path] = mapping[full_path]
-
+        datas, paths, mapping = _flatten(self._database)
         self._flat_database = datas
+        if self.numeric_layout:
+            self._build_numeric_layout()
+        self._slot_versions = [0]*len(datas)
+        self._slot_locks = [Lock() for _ in datas]
         self._entry_index_map = mapping
+        self._slot_paths = paths
+        self._watched_slots = self._build_watched_slots()
+        self._slot_histories = self._build_histories()
 
         self._database = None
+        self._clear_edition_caches()
 
     # --- Private API ---------------------------------------------------------
 
     #: Main container for the database.
     _database = Typed(DatabaseNode, ())
 
+    #: Dict mapping the paths of the nodes already visited to the nodes. Only
+    #: used in edition mode.
+    _node_index = Dict()
+
+    #: Dict mapping nodes paths to the sorted list of entries accessible from
+    #: them. Only used in edition mode.
+    _accessible_cache = Dict()
+
     #: Flat version of the database only used in running mode for perfomances
     #: issues.
     _flat_database = List()
@@ -470,13 +964,87 @@ class TaskDatabase(Atom):
     #: Dict mapping full paths to flat database indexes.
     _entry_index_map = Dict()
 
-    #: Lock to make the database thread safe in running mode.
-    _lock = Value()
+    #: Full path of the entry stored in each slot of the flat database.
+    _slot_paths = List()
+
+    #: Journal in which the writes are recorded, if any.
+    _journal = Typed(JournalWriter)
+
+    #: Version counter of each slot of the flat database. A version is odd
+    #: while the slot is being written.
+    _slot_versions = List()
+
+    #: Locks serializing the writes to each slot of the flat database.
+    _slot_locks = List()
+
+    #: Buffer holding the numeric entries when the numeric layout is used.
+    _numeric_buffer = Typed(np.ndarray)
+
+    #: Regions of the numeric buffer dedicated to each dtype, as tuples
+    #: (dtype, number of elements, offset).
+    _numeric_regions = List()
+
+    #: For each slot of the flat database, None if the value is stored in
+    #: the regular list, or a tuple (array, position, accepted types) if it is
+    #: stored in the numeric buffer.
+    _numeric_slots = List()
+
+    #: For each slot of the flat database, None or the tuple (region index,
+    #: position) at which the value was initially stored in the numeric
+    #: buffer.
+    _numeric_positions = List()
+
+    #: Sizes of the histories to keep, keyed by full path of the entries.
+    _history_sizes = Dict()
+
+    #: For each slot of the flat database, None or the history of the slot.
+    #: Empty if no history is kept.
+    _slot_histories = List()
+
+    #: Set of the full paths of the watched entries, None if no entry was ever
+    #: declared as watched.
+    _watched_entries = Value()
+
+    #: Flag for each slot of the flat database indicating whether or not the
+    #: writes to it should be notified.
+    _watched_slots = List()
+
+    def _post_validate_numeric_layout(self, old, new):
+        """ Forbid changing the storage of the flat database once built.
+
+        """
+        # old is None when the default value is validated.
+        if self.running and old is not None and new != old:
+            raise RuntimeError('Cannot change the numeric layout in running '
+                               'mode')
+        return new
+
+    def _observe_excluded(self, change):
+        """ Discard the cached lists of accessible entries.
+
+        """
+        self._accessible_cache.clear()
+
+    def _clear_edition_caches(self):
+        """ Discard the nodes index and the accessible entries lists.
+
+        Must be called when the nodes hierarchy is modified.
+
+        """
+        self._node_index.clear()
+        self._accessible_cache.clear()
 
     def _go_to_path(self, path):
         """Method used to reach a node specified by a path.
 
+        Nodes are indexed by path once visited.
+
         """
+        try:
+            return self._node_index[path]
+        except KeyError:
+            pass
+
         node = self._database
         if path == 'root':
             return node
@@ -500,24 +1068,327 @@ class TaskDatabase(Atom):
                         {}'.format(path, key, keys[ind-1])
                 raise ValueError(err_str)
 
+        self._node_index[path] = node
         return node
 
+    def _write_slot(self, index, value):
+        """ Store a value in a slot of the flat database.
+
+        Only writers of the same slot contend on the slot lock. The version is
+        left odd while the value is stored so that readers can detect a write
+        in progress.
+
+        """
+        versions = self._slot_versions
+        with self._slot_locks[index]:
+            versions[index] += 1
+            if self.numeric_layout:
+                self._write_numeric_slot(index, value)
+            else:
+                self._flat_database[index] = value
+            histories = self._slot_histories
+            if histories and histories[index] is not None:
+                histories[index].append(value)
+            versions[index] += 1
+            version = versions[index]
+
+        # The journal is written outside of the slot lock so that the writers
+        # of different slots do not contend on the journal lock while holding
+        # their slot lock. The version orders the records of a slot.
+        journal = self._journal
+        if journal is not None:
+            journal.record(index, value, version)
+
+    def _write_numeric_slot(self, index, value):
+        """ Store a value when the numeric layout is used.
+
+        Must be called with the slot lock held.
+
+        """
+        slot = self._numeric_slots[index]
+        if slot is not None:
+            array, pos, types = slot
+            if type(value) in types:
+                try:
+                    array[pos] = value
+                    return
+                except OverflowError:
+                    pass
+            # The slot is moved to the regular storage. The value must be
+            # stored before the slot is marked so that a reader never sees a
+            # stale value.
+            self._flat_database[index] = value
+            self._numeric_slots[index] = None
+        else:
+            self._flat_database[index] = value
+
+    def _read_slot(self, index):
+        """ Read the value of a single slot of the flat database.
+
+        """
+        if self.numeric_layout:
+            slot = self._numeric_slots[index]
+            if slot is not None:
+                return slot[0].item(slot[1])
+        return self._flat_database[index]
+
+    def _build_numeric_layout(self):
+        """ Move the numeric scalars of the flat database in a contiguous
+        buffer.
+
+        The buffer is divided in one region per supported dtype, each region
+        being accessed through a typed view.
+
+        """
+        datas = self._flat_database
+        kinds = [None]*len(datas)
+        counts = [0]*len(NUMERIC_TYPES)
+        for i, value in enumerate(datas):
+            for k, (_, types) in enumerate(NUMERIC_TYPES):
+                if type(value) in types:
+                    kinds[i] = (k, counts[k])
+                    counts[k] += 1
+                    break
+
+        size = sum(dtype.itemsize*c
+                   for (dtype, _), c in zip(NUMERIC_TYPES, counts))
+        buff = np.zeros(size, dtype=np.uint8)
+        regions = []
+        views = []
+        offset = 0
+        for (dtype, _), c in zip(NUMERIC_TYPES, counts):
+            regions.append((dtype, c, offset))
+            views.append(np.frombuffer(buff, dtype, c, offset))
+            offset += dtype.itemsize*c
+
+        slots = [None]*len(datas)
+        for i, kind in enumerate(kinds):
+            if kind is not None:
+                k, pos = kind
+                views[k][pos] = datas[i]
+                slots[i] = (views[k], pos, NUMERIC_TYPES[k][1])
+                datas[i] = NUMERIC_PLACEHOLDER
+
+        self._numeric_buffer = buff
+        self._numeric_regions = regions
+        self._numeric_positions = kinds
+        self._numeric_slots = slots
+
+    def _set_slot(self, index, full_path, value):
+        """ Write a value in a slot of the flat database and notify it.
+
+        """
+        self._write_slot(index, value)
+        if self._watched_slots[index]:
+            self.notifier = (full_path, value)
+
+    def _build_histories(self):
+        """ Build the list of the histories of the slots.
+
+        Existing histories are preserved.
+
+        """
+        if not self._history_sizes:
+            return []
+
+        mapping = self._entry_index_map
+        histories = (list(self._slot_histories) or
+                     [None]*len(self._flat_database))
+        for path, size in self._history_sizes.iteritems():
+            index = mapping[path]
+            if histories[index] is None:
+                histories[index] = EntryHistory(size, self._read_slot(index))
+        return histories
+
+    def _build_watched_slots(self):
+        """ Build the list of flags indicating which slots are watched.
+
+        """
+        watched = self._watched_entries
+        if watched is None:
+            return [True]*len(self._flat_database)
+
+        flags = [False]*len(self._flat_database)
+        mapping = self._entry_index_map
+        for path in watched:
+            if path in mapping:
+                flags[mapping[path]] = True
+        return flags
+
+    def _read_slots(self, indexes):
+        """ Read a consistent snapshot of several slots of the flat database.
+
+        The slots are read without locking and the read is simply retried if
+        one of the versions changed meanwhile.
+
+        """
+        versions = self._slot_versions
+        datas = self._flat_database
+        read = self._read_slot
+        numeric = self.numeric_layout
+        while True:
+            before = [versions[i] for i in indexes]
+            if numeric:
+                values = [read(i) for i in indexes]
+            else:
+                values = [datas[i] for i in indexes]
+            after = [versions[i] for i in indexes]
+            if before == after and not any(v & 1 for v in before):
+                return values
+
     def _find_index(self, assumed_path, entry):
         """ Find the index associated with a path.
 
         Only to be used in running mode.
 
+        """
+        return self._find_entry(assumed_path, entry)[1]
+
+    def _find_entry(self, assumed_path, entry):
+        """ Find the path under which an entry is known and its index.
+
+        Only to be used in running mode.
+
         """
         path = assumed_path
         while path != 'root':
             full_path = path + '/' + entry
             if full_path in self._entry_index_map:
-                return self._entry_index_map[full_path]
+                return full_path, self._entry_index_map[full_path]
             path = path.rpartition('/')[0]
 
         full_path = path + '/' + entry
         if full_path in self._entry_index_map:
-            return self._entry_index_map[full_path]
+            return full_path, self._entry_index_map[full_path]
 
         raise KeyError("Can't find entry matching {}, {}".format(assumed_path,
                        entry))
+
+
+class EntryAccessor(Atom):
+    """ Handle giving direct access to a single entry of a database.
+
+    Accessors should be created using the get_entry_accessor method of the
+    database.
+
+    """
+    #: Database holding the entry.
+    database = Typed(TaskDatabase)
+
+    #: Full path of the entry (including the name of the entry).
+    path = Str()
+
+    #: Index of the entry in the flat database, -1 in edition mode.
+    index = Int(-1)
+
+    def read(self):
+        """ Get the current value of the entry.
+
+        """
+        if self.index < 0:
+            node_path, _, name = self.path.rpartition('/')
+            return self.database.get_value(node_path, name)
+        return self.database._read_slot(self.index)
+
+    def write(self, value):
+        """ Set the value of the entry.
+
+        Returns
+        -------
+        new_val : bool
+            Boolean indicating whether or not a new entry has been created in
+            the database (only possible in edition mode).
+
+        """
+        if self.index < 0:
+            node_path, _, name = self.path.rpartition('/')
+            return self.database.set_value(node_path, name, value)
+        self.database._set_slot(self.index, self.path, value)
+        return False
+
+
+class EntryHistory(Atom):
+    """ Bounded history of the values written to a database entry.
+
+    Values and timestamps are stored in preallocated arrays twice as long as
+    the history, each value being written at two positions so that the last
+    values are always contiguous and can be returned as views.
+
+    Parameters
+    ----------
+    size : int
+        Maximal number of values to keep.
+
+    value : optional
+        Value used to determine the dtype used to store the values. If it is
+        not a numeric scalar, or if a value of another kind is later appended,
+        values are stored as objects.
+
+    """
+    #: Maximal number of values to keep.
+    size = Int()
+
+    #: Total number of values appended to the history.
+    count = Int()
+
+    def __init__(self, size, value=None):
+        super(EntryHistory, self).__init__(size=size)
+        self._timestamps = np.zeros(2*size)
+        for dtype, types in NUMERIC_TYPES:
+            if type(value) in types:
+                self._types = types
+                self._values = np.zeros(2*size, dtype)
+                break
+        else:
+            self._values = np.empty(2*size, object)
+
+    def append(self, value):
+        """ Add a value to the history.
+
+        Not thread safe, the database calls it with the slot lock held.
+
+        """
+        size = self.size
+        pos = self.count % size
+        timestamp = default_timer()
+        self._timestamps[pos] = self._timestamps[pos + size] = timestamp
+        values = self._values
+        if self._types is not None and type(value) not in self._types:
+            values = self._values = values.astype(object)
+            self._types = None
+        values[pos] = values[pos + size] = value
+        self.count += 1
+
+    def get(self, start=None, stop=None):
+        """ Access to the values of the history.
+
+        See TaskDatabase.get_history for the meaning of the parameters.
+
+        """
+        count = self.count
+        size = self.size
+        first = max(0, count - size)
+        start = first if start is None else start
+        stop = count if stop is None else stop
+        if start < 0:
+            start += count
+        if stop < 0:
+            stop += count
+        if start < first:
+            raise IndexError('Value {} is no longer in history'.format(start))
+        stop = max(start, min(stop, count))
+
+        base = first % size - first
+        return (self._timestamps[base + start:base + stop],
+                self._values[base + start:base + stop])
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Buffer holding the time at which the values were written.
+    _timestamps = Typed(np.ndarray)
+
+    #: Buffer holding the values.
+    _values = Typed(np.ndarray)
+
+    #: Types accepted by the values buffer, None if the buffer stores objects.
+    _types = Value()
@@ -8,17 +8,16 @@
 """
 
 import logging
-from time import sleep
-from threading import Thread, current_thread
-from itertools import chain
+from contextlib import contextmanager
+from threading import Condition
 
 
 def handle_stop_pause(root):
-    """ Check the state of the stop and pause event and handle the pause.
+    """ Check the execution state of the measure and handle the pause.
 
-    When the pause stops the main thread take care of re-initializing the
-    driver owners (so that any user modification shoudl not cause a crash) and
-    signal the other threads it is done by settibg the resume flag.
+    While the measure runs this is a single read of the execution state of
+    the root task. When a pause was requested the calling thread blocks till
+    the measure is resumed or stopped.
 
     Parameters
     ----------
@@ -27,40 +26,160 @@ def handle_stop_pause(root):
 
     Returns
     -------
-    exit : bool or None
-        Whether or not the function returned because should_stop was set.
+    exit : bool
+        Whether or not the function returned because the measure should stop.
 
     """
-    stop_flag = root.should_stop
-    if stop_flag.is_set():
+    state = root.execution_state
+    if state == 'RUNNING':
+        return False
+    if state == 'STOPPING':
         return True
+    if state == 'IDLE':
+        # Task executed outside of RootTask.perform, the events are not
+        # watched.
+        return root.should_stop.is_set()
 
-    pause_flag = root.should_pause
-    if pause_flag.is_set():
-        root.resume.clear()
-        root.paused_threads_counter.increment()
-        while True:
-            sleep(0.05)
-            if stop_flag.is_set():
-                root.paused_threads_counter.decrement()
-                return True
-            if not pause_flag.is_set():
-                if current_thread().name == 'MainThread':
-                    # Prevent some issues if a stupid user changes a
-                    # value on an instr previously set by a task.
-                    instrs = root.instrs
-                    for instr_id in instrs:
-                        instrs[instr_id].owner = ''
-                        instrs[instr_id].clear_cache()
-                    root.resume.set()
-                    root.paused_threads_counter.decrement()
-                    break
-                else:
-                    # Safety here ensuring the main thread finished
-                    # re-initializing the instr.
-                    root.resume.wait()
-                    root.paused_threads_counter.decrement()
-                    break
+    return root.wait_for_resume()
+
+
+@contextmanager
+def blocked_on_others(root):
+    """ Do not count the calling thread as active while it blocks waiting for
+    other threads.
+
+    A thread waiting on works is neither working nor paused. Discounting it
+    lets the measure reach the paused state once the threads it waits on are
+    paused. The caller should check the execution state once it stops
+    waiting.
+
+    Parameters
+    ----------
+    root : RootTask
+        RootTask of the hierarchy.
+
+    """
+    counter = root.active_threads_counter
+    counter.decrement()
+    try:
+        yield
+    finally:
+        counter.increment()
+
+
+def run_plan(root, plan):
+    """ Execute the operations of an execution plan.
+
+    Parameters
+    ----------
+    root : RootTask
+        RootTask of the hierarchy.
+
+    plan : tuple
+        Operations (check, perform, task) as built by
+        ComplexTask.compile_plan.
+
+    """
+    for check, perform, task in plan:
+        if (check and root.execution_state != 'RUNNING' and
+                handle_stop_pause(root)):
+            return
+        perform(task)
+
+
+def run_graph(root, plan, graph, barriers, pool):
+    """ Execute the operations of an execution plan as soon as the operations
+    they depend on are over.
+
+    Independent operations are submitted to a thread pool while barriers are
+    executed by the calling thread. Once an operation failed the next ones are
+    skipped and the exception is raised again in the calling thread when the
+    running operations are over.
+
+    Parameters
+    ----------
+    root : RootTask
+        RootTask of the hierarchy.
+
+    plan : tuple
+        Operations (check, perform, task) in their sequential order.
+
+    graph : tuple
+        Indexes of the operations each operation depends on, as built by
+        build_dependency_graph.
+
+    barriers : frozenset
+        Indexes of the operations which must be executed by the calling
+        thread.
+
+    pool : ThreadPool
+        Pool executing the independent operations.
+
+    """
+    cond = Condition()
+    completed = []
+    failures = {}
+    pending = [len(preds) for preds in graph]
+    successors = [[] for _ in plan]
+    for i, preds in enumerate(graph):
+        for j in preds:
+            successors[j].append(i)
+
+    def execute(i):
+        check, perform, task = plan[i]
+        try:
+            if not failures and not (check and
+                                     root.execution_state != 'RUNNING' and
+                                     handle_stop_pause(root)):
+                perform(task)
+        # Loop exceptions derive from BaseException and must be propagated.
+        except BaseException as e:
+            failures[i] = e
+        finally:
+            with cond:
+                completed.append(i)
+                cond.notify()
+
+    ready = [i for i, count in enumerate(pending) if not count]
+    remaining = len(plan)
+    submitted = set()
+    while remaining:
+        for i in ready:
+            # An operation which is the only one to run is executed right
+            # away to spare a thread switch.
+            if i in barriers or (len(ready) == 1 and not submitted):
+                execute(i)
+            else:
+                submitted.add(i)
+                pool.submit(execute, i)
+
+        # The calling thread is woken up only by the completion of an
+        # operation. As it is not counted as active meanwhile, the measure
+        # can be paused without waking it up and a stop is handled by the
+        # operations themselves.
+        with cond:
+            if not completed:
+                with blocked_on_others(root):
+                    while not completed:
+                        cond.wait()
+            done = completed[:]
+            del completed[:]
+
+        if root.execution_state in ('PAUSING', 'PAUSED'):
+            root.wait_for_resume()
+
+        ready = []
+        for i in done:
+            remaining -= 1
+            submitted.discard(i)
+            for j in successors[i]:
+                pending[j] -= 1
+                if not pending[j]:
+                    ready.append(j)
+        ready.sort()
+
+    if failures:
+        raise failures[min(failures)]
 
 
 def make_stoppable(function_to_decorate):
@@ -97,7 +216,7 @@ def smooth_crash(function_to_decorate):
             log = logging.getLogger(function_to_decorate.__module__)
             mes = 'The following unhandled exception occured in {} :'
             log.exception(mes.format(obj.task_name))
-            obj.root_task.should_stop.set()
+            obj.root_task.request_stop()
 
     decorator.__name__ = function_to_decorate.__name__
     decorator.__doc__ = function_to_decorate.__doc__
@@ -107,8 +226,11 @@ def smooth_crash(function_to_decorate):
 def make_parallel(perform, pool):
     """ Machinery to execute perform_ in parallel.
 
-    Create a wrapper around a method to execute it in a thread and
-    register the thread.
+    Create a wrapper around a method to submit it to the thread pool
+    associated with the execution pool. In cooperative mode, tasks
+    implementing perform_async are instead scheduled as coroutines, still
+    accounted as works of the pool and instrumented by the profiler if the
+    measure is profiled.
 
     Parameters
     ----------
@@ -116,45 +238,95 @@ def make_parallel(perform, pool):
         Method which should be wrapped to run in parallel.
 
     pool : str
-        Name of the execution pool to which the created thread belongs.
+        Name of the execution pool to which the created work belongs.
 
     """
     def wrapper(*args, **kwargs):
 
         obj = args[0]
         root = obj.root_task
-        safe_perform = smooth_crash(perform)
-        thread = Thread(group=None,
-                        target=safe_perform,
-                        args=args,
-                        kwargs=kwargs)
-        # Create a shallow copy to avoid mutating a dict shared by multiple
-        # threads.
-        pools = obj.root_task.threads
-        with pools.safe_access(pool) as threads:
-            threads.append(thread)
-
-        root.active_threads_counter.increment()
-        thread.start()
-        root.active_threads_counter.decrement()
+        perform_async = getattr(obj, 'perform_async', None)
+        if root.cooperative and perform_async:
+            coroutine = perform_async(*args[1:], **kwargs)
+            profiler = root.profiler
+            if profiler and profiler.running:
+                name = obj.task_path + '/' + obj.task_name
+                coroutine = profiler.wrap_coroutine(coroutine, name)
+            root.get_pool(pool).submit_coroutine(root.get_scheduler(),
+                                                 coroutine)
+        else:
+            safe_perform = smooth_crash(perform)
+            root.get_pool(pool).submit(safe_perform, *args, **kwargs)
 
     wrapper.__name__ = perform.__name__
     wrapper.__doc__ = perform.__doc__
     return wrapper
 
 
-# XXXX should now support nested wait in parallel
+def _wait_on_pools(all_pools, accept):
+    """ Wait for all the works submitted to some execution pools to complete.
+
+    The works executed by the calling thread are never waited upon. As works
+    of a pool can submit works to another one, the pools are waited on till
+    none of them is busy.
+
+    Parameters
+    ----------
+    all_pools : SharedDict
+        Dict holding the thread pools of all the execution pools.
+
+    accept : callable
+        Callable taking a pool id as argument and returning whether or not
+        the pool should be waited for.
+
+    """
+    while True:
+        with all_pools.locked():
+            pools = [all_pools[p] for p in all_pools if accept(p)]
+
+        busy = [pool for pool in pools if pool.busy()]
+        if not busy:
+            # Mark the works as waited for.
+            for pool in pools:
+                pool.wait()
+            break
+
+        for pool in busy:
+            pool.wait()
+
+
+def wait_on_pools(root, accept):
+    """ Wait for all the works submitted to some execution pools to complete.
+
+    The calling thread is not counted as active while it waits, so that the
+    measure can be paused meanwhile. The caller should check the execution
+    state once this returns.
+
+    Parameters
+    ----------
+    root : RootTask
+        RootTask of the hierarchy.
+
+    accept : callable
+        Callable taking a pool id as argument and returning whether or not
+        the pool should be waited for.
+
+    """
+    with blocked_on_others(root):
+        _wait_on_pools(root.threads, accept)
+
+
 def make_wait(perform, wait, no_wait):
     """ Machinery to make perform_ wait on other tasks execution.
 
-    Create a wrapper around a method to wait for some threads to terminate
-    before calling the method. Threads are grouped in execution pools.
-    This method supports new threads being started while it is waiting.
+    Create a wrapper around a method to wait for some execution pools to
+    complete their works before calling the method. This method supports new
+    works being submitted while it is waiting.
 
     Parameters
     ----------
     perform : method
-        Method which should be wrapped to wait on threads.
+        Method which should be wrapped to wait on works.
 
     wait : list(str)
         Names of the execution pool which should be waited for.
@@ -168,90 +340,26 @@ def make_wait(perform, wait, no_wait):
 
     """
     if wait:
-        def wrapper(*args, **kwargs):
-
-            obj = args[0]
-            all_threads = obj.root_task.threads
-            while True:
-                # Get all the threads we should be waiting upon.
-                threads = chain.from_iterable([all_threads[w]
-                                               for w in wait])
-
-                # If there is none break. Use any as threads is an iterator.
-                if not any(threads):
-                    break
-
-                # Else join them.
-                for thread in threads:
-                    thread.join()
+        def accept(pool):
+            return pool in wait
+    elif no_wait:
+        def accept(pool):
+            return pool not in no_wait
+    else:
+        def accept(pool):
+            return True
 
-                # Make sure nobody modify the pools and update them by removing
-                # the references to the dead threads.
-                with all_threads.locked():
-                    for w in wait:
-                        all_threads[w] = [t for t in all_threads[w]
-                                          if t.is_alive()]
+    def wrapper(*args, **kwargs):
 
-                # Start over till no thread remain in the pool in wait.
+        obj = args[0]
+        root = obj.root_task
+        wait_on_pools(root, accept)
 
-            return perform(*args, **kwargs)
+        # The measure may have been paused or stopped during the wait.
+        if handle_stop_pause(root):
+            return
 
-    elif no_wait:
-        def wrapper(*args, **kwargs):
-
-            obj = args[0]
-            # Create a shallow copy to avoid mutating a dict shared by multiple
-            # threads.
-            all_threads = obj.root_task.threads
-            pools = [k for k in all_threads if k not in no_wait]
-            while True:
-                # Get all the threads we should be waiting upon.
-                threads = chain.from_iterable([all_threads[p]
-                                               for p in pools])
-
-                # If there is None break. Use any as threads is an iterator.
-                if not any(threads):
-                    break
-
-                # Else join them.
-                for thread in threads:
-                    thread.join()
-
-                # Make sure nobody modify the pools and update them by removing
-                # the references to the dead threads.
-                with all_threads.locked():
-                    for p in pools:
-                        all_threads[p] = [t for t in all_threads[p]
-                                          if t.is_alive()]
-
-                # Start over till no thread remain in the pool in wait.
-
-            return perform(*args, **kwargs)
-    else:
-        def wrapper(*args, **kwargs):
-
-            obj = args[0]
-            all_threads = obj.root_task.threads
-            while True:
-                # Get all the threads we should be waiting upon.
-                threads = chain.from_iterable([all_threads[p]
-                                               for p in all_threads])
-
-                # If there is None break. Use any as threads is an iterator.
-                if not any(threads):
-                    break
-
-                # Else join them.
-                for thread in threads:
-                    thread.join()
-
-                # Make sure nobody modify the pools and update them by removing
-                # the references to the dead threads.
-                with all_threads.locked():
-                    for p in all_threads:
-                        all_threads[p] = [t for t in all_threads[p]
-                                          if t.is_alive()]
-            return perform(*args, **kwargs)
+        return perform(*args, **kwargs)
 
     wrapper.__name__ = perform.__name__
     wrapper.__doc__ = perform.__doc__
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : task_profiler.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Profiler recording the time spent in the tasks during a measure.
+
+"""
+from atom.api import Atom, Int, Float, Bool, Value, Dict
+from array import array
+from random import randrange
+from threading import Lock, local
+from timeit import default_timer
+
+
+class TaskRecord(Atom):
+    """ Statistics of the calls to the perform method of a task.
+
+    """
+    #: Full name (path and name) of the task.
+    name = Value()
+
+    #: Number of calls.
+    calls = Int()
+
+    #: Total time spent in the task including its children.
+    total = Float()
+
+    #: Time spent in the children of the task executed in the same thread.
+    children = Float()
+
+    #: Time spent communicating with the instruments, excluding the children.
+    io = Float()
+
+    #: Shortest call.
+    min = Float(float('inf'))
+
+    #: Longest call.
+    max = Float()
+
+    #: Maximal number of durations kept to estimate the percentiles.
+    max_samples = Int(10000)
+
+    def __init__(self, **kwargs):
+        super(TaskRecord, self).__init__(**kwargs)
+        # Records are updated by several threads, so the lock cannot be built
+        # lazily.
+        self._lock = Lock()
+        self._samples = array('d')
+
+    def add(self, duration, children, io):
+        """ Record a call.
+
+        """
+        with self._lock:
+            self.calls += 1
+            self.total += duration
+            self.children += children
+            self.io += io
+            if duration < self.min:
+                self.min = duration
+            if duration > self.max:
+                self.max = duration
+            # Reservoir sampling so that all calls are equally represented.
+            samples = self._samples
+            if len(samples) < self.max_samples:
+                samples.append(duration)
+            else:
+                i = randrange(self.calls)
+                if i < self.max_samples:
+                    samples[i] = duration
+
+    def percentile(self, q):
+        """ Estimate a percentile of the durations.
+
+        Parameters
+        ----------
+        q : float
+            Percentile to compute, between 0 and 100.
+
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(q/100.0*len(samples)))]
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Sampled durations.
+    _samples = Value()
+
+    #: Lock protecting the statistics.
+    _lock = Value()
+
+
+class TaskProfiler(Atom):
+    """ Collect the durations of the perform calls of the tasks.
+
+    The perform functions are instrumented through wrap, which records the
+    time spent in each call, the part of it spent in the (profiled) children
+    of the task and the part spent communicating with the instruments, as
+    reported through add_io.
+
+    """
+    #: Statistics keyed by the full names of the tasks.
+    records = Dict()
+
+    #: Whether or not the profiler is recording.
+    running = Bool()
+
+    #: Time at which the profiler was started.
+    start_time = Float()
+
+    #: Duration of the profiled run.
+    duration = Float()
+
+    def start(self):
+        """ Start recording.
+
+        """
+        self.records = {}
+        self.start_time = default_timer()
+        self.running = True
+
+    def stop(self):
+        """ Stop recording.
+
+        """
+        self.duration = default_timer() - self.start_time
+        self.running = False
+
+    def wrap(self, func, name):
+        """ Instrument a perform function.
+
+        Parameters
+        ----------
+        func : callable
+            Function taking the task as first argument.
+
+        name : str
+            Full name of the task.
+
+        """
+        record = self._get_record(name)
+        frames = self._frames
+
+        def profiled(task, *args, **kwargs):
+            try:
+                stack = frames.stack
+            except AttributeError:
+                stack = frames.stack = []
+            # Frame : [time spent in children, time spent in io]
+            frame = [0.0, 0.0]
+            stack.append(frame)
+            tic = default_timer()
+            try:
+                return func(task, *args, **kwargs)
+            finally:
+                duration = default_timer() - tic
+                stack.pop()
+                if stack:
+                    stack[-1][0] += duration
+                record.add(duration, frame[0], frame[1])
+
+        profiled.__name__ = func.__name__
+        profiled.__doc__ = func.__doc__
+        return profiled
+
+    def wrap_coroutine(self, coroutine, name):
+        """ Instrument a coroutine executing the perform_async method of a
+        task.
+
+        The duration of the call is the time elapsed between the first
+        resumption of the coroutine and its end, waits included as for
+        perform. The communications with the instruments are the ones taking
+        place while the coroutine is resumed.
+
+        Parameters
+        ----------
+        coroutine : generator
+            Coroutine to instrument.
+
+        name : str
+            Full name of the task.
+
+        Returns
+        -------
+        profiled : generator
+            Coroutine yielding the same delays as the wrapped one.
+
+        """
+        record = self._get_record(name)
+        frames = self._frames
+
+        def profiled():
+            # Frame : [time spent in children, time spent in io]
+            frame = [0.0, 0.0]
+            tic = default_timer()
+            try:
+                while True:
+                    try:
+                        stack = frames.stack
+                    except AttributeError:
+                        stack = frames.stack = []
+                    stack.append(frame)
+                    try:
+                        delay = next(coroutine)
+                    except StopIteration:
+                        return
+                    finally:
+                        stack.pop()
+                    yield delay
+            finally:
+                # Propagate the closing by the scheduler.
+                coroutine.close()
+                record.add(default_timer() - tic, frame[0], frame[1])
+
+        return profiled()
+
+    def add_io(self, duration):
+        """ Attribute some time spent communicating with an instrument to the
+        task being executed by the current thread.
+
+        """
+        stack = getattr(self._frames, 'stack', None)
+        if stack:
+            stack[-1][1] += duration
+
+    def report(self):
+        """ Format the collected statistics.
+
+        Returns
+        -------
+        report : unicode
+            Table summarizing the statistics of each task, sorted by
+            decreasing total time.
+
+        """
+        records = sorted(self.records.values(), key=lambda r: r.total,
+                         reverse=True)
+        io = sum(r.io for r in records)
+        lines = ['Profiled run time : {:.3f} s'.format(self.duration),
+                 'Instrument communications : {:.3f} s'.format(io),
+                 '']
+        header = ('{:<40} {:>8} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10} '
+                  '{:>10}')
+        lines.append(header.format('task', 'calls', 'total', 'self', 'io',
+                                   'min', 'mean', 'p95', 'max'))
+        row = ('{:<40} {:>8} {:>10.4f} {:>10.4f} {:>10.4f} {:>10.6f} '
+               '{:>10.6f} {:>10.6f} {:>10.6f}')
+        for r in records:
+            if not r.calls:
+                continue
+            lines.append(row.format(r.name, r.calls, r.total,
+                                    r.total - r.children, r.io, r.min,
+                                    r.total/r.calls, r.percentile(95), r.max))
+
+        return u'\n'.join(lines) + u'\n'
+
+    # --- Private API ---------------------------------------------------------
+
+    def _get_record(self, name):
+        """ Get the record of a task, creating it if necessary.
+
+        """
+        with self._lock:
+            if name not in self.records:
+                self.records[name] = TaskRecord(name=name)
+            return self.records[name]
+
+    #: Thread local storage holding the stack of the profiled calls.
+    _frames = Value(factory=local)
+
+    #: Lock protecting the creation of the records.
+    _lock = Value(factory=Lock)
@@ -0,0 +1,380 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : thread_pools.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+""" Bounded pools of worker threads used to execute the parallel tasks.
+
+"""
+import logging
+from atom.api import Atom, Int, Bool, Value, Typed, List
+from collections import deque
+from threading import Thread, Condition, Event, Lock, local, current_thread
+from timeit import default_timer
+
+from .shared_resources import SharedCounter
+
+
+#: Thread local storage holding the futures being executed by a thread. Works
+#: executed inline by a worker are stacked on top of the work which submitted
+#: them.
+_WORKER_STATE = local()
+
+
+def _running_futures():
+    """ Get the stack of futures executed by the current thread.
+
+    """
+    try:
+        return _WORKER_STATE.futures
+    except AttributeError:
+        _WORKER_STATE.futures = []
+        return _WORKER_STATE.futures
+
+
+def current_future():
+    """ Get the future whose work is executed by the current thread.
+
+    Returns
+    -------
+    future : TaskFuture or None
+        Future of the current work, None if the current thread is not
+        executing some work submitted to a pool.
+
+    """
+    futures = _running_futures()
+    return futures[-1] if futures else None
+
+
+class TaskFuture(Atom):
+    """ Result of a work submitted to a thread pool.
+
+    """
+    #: Pool to which the work was submitted.
+    pool = Value()
+
+    #: Exception raised by the work if any.
+    exception = Value()
+
+    def __init__(self, **kwargs):
+        super(TaskFuture, self).__init__(**kwargs)
+        # Lazy defaults could be built concurrently by the worker and the
+        # waiters, so the event is created right away.
+        self._done = Event()
+
+    def done(self):
+        """ Whether or not the work is over.
+
+        """
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """ Wait for the work to be over.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximal time to wait in seconds.
+
+        Returns
+        -------
+        done : bool
+            Whether or not the work is over.
+
+        """
+        return self._done.wait(timeout)
+
+    def result(self, timeout=None):
+        """ Wait for the work to be over and get its result.
+
+        Raises the exception raised by the work if any.
+
+        """
+        if not self._done.wait(timeout):
+            raise RuntimeError('Work is not done.')
+        if self.exception is not None:
+            raise self.exception
+        return self._result
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Value returned by the work.
+    _result = Value()
+
+    #: Event set when the work is done.
+    _done = Value()
+
+    def _set_done(self, exception=None):
+        """ Mark the work as done.
+
+        """
+        self.exception = exception
+        self._done.set()
+
+    def _run(self, func, args, kwargs):
+        """ Execute the work and store its result.
+
+        """
+        futures = _running_futures()
+        futures.append(self)
+        try:
+            self._result = func(*args, **kwargs)
+        # Loop exceptions derive from BaseException and must not kill the
+        # worker.
+        except BaseException as e:
+            self.exception = e
+            log = logging.getLogger(__name__)
+            log.exception('Parallel work failed :')
+        finally:
+            futures.pop()
+            self._done.set()
+
+
+class ThreadPool(Atom):
+    """ Pool of worker threads executing the submitted works in order.
+
+    Worker threads are created when no idle worker is available, up to
+    max_workers. When a worker of the pool submits a work while all workers
+    are busy the work is executed right away by the submitting thread, so
+    that nested parallel tasks cannot deadlock the pool.
+
+    The pool counts the works which are not completed yet, so that waiting
+    for the pool to drain simply means waiting on a condition till this
+    count reaches zero. The pool evaluates to False once all the works
+    submitted to it have been waited for.
+
+    """
+    #: Name of the pool.
+    name = Value()
+
+    #: Maximal number of worker threads.
+    max_workers = Int(8)
+
+    #: Counter incremented while a worker executes a work.
+    active_counter = Typed(SharedCounter)
+
+    #: Whether or not the pool was shut down.
+    closed = Bool()
+
+    #: Number of submitted works which are not completed yet.
+    outstanding = Int()
+
+    def __init__(self, **kwargs):
+        super(ThreadPool, self).__init__(**kwargs)
+        # Lazy defaults could be built concurrently by several threads, so
+        # the synchronisation primitives are created right away.
+        self._lock = Lock()
+        self._work_available = Condition(self._lock)
+        self._drained = Condition(self._lock)
+
+    def submit(self, func, *args, **kwargs):
+        """ Schedule the execution of a callable.
+
+        Returns
+        -------
+        future : TaskFuture
+            Future tracking the execution of the work.
+
+        """
+        future = TaskFuture(pool=self)
+        with self._lock:
+            if self.closed:
+                raise RuntimeError('Pool {} is closed.'.format(self.name))
+            self.outstanding += 1
+            self._unwaited += 1
+            inline = (not self._idle and
+                      len(self._workers) >= self.max_workers and
+                      current_thread() in self._workers)
+            if not inline:
+                self._works.append((future, func, args, kwargs))
+                if self._idle:
+                    self._work_available.notify()
+                elif len(self._workers) < self.max_workers:
+                    self._start_worker()
+
+        if inline:
+            try:
+                future._run(func, args, kwargs)
+            finally:
+                self._complete()
+        return future
+
+    def submit_coroutine(self, scheduler, coroutine):
+        """ Schedule the execution of a coroutine on a scheduler.
+
+        The coroutine is counted as a work of the pool, so that waiting on the
+        pool waits for it too.
+
+        Parameters
+        ----------
+        scheduler : CoroutineScheduler
+            Scheduler executing the coroutine.
+
+        coroutine : generator
+            Coroutine to execute.
+
+        Returns
+        -------
+        future : TaskFuture
+            Future tracking the execution of the coroutine.
+
+        """
+        future = TaskFuture(pool=self)
+        with self._lock:
+            if self.closed:
+                raise RuntimeError('Pool {} is closed.'.format(self.name))
+            self.outstanding += 1
+            self._unwaited += 1
+
+        try:
+            scheduler.submit(coroutine, future, self._complete)
+        except Exception:
+            self._complete()
+            raise
+        return future
+
+    def busy(self):
+        """ Whether or not waiting on the pool would block.
+
+        Works executed by the calling thread are not taken into account.
+
+        """
+        with self._lock:
+            return self.outstanding > self._own_works()
+
+    def wait(self, timeout=None):
+        """ Block till all the works submitted to the pool are completed.
+
+        The works being executed by the calling thread (if it is a worker of
+        the pool) are not waited for.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximal time to wait in seconds.
+
+        Returns
+        -------
+        drained : bool
+            Whether or not the pool was drained.
+
+        """
+        own = self._own_works()
+        with self._lock:
+            if timeout is not None:
+                end = default_timer() + timeout
+            self._waiters += 1
+            try:
+                while self.outstanding > own:
+                    if timeout is None:
+                        self._drained.wait()
+                    else:
+                        remaining = end - default_timer()
+                        if remaining <= 0:
+                            return False
+                        self._drained.wait(remaining)
+            finally:
+                self._waiters -= 1
+            self._unwaited = own
+            return True
+
+    def shutdown(self, wait=True):
+        """ Stop the workers once all the submitted works are done.
+
+        Parameters
+        ----------
+        wait : bool, optional
+            Whether or not to wait for the workers to exit.
+
+        """
+        with self._lock:
+            self.closed = True
+            self._work_available.notify_all()
+            workers = list(self._workers)
+
+        if wait:
+            current = current_thread()
+            for worker in workers:
+                if worker is not current:
+                    worker.join()
+
+    def __nonzero__(self):
+        return self._unwaited > 0
+
+    # --- Private API ---------------------------------------------------------
+
+    #: Works waiting for a worker as tuples (future, func, args, kwargs).
+    _works = Typed(deque, ())
+
+    #: Worker threads of the pool.
+    _workers = List()
+
+    #: Number of workers waiting for a work.
+    _idle = Int()
+
+    #: Number of threads waiting for the pool to drain.
+    _waiters = Int()
+
+    #: Number of works submitted since the pool was last drained by a waiter.
+    _unwaited = Int()
+
+    #: Lock protecting the state of the pool.
+    _lock = Value()
+
+    #: Condition used to wake up the workers when a work is submitted.
+    _work_available = Value()
+
+    #: Condition used to wake up the waiters when a work completes.
+    _drained = Value()
+
+    def _own_works(self):
+        """ Number of works of the pool executed by the current thread.
+
+        """
+        return sum(1 for f in _running_futures() if f.pool is self)
+
+    def _complete(self):
+        """ Account for the completion of a work.
+
+        """
+        with self._lock:
+            self.outstanding -= 1
+            if self._waiters:
+                self._drained.notify_all()
+
+    def _start_worker(self):
+        """ Start a new worker thread. Must be called with the lock held.
+
+        """
+        name = 'Pool-{}-{}'.format(self.name, len(self._workers))
+        worker = Thread(target=self._work, name=name)
+        worker.daemon = True
+        self._workers.append(worker)
+        worker.start()
+
+    def _work(self):
+        """ Main loop of the worker threads.
+
+        """
+        cond = self._work_available
+        works = self._works
+        while True:
+            with self._lock:
+                while not works and not self.closed:
+                    self._idle += 1
+                    cond.wait()
+                    self._idle -= 1
+                if not works:
+                    return
+                future, func, args, kwargs = works.popleft()
+
+            counter = self.active_counter
+            if counter is not None:
+                counter.increment()
+            try:
+                future._run(func, args, kwargs)
+            finally:
+                if counter is not None:
+                    counter.decrement()
+                self._complete()
@@ -9,7 +9,8 @@
 from hqc_meas.instruments.driver_tools import (BaseInstrument,
                                                instrument_property,
                                                InstrIOError,
-                                               secure_communication)
+                                               secure_communication,
+                                               set_io_listener)
 from nose.tools import assert_is_instance, assert_equal, raises
 
 from ..util import complete_line
@@ -285,3 +286,21 @@ def test_base_instrument_errors4():
 def test_base_instrument_errors5():
     i = BaseInstrument({})
     i.connected()
+
+
+def test_io_listener():
+    """ Test that the communications are reported to the io listener.
+
+    """
+    durations = []
+    set_io_listener(durations.append)
+    try:
+        a = Instr({})
+        a.value2
+        a.value1 = 5
+        a.value1
+        assert_equal(len(durations), 2)
+    finally:
+        set_io_listener(None)
+    a.value2
+    assert_equal(len(durations), 2)
@@ -189,6 +189,41 @@ class TestPluginCoreFunctionalities(object):
 
         self.workbench.register(TestSuiteManifest())
 
+    def test_save_load_binary_measure(self):
+        """ Test saving a measure to a binary file and reloading it.
+
+        """
+        plugin = self.workbench.get_plugin(u'hqc_meas.measure')
+        measure = Measure(plugin=plugin, name='Test', status='Under test')
+        measure.root_task = RootTask(default_path=self.test_dir)
+
+        # Needed because of Atom returning a _DictProxy
+        measure.checks = dict(plugin.checks)
+        # Needed because of Atom returning a _DictProxy
+        measure.headers = dict(plugin.headers)
+        # Adding a monitor.
+        monitor_decl = plugin.monitors[u'monitor1']
+        measure.add_monitor(monitor_decl.id,
+                            monitor_decl.factory(monitor_decl,
+                                                 self.workbench))
+        measure.monitors[u'monitor1'].save_test = True
+
+        path = os.path.join(self.test_dir, 'saved_measure.meas')
+        # Save measure.
+        measure.save_measure(path, binary=True)
+
+        assert_true(os.path.isfile(path))
+
+        # Load measure.
+        loaded = Measure.load_measure(plugin, path)
+
+        assert_equal(loaded.name, 'Test')
+        assert_equal(loaded.root_task.default_path, self.test_dir)
+        assert_equal(loaded.checks, dict(plugin.checks))
+        assert_equal(loaded.headers, dict(plugin.headers))
+        assert_in(u'monitor1', loaded.monitors)
+        assert_true(loaded.monitors[u'monitor1'].save_test)
+
     def test_override_saved_measure(self):
         """ Test that overriding a measure does override evrything.
 
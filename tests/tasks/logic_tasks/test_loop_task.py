@@ -11,6 +11,9 @@ from nose.tools import (assert_equal, assert_true, assert_false, assert_in,
                         assert_is_instance)
 from nose.plugins.attrib import attr
 from multiprocessing import Event
+from atom.api import List
+import os
+import numpy
 from enaml.workbench.api import Workbench
 
 from hqc_meas.tasks.api import RootTask
@@ -19,8 +22,11 @@ from hqc_meas.tasks.tasks_logic.loop_iterable_interface\
     import IterableLoopInterface
 from hqc_meas.tasks.tasks_logic.loop_linspace_interface\
     import LinspaceLoopInterface
+from hqc_meas.tasks.tasks_logic.loop_adaptive_interface\
+    import AdaptiveLoopInterface
 from hqc_meas.tasks.tasks_logic.loop_exceptions_tasks\
     import BreakTask, ContinueTask
+from hqc_meas.tasks.tasks_util.save_tasks import SaveTask, SaveFileTask
 
 import enaml
 with enaml.imports():
@@ -36,10 +42,21 @@ from ...util import process_app_events, close_all_windows
 from ..testing_utilities import CheckTask
 
 
+class PoolStateTask(CheckTask):
+    """ Task recording whether its pool is busy when a checkpoint is saved.
+
+    """
+    busy_at_checkpoint = List()
+
+    def checkpoint_state(self):
+        self.busy_at_checkpoint.append(self.root_task.threads['test'].busy())
+
+
 class TestLoopTask(object):
 
     def setup(self):
-        self.root = RootTask(should_stop=Event(), should_pause=Event())
+        self.root = RootTask(should_stop=Event(), should_pause=Event(),
+                             paused=Event())
         self.task = LoopTask(task_name='Test')
         self.root.children_task.append(self.task)
 
@@ -178,6 +195,47 @@ class TestLoopTask(object):
         assert_equal(len(traceback), 1)
         assert_in('root/Test', traceback)
 
+    def test_check_adaptive_interface1(self):
+        # Simply test that everything is ok when all formulas are true.
+        interface = AdaptiveLoopInterface()
+        interface.start = '1.0'
+        interface.stop = '2.0'
+        interface.max_points = '21'
+        interface.observable = '{Test_value}**2'
+        self.task.interface = interface
+
+        test, traceback = self.task.check()
+        assert_true(test)
+        assert_false(traceback)
+        assert_equal(self.task.get_from_database('Test_point_number'), 21)
+        assert_equal(self.task.get_from_database('Test_value'), 1.0)
+
+    def test_check_adaptive_interface2(self):
+        # Test handling a wrong start and observable.
+        interface = AdaptiveLoopInterface()
+        interface.start = '1.0*'
+        interface.observable = '{Test_value}*'
+        self.task.interface = interface
+
+        test, traceback = self.task.check()
+        assert_false(test)
+        assert_equal(len(traceback), 2)
+        assert_in('root/Test-start', traceback)
+        assert_in('root/Test-observable', traceback)
+
+    def test_check_adaptive_interface3(self):
+        # Test handling an initial grid larger than the point budget.
+        interface = AdaptiveLoopInterface()
+        interface.initial_points = '11'
+        interface.max_points = '5'
+        interface.observable = '{Test_value}'
+        self.task.interface = interface
+
+        test, traceback = self.task.check()
+        assert_false(test)
+        assert_equal(len(traceback), 1)
+        assert_in('root/Test-points', traceback)
+
     def test_check_execution_order(self):
         # Test that the interface checks are run before the children checks.
         interface = IterableLoopInterface()
@@ -243,6 +301,182 @@ class TestLoopTask(object):
         self.task.perform()
         assert_false(self.task.children_task[1].perform_called)
 
+    def test_perform_resume(self):
+        # Test resuming a loop from a checkpoint.
+        interface = IterableLoopInterface()
+        interface.iterable = 'range(11)'
+        self.task.interface = interface
+        self.task.children_task.append(BreakTask(task_name='break',
+                                                 condition='{Test_value} == 5')
+                                       )
+        check = CheckTask(task_name='check')
+        self.task.children_task.append(check)
+        root = self.root
+        root.checkpoint_interval = 1e-9
+        root.checkpoint_path = os.path.join(os.path.dirname(__file__),
+                                            'loop.ckpt')
+
+        root.task_database.prepare_for_running()
+
+        try:
+            self.task.perform()
+            assert_equal(check.perform_called, 5)
+
+            del self.task.children_task[0]
+            root.load_checkpoint()
+            self.task.perform()
+            assert_equal(check.perform_called, 11)
+            assert_equal(root.get_from_database('Test_value'), 10)
+        finally:
+            os.remove(root.checkpoint_path)
+
+    def test_perform_resume_save(self):
+        # Test that a resumed measure keeps the lines saved before the
+        # checkpoint.
+        interface = IterableLoopInterface()
+        interface.iterable = 'range(11)'
+        self.task.interface = interface
+        self.task.children_task.append(BreakTask(task_name='break',
+                                                 condition='{Test_value} == 5')
+                                       )
+        folder = os.path.dirname(__file__)
+        save = SaveTask(task_name='save', saving_target='File and array',
+                        folder=folder, filename='resume.dat',
+                        array_size='11', header='resume',
+                        saved_values=[('x', '{Test_value}')])
+        self.task.children_task.append(save)
+        root = self.root
+        root.checkpoint_interval = 1e-9
+        root.checkpoint_path = os.path.join(folder, 'loop.ckpt')
+
+        root.task_database.prepare_for_running()
+
+        try:
+            self.task.perform()
+            save.file_object.close()
+
+            del self.task.children_task[0]
+            root.load_checkpoint()
+            self.task.perform()
+            assert_false(save.initialized)
+
+            with open(os.path.join(folder, 'resume.dat')) as f:
+                lines = f.read().split('\n')
+            assert_equal(lines[:2], ['# resume', 'x'])
+            assert_equal([float(l) for l in lines[2:-1]], range(11))
+            assert_equal(list(save.array['x']), range(11))
+        finally:
+            os.remove(root.checkpoint_path)
+            os.remove(os.path.join(folder, 'resume.dat'))
+
+    def test_perform_resume_save_file(self):
+        # Test that a resumed measure keeps the lines saved by a SaveFileTask
+        # before the checkpoint.
+        interface = IterableLoopInterface()
+        interface.iterable = 'range(11)'
+        self.task.interface = interface
+        self.task.children_task.append(BreakTask(task_name='break',
+                                                 condition='{Test_value} == 5')
+                                       )
+        folder = os.path.dirname(__file__)
+        save = SaveFileTask(task_name='save', folder=folder,
+                            filename='resume.dat', header='resume',
+                            saved_values=[('x', '{Test_value}')])
+        self.task.children_task.append(save)
+        root = self.root
+        root.checkpoint_interval = 1e-9
+        root.checkpoint_path = os.path.join(folder, 'loop.ckpt')
+
+        root.task_database.prepare_for_running()
+
+        try:
+            self.task.perform()
+            save.file_object.close()
+
+            del self.task.children_task[0]
+            root.load_checkpoint()
+            self.task.perform()
+            save.file_object.close()
+
+            with open(os.path.join(folder, 'resume.dat')) as f:
+                lines = f.read().split('\n')
+            assert_equal(lines[:2], ['# resume', 'x'])
+            assert_equal([float(l) for l in lines[2:-1]], range(11))
+        finally:
+            os.remove(root.checkpoint_path)
+            os.remove(os.path.join(folder, 'resume.dat'))
+
+    def test_checkpoint_wait_pools(self):
+        # Test that the checkpoints are saved once the parallel tasks of the
+        # previous iteration are over.
+        interface = IterableLoopInterface()
+        interface.iterable = 'range(5)'
+        self.task.interface = interface
+        par = CheckTask(task_name='par', time=0.05,
+                        parallel={'activated': True, 'pool': 'test'})
+        state = PoolStateTask(task_name='state')
+        self.task.children_task.extend([par, state])
+        root = self.root
+        root.checkpoint_interval = 1e-9
+        root.checkpoint_path = os.path.join(os.path.dirname(__file__),
+                                            'loop.ckpt')
+
+        root.task_database.prepare_for_running()
+
+        try:
+            self.task.perform()
+            assert_equal(len(state.busy_at_checkpoint), 4)
+            assert_false(any(state.busy_at_checkpoint))
+            assert_equal(par.perform_called, 5)
+        finally:
+            root.threads['test'].shutdown()
+            os.remove(root.checkpoint_path)
+
+    def test_perform_adaptive(self):
+        # Test performing an adaptive loop refining around a narrow peak.
+        interface = AdaptiveLoopInterface()
+        interface.initial_points = '11'
+        interface.max_points = '41'
+        interface.criterion = 'curvature'
+        interface.observable = '1/(1 + (({Test_value} - 0.37)/0.01)**2)'
+        self.task.interface = interface
+        check = CheckTask(task_name='check')
+        self.task.children_task.append(check)
+
+        self.root.task_database.prepare_for_running()
+
+        self.task.perform()
+        assert_equal(check.perform_called, 41)
+        assert_equal(self.root.get_from_database('Test_index'), 41)
+        # Most of the points inserted after the initial grid are close to the
+        # peak.
+        value = self.root.get_from_database('Test_value')
+        assert_true(abs(value - 0.37) < 0.05)
+        assert_false(self.root.sweeps)
+
+    def test_perform_adaptive_min_step(self):
+        # Test an adaptive loop whose refinement is stopped by the minimal
+        # step before reaching the maximal number of points.
+        interface = AdaptiveLoopInterface()
+        interface.initial_points = '11'
+        interface.max_points = '101'
+        interface.min_step = '0.04'
+        interface.observable = '{Test_value}**2'
+        self.task.interface = interface
+        save = SaveTask(task_name='save', saving_target='Array',
+                        array_size='{Test_point_number}',
+                        saved_values=[('x', '{Test_value}')])
+        self.task.children_task.append(save)
+
+        self.root.task_database.prepare_for_running()
+
+        self.task.perform()
+        assert_equal(self.root.get_from_database('Test_point_number'), 21)
+        assert_equal(len(save.array), 101)
+        assert_equal(save.line_index, 21)
+        assert_false(numpy.isnan(save.array['x'][:21]).any())
+        assert_true(numpy.isnan(save.array['x'][21:]).all())
+
     def test_perform_task1(self):
         # Test performing a loop with an embedded task no timing.
         interface = IterableLoopInterface()
@@ -4,8 +4,15 @@
 # author : Matthieu Dartiailh
 # license : MIT license
 # =============================================================================
-from hqc_meas.tasks.api import RootTask, SimpleTask, ComplexTask
-from nose.tools import assert_equal, assert_is, assert_raises, assert_not_in
+from hqc_meas.tasks.api import (RootTask, SimpleTask, ComplexTask,
+                                InstrumentTask)
+from hqc_meas.instruments.driver_tools import InstrIOError
+from nose.tools import (assert_equal, assert_is, assert_raises, assert_not_in,
+                        assert_true, assert_false, assert_in)
+from tempfile import gettempdir
+from threading import Lock
+from time import sleep
+from timeit import default_timer
 
 from ..util import complete_line
 
@@ -243,3 +250,123 @@ def test_ex_access_handling7():
     assert_equal(task2.get_from_database('task4_val2'), 'r')
     task3.remove_access_exception('task4_val2')
     assert_not_in('task4_val2', task2.access_exs)
+
+
+def test_entry_accessor1():
+    # Test that in running mode the accessors to the task entries are cached
+    # and used by write_in_database and get_from_database.
+    root = RootTask()
+    task1 = SimpleTask(task_name='task1',
+                       task_database_entries={'val1': 2.0})
+    root.children_task.append(task1)
+
+    task1.write_in_database('val1', 1.0)
+    assert_not_in('val1', task1._entry_accessors)
+
+    root.task_database.prepare_for_running()
+    task1.write_in_database('val1', 3.0)
+    accessor = task1._entry_accessors['val1']
+    assert_is(task1.entry_accessor('val1'), accessor)
+    assert_equal(accessor.read(), 3.0)
+    assert_equal(root.get_from_database('task1_val1'), 3.0)
+    assert_equal(root._read_accessors['task1_val1'].index, accessor.index)
+
+
+def test_batch_build():
+    # Test deferring the registration of the children added in a batch.
+    root = RootTask()
+    task1 = ComplexTask(task_name='task1')
+    task2 = SimpleTask(task_name='task2',
+                       task_database_entries={'val2': 'r'})
+    task3 = SimpleTask(task_name='task3',
+                       task_database_entries={'val3': 1})
+    with root.batch_build():
+        root.children_task.append(task1)
+        task1.children_task.append(task2)
+        task1.access_exs = ['task2_val2']
+        with task1.batch_build():
+            root.children_task.append(task3)
+        assert_raises(KeyError, root.get_from_database, 'task3_val3')
+        assert_equal(root._batch_added, [task1, task2, task3])
+
+    assert_equal(root.get_from_database('task2_val2'), 'r')
+    assert_equal(root.get_from_database('task3_val3'), 1)
+    assert_equal(root.task_preferences['children_task_0']
+                 ['children_task_0']['task_name'], 'task2')
+    assert_equal(root.task_preferences['children_task_1']['task_name'],
+                 'task3')
+
+    # Removing a child registers the pending ones first.
+    task4 = SimpleTask(task_name='task4',
+                       task_database_entries={'val4': 2})
+    with root.batch_build():
+        task1.children_task.append(task4)
+        root.children_task.remove(task3)
+        assert_equal(task4.get_from_database('task4_val4'), 2)
+    assert_raises(KeyError, root.get_from_database, 'task3_val3')
+
+    # Rebuilding from the config.
+    root.update_preferences_from_members()
+    config = root.task_preferences.dict()
+    del config['task_class']
+    dependencies = {'tasks': {'ComplexTask': ComplexTask,
+                              'SimpleTask': SimpleTask}}
+    rebuilt = RootTask.build_from_config(config, dependencies)
+    assert_equal(rebuilt.task_preferences.dict(),
+                 root.task_preferences.dict())
+    task = rebuilt.children_task[0].children_task[0]
+    assert_equal(task.task_path, 'root/task1')
+    assert_is(task.root_task, rebuilt)
+
+
+class ConnectionCounter(object):
+    """ False driver counting the opened connections.
+
+    """
+    opened = []
+
+    lock = Lock()
+
+    def __init__(self, config):
+        sleep(config)
+        with self.lock:
+            self.opened.append(self)
+        self.closed = False
+
+    def close_connection(self):
+        self.closed = True
+
+
+def test_instruments_check():
+    # Test that each profile is tested once, concurrently and with a timeout.
+    root = RootTask(instr_test_timeout=0.3, default_path=gettempdir())
+    root.run_time = {'drivers': {'Counter': ConnectionCounter},
+                     'profiles': {'p1': 0.1, 'p2': 0.1, 'slow': 1.0}}
+    tasks = [InstrumentTask(task_name='t{}'.format(i),
+                            selected_driver='Counter',
+                            selected_profile=profile)
+             for i, profile in enumerate(['p1', 'p2', 'p1', 'slow'])]
+    root.children_task.extend(tasks)
+    del ConnectionCounter.opened[:]
+
+    tic = default_timer()
+    test, traceback = root.check(test_instr=True)
+    assert_true(default_timer() - tic < 0.6)
+    assert_false(test)
+    assert_equal(list(traceback), ['root/t3'])
+    assert_equal(len(ConnectionCounter.opened), 2)
+    assert_true(all(instr.closed for instr in ConnectionCounter.opened))
+    assert_false(root._checked_instrs)
+
+    # The connection which timed out is closed once established.
+    sleep(0.8)
+    assert_equal(len(ConnectionCounter.opened), 3)
+    assert_true(ConnectionCounter.opened[-1].closed)
+
+    # Outside of the root checks the tasks test their instrument.
+    assert_true(tasks[0].check(test_instr=True)[0])
+    assert_equal(len(ConnectionCounter.opened), 4)
+    root.check_instruments()
+    assert_in(('p2', 'Counter'), root._checked_instrs)
+    assert_raises(InstrIOError, root.checked_instrument, 'slow', 'Counter')
+    root.release_checked_instruments()
@@ -6,7 +6,9 @@
 # =============================================================================
 from nose.tools import (raises, assert_equal, assert_false, assert_true,
                         assert_raises)
-from hqc_meas.tasks.tools.task_database import TaskDatabase
+from threading import Thread, Lock
+import os
+from hqc_meas.tasks.tools.task_database import TaskDatabase, _LAYOUTS_CACHE
 
 from ..util import complete_line
 
@@ -257,3 +259,284 @@ def test_get_set_on_flat_database3():
 
     assert_false(database.set_value('root/node1', 'val2', 2))
     assert_equal(database.get_value('root/node1', 'val2'), 2)
+
+
+def test_slots_versions_on_flat_database():
+    # Test that each write increments only the version of the written entry.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+
+    database.prepare_for_running()
+    assert_equal(database.get_versions_by_index([0, 1]), [0, 0])
+    database.set_value('root', 'val1', 2)
+    database.set_value('root', 'val1', 3)
+    assert_equal(database.get_versions_by_index([0, 1]), [2, 0])
+
+
+def test_snapshot_on_flat_database():
+    # Test that reading several entries while another thread is writing them
+    # returns a consistent snapshot.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 0)
+    database.set_value('root', 'val2', 0)
+
+    database.prepare_for_running()
+    i1, i2 = [database.get_entries_indexes('root', [e])[e]
+              for e in ('val1', 'val2')]
+
+    def writer():
+        for i in range(1, 20001):
+            database.set_value('root', 'val2', i)
+            database.set_value('root', 'val1', i)
+
+    thread = Thread(target=writer)
+    thread.start()
+    while thread.is_alive():
+        val1, val2 = database.get_values_by_index([i1, i2])
+        assert_true(val1 <= val2 <= val1 + 1)
+    thread.join()
+
+
+def test_entry_accessor1():
+    # Test accessing an entry through an accessor in edition mode.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+
+    accessor = database.get_entry_accessor('root/node1', 'val1')
+    assert_equal(accessor.read(), 1)
+    assert_true(accessor.write(2))
+    assert_equal(database.get_value('root/node1', 'val1'), 2)
+
+
+def test_entry_accessor2():
+    # Test accessing an entry through an accessor in running mode.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    notifications = []
+    database.observe('notifier',
+                     lambda change: notifications.append(change['value']))
+
+    database.prepare_for_running()
+    accessor = database.get_entry_accessor('root/node1', 'val1')
+    assert_equal(accessor.index, 0)
+    assert_equal(accessor.read(), 1)
+    assert_false(accessor.write(2))
+    assert_equal(database.get_value('root', 'val1'), 2)
+    assert_equal(notifications, [('root/val1', 2)])
+
+    assert_raises(KeyError, database.get_entry_accessor, 'root', 'val2')
+
+
+def test_watched_entries():
+    # Test that in running mode only the watched entries are notified.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.set_value('root/node1', 'val3', 2.0)
+    notifications = []
+    database.observe('notifier',
+                     lambda change: notifications.append(change['value']))
+
+    database.watch_entries(['root/node1/val2'])
+    database.prepare_for_running()
+    database.set_value('root', 'val1', 2)
+    database.set_value('root/node1', 'val2', 'b')
+    assert_equal(notifications, [('root/node1/val2', 'b')])
+
+    database.watch_entries(['root/val1'])
+    database.set_value('root', 'val1', 3)
+    database.set_value('root/node1', 'val3', 3.0)
+    assert_equal(notifications, [('root/node1/val2', 'b'), ('root/val1', 3)])
+    assert_equal(database.get_value('root/node1', 'val3'), 3.0)
+
+
+def test_numeric_layout():
+    # Test storing the numeric scalars in a contiguous buffer.
+    database = TaskDatabase(numeric_layout=True)
+    database.set_value('root', 'val1', 1.0)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 2)
+    database.set_value('root/node1', 'val3', 'a')
+    database.set_value('root/node1', 'val4', 1j)
+
+    database.prepare_for_running()
+    assert_equal(database._numeric_buffer.nbytes, 32)
+    with assert_raises(RuntimeError):
+        database.numeric_layout = False
+    assert_true(database.numeric_layout)
+    assert_equal(database.get_value('root', 'val1'), 1.0)
+    assert_equal(database.get_value('root/node1', 'val4'), 1j)
+    snapshot = database.get_snapshot()
+
+    database.set_value('root', 'val1', 2.0)
+    database.set_value('root/node1', 'val2', 'b')
+    indexes = database.get_entries_indexes('root/node1',
+                                           ['val1', 'val2', 'val3', 'val4'])
+    ordered = [indexes[e] for e in ('val1', 'val2', 'val3', 'val4')]
+    assert_equal(database.get_values_by_index(ordered), [2.0, 'b', 'a', 1j])
+
+    old_values = database.expand_snapshot(snapshot)
+    assert_equal([old_values[i] for i in ordered], [1.0, 2, 'a', 1j])
+
+
+def test_entry_history():
+    # Test keeping the last values written to an entry.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1.0)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.add_access_exception('root', 'val2', 'root/node1')
+    database.enable_history('root/val1', 4)
+    database.enable_history('root/node1/val2', 2)
+    assert_raises(ValueError, database.enable_history, 'root/val1', 0)
+
+    database.prepare_for_running()
+    for i in range(10):
+        database.set_value('root', 'val1', float(i))
+    timestamps, values = database.get_history('root/val1')
+    assert_equal(list(values), [6.0, 7.0, 8.0, 9.0])
+    assert_true(all(timestamps[1:] >= timestamps[:-1]))
+    assert_equal(list(database.get_history('root/val1', 7, 9)[1]), [7.0, 8.0])
+    assert_equal(list(database.get_history('root/val1', -2)[1]), [8.0, 9.0])
+    assert_raises(IndexError, database.get_history, 'root/val1', 2)
+
+    database.set_value('root/node1', 'val2', 'b')
+    assert_equal(list(database.get_history('root/val2')[1]), ['b'])
+    assert_raises(KeyError, database.get_history, 'root/val3')
+
+
+def test_access_exceptions_layout():
+    # Test that chained access exceptions are resolved in running mode.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.create_node('root/node1', 'node2')
+    database.set_value('root/node1/node2', 'val2', 'a')
+    database.add_access_exception('root/node1', 'val2', 'root/node1/node2')
+    database.add_access_exception('root', 'val2', 'root/node1')
+    database.prepare_for_running()
+
+    assert_equal(database.get_value('root', 'val2'), 'a')
+    assert_equal(database.get_value('root/node1', 'val2'), 'a')
+    assert_equal(database.get_value('root', 'val1'), 1)
+
+
+def test_layout_cache():
+    # Test that the flat layout of identical databases is computed once.
+    def build_database(extra=None):
+        database = TaskDatabase()
+        database.set_value('root', 'val1', 1)
+        database.create_node('root', 'node1')
+        database.create_node('root/node1', 'node2')
+        database.set_value('root/node1/node2', 'val2', 'a')
+        database.set_value('root/node1/node2', 'val3', 2.0)
+        database.add_access_exception('root/node1', 'val2',
+                                      'root/node1/node2')
+        database.add_access_exception('root', 'val2', 'root/node1')
+        if extra:
+            extra(database)
+        database.prepare_for_running()
+        return database
+
+    del _LAYOUTS_CACHE[:]
+    database1 = build_database()
+    database2 = build_database()
+    assert_equal(len(_LAYOUTS_CACHE), 1)
+    assert_equal(database1._entry_index_map, database2._entry_index_map)
+    assert_equal(database2.get_value('root', 'val2'), 'a')
+    assert_equal(database2.get_value('root/node1/node2', 'val3'), 2.0)
+
+    # An entry replaced by a node with the same name.
+    def replace_entry(database):
+        database.delete_value('root/node1/node2', 'val3')
+        database.create_node('root/node1/node2', 'val3')
+        database.set_value('root/node1/node2/val3', 'val4', 3)
+
+    database3 = build_database(replace_entry)
+    assert_equal(len(_LAYOUTS_CACHE), 2)
+    assert_equal(database3.get_value('root/node1/node2/val3', 'val4'), 3)
+    assert_raises(KeyError, database3.get_value, 'root/node1/node2', 'val3')
+
+    # A different access exception.
+    def move_exception(database):
+        database.remove_access_exception('root', 'val2')
+        database.add_access_exception('root', 'val3', 'root/node1/node2')
+
+    database4 = build_database(move_exception)
+    assert_equal(len(_LAYOUTS_CACHE), 3)
+    assert_equal(database4.get_value('root', 'val3'), 2.0)
+    assert_raises(KeyError, database4.get_value, 'root', 'val2')
+
+
+def test_edition_caches():
+    # Test that the nodes index and the cached accessible entries are
+    # discarded when the database is modified.
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1)
+    database.create_node('root', 'node1')
+    database.create_node('root/node1', 'node2')
+    database.set_value('root/node1/node2', 'val2', 'a')
+    assert_equal(database.list_accessible_entries('root/node1/node2'),
+                 ['val1', 'val2'])
+    assert_true(database._node_index)
+
+    database.set_value('root/node1', 'val3', 2)
+    assert_equal(database.list_accessible_entries('root/node1/node2'),
+                 ['val1', 'val2', 'val3'])
+
+    database.rename_node('root', 'n_node1', 'node1')
+    assert_raises(ValueError, database.get_value, 'root/node1/node2', 'val2')
+    assert_equal(database.get_value('root/n_node1/node2', 'val2'), 'a')
+    assert_equal(database.list_accessible_entries('root/n_node1'),
+                 ['val1', 'val3'])
+
+    database.add_access_exception('root', 'val3', 'root/n_node1')
+    assert_equal(database.list_accessible_entries('root'), ['val1', 'val3'])
+
+    database.excluded = ['val1']
+    assert_equal(database.list_accessible_entries('root'), ['val3'])
+    database.excluded.append('val3')
+    assert_equal(database.list_accessible_entries('root'), [])
+    database.excluded.remove('val3')
+    assert_equal(database.list_accessible_entries('root'), ['val3'])
+
+    database.delete_node('root/n_node1', 'node2')
+    assert_raises(ValueError, database.list_accessible_entries,
+                  'root/n_node1/node2')
+
+
+def test_checkpoint():
+    # Test saving and restoring the flat database.
+    path = os.path.join(os.path.dirname(__file__), 'test.ckpt')
+    database = TaskDatabase()
+    database.set_value('root', 'val1', 1.0)
+    database.create_node('root', 'node1')
+    database.set_value('root/node1', 'val2', 'a')
+    database.set_value('root/node1', 'val3', Lock())
+    assert_raises(RuntimeError, database.save_checkpoint, path)
+
+    database.prepare_for_running()
+    database.set_value('root', 'val1', 2.0)
+    try:
+        database.save_checkpoint(path, {'test': 1})
+
+        database = TaskDatabase()
+        database.set_value('root', 'val1', 1.0)
+        database.set_value('root', 'val4', 1.0)
+        database.create_node('root', 'node1')
+        database.set_value('root/node1', 'val2', 'b')
+        database.set_value('root/node1', 'val3', None)
+        database.prepare_for_running()
+        assert_equal(database.load_checkpoint(path), {'test': 1})
+        assert_equal(database.get_value('root', 'val1'), 2.0)
+        assert_equal(database.get_value('root/node1', 'val2'), 'a')
+        assert_equal(database.get_value('root/node1', 'val3'), None)
+        assert_equal(database.get_value('root', 'val4'), 1.0)
+    finally:
+        os.remove(path)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# =============================================================================
+# module : test_database_journal.py
+# author : Matthieu Dartiailh
+# license : MIT license
+# =============================================================================
+from nose.tools import assert_equal, assert_true, assert_raises
+import os
+from time import time
+
+from hqc_meas.tasks.tools.task_database import TaskDatabase
+from hqc_meas.tasks.tools import database_journal
+from hqc_meas.tasks.tools.database_journal import (read_journal,
+                                                   replay_journal,
+                                                   RECORD_HEADER)
+
+from ..util import complete_line
+
+
+JOURNAL_PATH = os.path.join(os.path.dirname(__file__), 'test.journal')
+
+
+def setup_module():
+    print complete_line(__name__ + ': setup_module()', '~', 78)
+
+
+def teardown_module():
+    print complete_line(__name__ + ': teardown_module()', '~', 78)
+
+
+class TestDatabaseJournal(object):
+
+    def setup(self):
+        self.database = TaskDatabase()
+        self.database.set_value('root', 'val1', 1.0)
+        self.database.create_node('root', 'node1')
+        self.database.set_value('root/node1', 'val2', 'a')
+
+    def teardown(self):
+        self.database.stop_journal()
+        if os.path.isfile(JOURNAL_PATH):
+            os.remove(JOURNAL_PATH)
+
+    def test_edition_mode(self):
+        assert_raises(RuntimeError, self.database.start_journal,
+                      JOURNAL_PATH)
+
+    def test_record_and_replay(self):
+        database = self.database
+        database.prepare_for_running()
+        database.start_journal(JOURNAL_PATH)
+        database.set_value('root', 'val1', 2.0)
+        middle = time()
+        database.set_value('root', 'val1', 3)
+        database.set_value('root/node1', 'val2', {'b': 1j})
+        database.stop_journal()
+
+        header, records = read_journal(JOURNAL_PATH)
+        assert_equal(sorted(header['paths']),
+                     ['root/node1/val2', 'root/val1'])
+        assert_equal([r[3] for r in records], [2.0, 3, {'b': 1j}])
+        assert_equal([r[2] for r in records], [2, 4, 2])
+        assert_true(all(records[i][0] <= records[i+1][0] for i in range(2)))
+
+        assert_equal(replay_journal(JOURNAL_PATH),
+                     {'root/val1': 3, 'root/node1/val2': {'b': 1j}})
+        assert_equal(replay_journal(JOURNAL_PATH, middle),
+                     {'root/val1': 2.0, 'root/node1/val2': 'a'})
+
+    def test_growth_and_crash(self):
+        # Force the file to be remapped and read it without closing the
+        # journal as would happen after a crash.
+        old_size = database_journal.CHUNK_SIZE
+        database_journal.CHUNK_SIZE = 64
+        try:
+            database = self.database
+            database.prepare_for_running()
+            database.start_journal(JOURNAL_PATH)
+            for i in range(100):
+                database.set_value('root', 'val1', float(i))
+            database._journal._map.flush()
+            values = replay_journal(JOURNAL_PATH)
+            assert_equal(values['root/val1'], 99.0)
+        finally:
+            database_journal.CHUNK_SIZE = old_size
+
+    def test_incomplete_records(self):
+        database = self.database
+        database.prepare_for_running()
+        database.start_journal(JOURNAL_PATH)
+        journal = database._journal
+        start = journal.used
+        for i in range(4):
+            database.set_value('root/node1', 'val2', {'i': i})
+        # All the records have the same size.
+        size = (journal.used - start)/4
+        last = journal.used - size
+
+        # A record which cannot be decoded ends the journal.
+        payload = last + RECORD_HEADER.size
+        journal._map[payload:journal.used] = '\xff'*(size -
+                                                    RECORD_HEADER.size)
+        journal._map.flush()
+        _, records = read_journal(JOURNAL_PATH)
+        assert_equal([r[3] for r in records], [{'i': i} for i in range(3)])
+
+        # So does a record whose marker was not written yet.
+        journal._map[last - size] = chr(0)
+        journal._map.flush()
+        assert_equal(replay_journal(JOURNAL_PATH)['root/node1/val2'],
+                     {'i': 1})
@@ -4,14 +4,15 @@
 # author : Matthieu Dartiailh
 # license : MIT license
 # =============================================================================
-from hqc_meas.tasks.api import RootTask
-from nose.tools import assert_true, assert_false
+from hqc_meas.tasks.api import RootTask, ComplexTask
+from hqc_meas.tasks.tasks_util.sleep_task import SleepTask
+from nose.tools import assert_true, assert_false, assert_equal, assert_in
 from multiprocessing import Event
 from threading import Thread
-from time import sleep
+from time import sleep, time
 
 from ..util import complete_line
-from.testing_utilities import CheckTask, ExceptionTask
+from.testing_utilities import CheckTask, ExceptionTask, StringCheckTask
 
 
 def setup_module():
@@ -22,6 +23,20 @@ def teardown_module():
     print complete_line(__name__ + ': teardown_module()', '~', 78)
 
 
+class DeclaredReadsTask(CheckTask):
+    """ Task reading an entry not referred to in its strings.
+
+    """
+    database_reads = ('a_val',)
+
+
+class UnknownReadsTask(CheckTask):
+    """ Task which may read any entry.
+
+    """
+    database_reads = None
+
+
 class TestTaskExecution(object):
 
     def setup(self):
@@ -130,6 +145,155 @@ class TestTaskExecution(object):
         assert_false(root.threads['test'])
         assert_true(root.threads['aux'])
 
+    def test_execution_plan(self):
+        # Test that plain complex tasks are flattened in the execution plan.
+        root = self.root
+        a = CheckTask(task_name='a')
+        b = CheckTask(task_name='b')
+        b.parallel = {'activated': True, 'pool': 'test'}
+        c = CheckTask(task_name='c', stoppable=False)
+        comp = ComplexTask(task_name='comp')
+        comp.children_task.extend([a, b])
+        root.children_task.extend([comp, c])
+
+        plan = root.compile_plan()
+        assert_equal([op[2] for op in plan], [a, b, c])
+        assert_equal([op[0] for op in plan], [True, False, False])
+        assert_true(plan[1][1] is b.perform_)
+
+        root.perform()
+        assert_true(a.perform_called and b.perform_called and
+                    c.perform_called)
+        assert_true(root._plan is None and comp._plan is None)
+
+    def test_profiling(self):
+        # Test recording the time spent in each task.
+        root = self.root
+        root.profiling = True
+        a = CheckTask(task_name='a')
+        comp = ComplexTask(task_name='comp')
+        comp.children_task.append(CheckTask(task_name='b'))
+        root.children_task.extend([a, comp])
+
+        root.perform()
+        records = root.profiler.records
+        assert_equal(records['root/a'].calls, 1)
+        assert_equal(records['root/comp/b'].calls, 1)
+        assert_true(records['root/a'].total >= a.time)
+        assert_in('root/comp/b', root.profiler.report())
+        assert_true(a._base_perform() is CheckTask.perform.__func__)
+
+    def test_cooperative(self):
+        # Test overlapping the waits of parallel tasks in a single thread.
+        root = self.root
+        root.cooperative = True
+        sleeps = [SleepTask(task_name='s{}'.format(i), time=0.1,
+                            wait={}, parallel={'activated': True,
+                                               'pool': 'sleep'})
+                  for i in range(3)]
+        aux = CheckTask(task_name='aux')
+        aux.wait = {'activated': True, 'wait': ['sleep']}
+        root.children_task.extend(sleeps + [aux])
+
+        tic = time()
+        root.perform()
+        assert_true(time() - tic < 0.25)
+        assert_true(aux.perform_called)
+        assert_false(root.threads['sleep']._workers)
+        assert_true(root.scheduler is None)
+
+    def test_cooperative_profiling(self):
+        # Test profiling the tasks executed as coroutines.
+        root = self.root
+        root.cooperative = True
+        root.profiling = True
+        sleeps = [SleepTask(task_name='s{}'.format(i), time=0.1,
+                            wait={}, parallel={'activated': True,
+                                               'pool': 'sleep'})
+                  for i in range(2)]
+        aux = CheckTask(task_name='aux')
+        aux.wait = {'activated': True, 'wait': ['sleep']}
+        root.children_task.extend(sleeps + [aux])
+
+        root.perform()
+        records = root.profiler.records
+        for i in range(2):
+            record = records['root/s{}'.format(i)]
+            assert_equal(record.calls, 1)
+            assert_true(record.total >= 0.1)
+        assert_in('root/s1', root.profiler.report())
+
+    def test_auto_parallel(self):
+        # Test executing the independent children concurrently.
+        root = self.root
+        a = CheckTask(task_name='a', time=0.1,
+                      task_database_entries={'val': 1})
+        b = CheckTask(task_name='b', time=0.1,
+                      task_database_entries={'val': 2})
+        c = StringCheckTask(task_name='c', string='{a_val}', time=0.1)
+        d = CheckTask(task_name='d', wait={'activated': True})
+        comp = ComplexTask(task_name='comp', auto_parallel=True)
+        comp.children_task.extend([a, b, c, d])
+        root.children_task.append(comp)
+        root.task_database.prepare_for_running()
+
+        tic = time()
+        root.perform()
+        assert_true(time() - tic < 0.28)
+        assert_true(all(t.perform_called for t in (a, b, c, d)))
+        assert_true(comp._graph is None)
+
+        root._compile_plans()
+        assert_equal(comp._graph, (((), (), (0,), (1, 2)), frozenset([3])))
+        assert_equal([op[2] for op in root._plan], [comp])
+        root._compile_plans(clear=True)
+
+    def test_auto_parallel_reads(self):
+        # Test the ordering of the tasks declaring their reads or not.
+        root = self.root
+        a = CheckTask(task_name='a', task_database_entries={'val': 1})
+        b = CheckTask(task_name='b')
+        c = DeclaredReadsTask(task_name='c')
+        d = UnknownReadsTask(task_name='d')
+        e = CheckTask(task_name='e')
+        comp = ComplexTask(task_name='comp', auto_parallel=True)
+        comp.children_task.extend([a, b, c, d, e])
+        root.children_task.append(comp)
+        root.task_database.prepare_for_running()
+        root.analyse_dependencies()
+
+        root._compile_plans()
+        assert_equal(comp._graph, (((), (), (0,), (1, 2), (3,)),
+                                   frozenset([3])))
+        root._compile_plans(clear=True)
+
+    def test_auto_parallel_pause(self):
+        # Test pausing while the children are executed concurrently.
+        root = self.root
+        comp = ComplexTask(task_name='comp', auto_parallel=True)
+        branches = []
+        for i in range(2):
+            branch = ComplexTask(task_name='branch{}'.format(i))
+            branch.children_task.extend(
+                [CheckTask(task_name='b{}_{}'.format(i, j), time=0.05)
+                 for j in range(10)])
+            branches.append(branch)
+        comp.children_task.extend(branches)
+        root.children_task.append(comp)
+        root.task_database.prepare_for_running()
+
+        t = Thread(target=root.perform)
+        t.start()
+        sleep(0.1)
+        root.should_pause.set()
+        assert_true(root.paused.wait(1))
+        assert_equal(root.execution_state, 'PAUSED')
+        root.should_pause.clear()
+        t.join()
+
+        assert_true(all(task.perform_called for branch in branches
+                        for task in branch.children_task))
+
     def test_stop(self):
         # Test stopping the execution.
         root = self.root
@@ -169,6 +333,59 @@ class TestTaskExecution(object):
         assert_true(par2.perform_called)
         assert_true(root.resume.is_set())
 
+    def test_pause3(self):
+        # Test pausing, resuming and stopping through the wake up event.
+        root = self.root
+        root.wake_up = Event()
+        par = CheckTask(task_name='test', time=0.1)
+        par2 = CheckTask(task_name='test2', time=0.1)
+        par3 = CheckTask(task_name='test3', time=0.1)
+        root.children_task.extend([par, par2, par3])
+
+        t = Thread(target=root.perform)
+        t.start()
+        sleep(0.01)
+        root.should_pause.set()
+        root.wake_up.set()
+        assert_true(root.paused.wait(1))
+        assert_equal(root.execution_state, 'PAUSED')
+        root.should_pause.clear()
+        root.wake_up.set()
+        assert_true(root.resume.wait(1))
+        root.should_stop.set()
+        root.wake_up.set()
+        t.join()
+
+        assert_true(par2.perform_called)
+        assert_false(par3.perform_called)
+        assert_equal(root.execution_state, 'IDLE')
+
+    def test_pause_wait(self):
+        # Test pausing while a task waits on a busy pool.
+        root = self.root
+        comp = ComplexTask(task_name='comp',
+                           parallel={'activated': True, 'pool': 'test'})
+        subs = [CheckTask(task_name='sub{}'.format(i), time=0.05)
+                for i in range(20)]
+        comp.children_task.extend(subs)
+        waiter = CheckTask(task_name='waiter',
+                           wait={'activated': True, 'wait': ['test']})
+        root.children_task.extend([comp, waiter])
+
+        t = Thread(target=root.perform)
+        t.start()
+        sleep(0.1)
+        root.should_pause.set()
+        assert_true(root.paused.wait(1))
+        assert_equal(root.execution_state, 'PAUSED')
+        assert_false(waiter.perform_called)
+        assert_false(all(sub.perform_called for sub in subs))
+        root.should_pause.clear()
+        t.join()
+
+        assert_true(all(sub.perform_called for sub in subs))
+        assert_true(waiter.perform_called)
+
     def test_pause2(self):
         # Test pausing and stopping the execution.
         root = self.root
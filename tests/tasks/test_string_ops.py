@@ -4,9 +4,14 @@
 # author : Matthieu Dartiailh
 # license : MIT license
 #==============================================================================
-from nose.tools import assert_in, assert_equal, assert_false, assert_true
-from hqc_meas.tasks.base_tasks import RootTask
+from nose.tools import (assert_in, assert_equal, assert_false, assert_true,
+                        assert_raises)
+from atom.api import Str
+from hqc_meas.tasks import base_tasks
+from hqc_meas.tasks.base_tasks import RootTask, ComplexTask, SimpleTask
+from hqc_meas.tasks.tools.string_evaluation import is_constant, safe_eval
 from math import cos
+import os
 import numpy
 from numpy.testing import assert_array_equal
 from ..util import complete_line
@@ -20,6 +25,16 @@ def teardown_module():
     print complete_line(__name__ + ': teardown_module()', '~', 78)
 
 
+class StringTask(SimpleTask):
+    """ Task holding a string referring to database entries.
+
+    """
+    string = Str().tag(pref=True)
+
+    def check(self, *args, **kwargs):
+        return True, {}
+
+
 class TestFormatting(object):
 
     def setup(self):
@@ -182,3 +197,130 @@ class TestEvaluation(object):
         test = 'np.abs({val1})[{val2}]'
         formatted = self.root.format_and_eval_string(test)
         assert_equal(formatted, 2.0)
+
+    def test_eval_running_mode5(self):
+        # Test repeated entries, constant expressions and generators.
+        self.root.task_database.prepare_for_running()
+        test = '{val1}*{val2} + {val1}'
+        assert_equal(self.root.format_and_eval_string(test), 11.0)
+        assert_equal(self.root.format_and_eval_string('2*Pi'), 2*numpy.pi)
+        assert_equal(self.root.format_and_eval_string('toto'), 'toto')
+        test = 'sum({val1}*i for i in range(3))'
+        assert_equal(self.root.format_and_eval_string(test), 3)
+
+    def test_eval_sweep(self):
+        # Test evaluating expressions depending on a loop value over the whole
+        # sweep.
+        loop = ComplexTask(task_name='loop',
+                           task_database_entries={'index': 1, 'value': 0.0})
+        self.root.children_task.append(loop)
+        self.root.task_database.prepare_for_running()
+        values = numpy.linspace(0, 1, 11)
+        self.root.register_sweep(loop, values)
+
+        test = '{loop_value}**2*0.5'
+        test2 = 'cos({loop_value})'
+        for i, value in enumerate(values):
+            loop.write_in_database('index', i + 1)
+            loop.write_in_database('value', value)
+            assert_equal(self.root.format_and_eval_string(test), value**2*0.5)
+            assert_equal(self.root.format_and_eval_string(test2), cos(value))
+        assert_true(self.root._sweep_cache[test][1] is not None)
+        assert_true(self.root._sweep_cache[test2][1] is None)
+
+        self.root.unregister_sweep(loop)
+        loop.write_in_database('value', 2.0)
+        assert_equal(self.root.format_and_eval_string(test), 2.0)
+
+    def test_dependencies(self):
+        # Test recording the entries read by the tasks.
+        task = StringTask(task_name='task', string='{val1} and {val2}')
+        self.root.children_task.append(task)
+        self.root.task_database.prepare_for_running()
+        self.root.format_and_eval_string('2*{val1}')
+        self.root.check()
+        dependencies = self.root.database_dependencies
+        assert_equal(dependencies['root/Root'], set(['root/val1']))
+        assert_equal(dependencies['root/task'],
+                     set(['root/val1', 'root/node1/val2']))
+
+    def test_constant_folding(self):
+        # Test that only constant expressions are folded.
+        self.root.task_database.prepare_for_running()
+        assert_equal(self.root.format_and_eval_string('2*cos(Pi)'), -2)
+        test = 'np.random.rand()'
+        assert_true(self.root.format_and_eval_string(test) !=
+                    self.root.format_and_eval_string(test))
+
+    def test_shared_cache(self):
+        # Test that identical strings are compiled once for all tasks.
+        task = StringTask(task_name='task')
+        self.root.children_task.append(task)
+        self.root.task_database.prepare_for_running()
+        test = '{val1}/{val2}'
+        assert_equal(self.root.format_and_eval_string(test), 0.1)
+        assert_equal(task.format_and_eval_string(test), 0.1)
+        assert_true(task._eval_cache[test]() is
+                    self.root._eval_cache[test]())
+        cache = self.root.expression_cache
+        assert_equal((cache.hits, cache.misses), (1, 1))
+
+    def test_evicted_entries(self):
+        # Test that the entries discarded by the shared cache are not kept
+        # alive by the tasks.
+        self.root.expression_cache.size = 1
+        self.root.task_database.prepare_for_running()
+        assert_equal(self.root.format_and_eval_string('{val1} + 1'), 2)
+        assert_in('{val1} + 1', self.root._eval_cache)
+        assert_equal(self.root.format_and_eval_string('{val1} + 2'), 3)
+        assert_false('{val1} + 1' in self.root._eval_cache)
+        assert_equal(self.root.format_and_eval_string('{val1} + 1'), 2)
+        assert_equal(self.root.expression_cache.misses, 3)
+
+
+def test_parsed_strings_bound():
+    # Test that the cache of the parsed strings does not grow without bound.
+    cache = base_tasks._PARSED_STRINGS
+    old_size = cache.size
+    cache.size = 10
+    try:
+        root = RootTask()
+        for i in range(20):
+            root.format_string('parsed string {}'.format(i))
+        assert_equal(len(cache), 10)
+    finally:
+        cache.size = old_size
+
+def test_is_constant():
+    # Test detecting constant expressions.
+    assert_true(is_constant('2*cos(Pi) + 1'))
+    assert_true(is_constant('(1, 2)'))
+    assert_false(is_constant('np.random.rand()'))
+    assert_false(is_constant('[1, 2]'))
+    assert_false(is_constant('toto + 1'))
+    assert_false(is_constant('1 +'))
+
+
+def test_safe_eval():
+    # Test the restrictions on the evaluated expressions.
+    assert_equal(safe_eval('toto'), 'toto')
+    assert_equal(safe_eval(' a*2', {'a': 2}), 4)
+    assert_equal(safe_eval('[i**2 for i in range(a)]', {'a': 3}), [0, 1, 4])
+    assert_equal(safe_eval('np.abs(-1)'), 1)
+    assert_raises(SyntaxError, safe_eval, '().__class__')
+    assert_raises(SyntaxError, safe_eval, '__import__("os")')
+    assert_raises(SyntaxError, safe_eval, '(lambda: 1)()')
+    assert_raises(NameError, safe_eval, 'open("toto")')
+
+
+def test_safe_eval_modules():
+    # Test that the modules cannot be reached from the expressions.
+    assert_equal(safe_eval('np.linalg.norm(np.ones(4))'), 2.0)
+    assert_equal(safe_eval('[np for np in range(2)]'), [0, 1])
+    assert_raises(AttributeError, safe_eval,
+                  'np.sys.modules["os"].getpid()')
+    assert_raises(AttributeError, safe_eval,
+                  'np.ctypeslib.ctypes.CDLL(None)')
+    assert_raises(AttributeError, safe_eval, 'm.path', {'m': os})
+    assert_raises(SyntaxError, safe_eval, 'np.linspace.func_globals')
+    assert_raises(SyntaxError, safe_eval, '[1 for np.pi in [1]]')
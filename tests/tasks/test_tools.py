@@ -1,6 +1,24 @@
 # -*- coding: utf-8 -*-
-from nose.tools import assert_equal
+from threading import current_thread
+from time import sleep
+from nose.tools import (assert_equal, assert_true, assert_false,
+                        assert_is_instance, assert_raises)
+from cPickle import dumps, UnpicklingError
+import numpy as np
 from hqc_meas.tasks.tools.walks import flatten_walk
+from hqc_meas.tasks.tools.expression_cache import ExpressionCache
+from hqc_meas.tasks.tools.thread_pools import ThreadPool, current_future
+from hqc_meas.tasks.tools.dependency_graph import build_dependency_graph
+from hqc_meas.tasks.tools.adaptive_sampling import AdaptiveSampler
+from hqc_meas.tasks.tools.serialization import (task_state, dump_state,
+                                                load_state,
+                                                build_task_from_state,
+                                                dependencies_config, MAGIC)
+from hqc_meas.tasks.api import RootTask, ComplexTask
+from hqc_meas.tasks.tasks_logic.loop_task import LoopTask
+from hqc_meas.tasks.tasks_logic.loop_iterable_interface import \
+    IterableLoopInterface
+from hqc_meas.tasks.tasks_util.formula_task import FormulaTask
 
 
 def test_flatten_walk():
@@ -8,3 +26,138 @@ def test_flatten_walk():
             [{'e': 1, 'z': 5}, {'e': 2}, [{'x': 50}]]]
     flat = flatten_walk(walk, ['e', 'x'])
     assert_equal(flat, {'e': set((1, 2)), 'x': set([50])})
+
+
+def test_expression_cache():
+    cache = ExpressionCache(size=2)
+    assert_equal(cache.get('a'), None)
+    cache.add('a', 1, 0.5)
+    cache.add('b', 2, 0.25)
+    assert_equal(cache.get('a'), 1)
+    cache.add('c', 3)
+    assert_equal(cache.get('b'), None)
+    assert_equal(cache.get('c'), 3)
+    assert_equal(len(cache), 2)
+    assert_equal((cache.hits, cache.misses, cache.compile_time),
+                 (2, 2, 0.75))
+    assert_equal(cache.get_stats(), [('a', 1, 0.5), ('c', 1, 0.0)])
+    cache.clear()
+    assert_equal((len(cache), cache.hits), (0, 0))
+
+
+def test_thread_pool():
+    pool = ThreadPool(name='test', max_workers=1)
+    futures = [pool.submit(lambda x: x**2, i) for i in range(5)]
+    assert_equal([f.result() for f in futures], [0, 1, 4, 9, 16])
+
+    # A worker submitting to its saturated pool executes the work itself.
+    def nested():
+        return pool.submit(current_thread).result() is current_thread()
+    assert_true(pool.submit(nested).result())
+    assert_true(current_future() is None)
+
+    failed = pool.submit(lambda: 1/0)
+    failed.wait()
+    assert_is_instance(failed.exception, ZeroDivisionError)
+
+    # Waiting drains the pool and marks the works as waited for.
+    assert_true(pool)
+    pool.submit(sleep, 0.05)
+    assert_true(pool.busy())
+    assert_true(pool.wait())
+    assert_equal(pool.outstanding, 0)
+    assert_false(pool)
+
+    # A work waiting on its own pool does not wait for itself.
+    assert_true(pool.submit(pool.wait).result())
+    pool.shutdown()
+    assert_equal(len(pool._workers), 1)
+
+
+def test_dependency_graph():
+    # Test inferring the read after write, write after read, write after
+    # write and barrier dependencies.
+    accesses = [(set(), {'a'}, False),
+                (set(), {'b'}, False),
+                ({'a'}, set(), False),
+                (set(), {'a'}, False),
+                (set(), set(), True),
+                ({'b'}, set(), False),
+                (set(), {'c'}, False)]
+    graph = build_dependency_graph(accesses)
+    assert_equal(graph, ((), (), (0,), (0, 2), (1, 3), (4,), (4,)))
+
+
+def test_serialization():
+    root = RootTask(default_path=u'test', pool_workers=2)
+    root.parallel = {'activated': True, 'pool': 'a'}
+    complex = ComplexTask(task_name='comp', auto_parallel=True)
+    complex.children_task.append(FormulaTask(task_name='f',
+                                             formulas=[('v', '1.0')]))
+    root.children_task.append(complex)
+    loop = LoopTask(task_name='loop',
+                    interface=IterableLoopInterface(iterable='range(3)'))
+    loop.task = FormulaTask(task_name='g')
+    root.children_task.append(loop)
+
+    state = task_state(root)
+    data = dump_state(state)
+    assert_true(data.startswith(MAGIC))
+
+    dependencies = {'tasks': {'ComplexTask': ComplexTask,
+                              'FormulaTask': FormulaTask,
+                              'LoopTask': LoopTask},
+                    'interfaces': {'IterableLoopInterface':
+                                   IterableLoopInterface}}
+    rebuilt = build_task_from_state(load_state(data), dependencies, True)
+    assert_equal(task_state(rebuilt), state)
+    assert_equal(rebuilt.pool_workers, 2)
+    assert_equal(rebuilt.children_task[1].interface.iterable, 'range(3)')
+    assert_equal(rebuilt.task_database.list_all_entries(),
+                 root.task_database.list_all_entries())
+
+    config = dependencies_config(state)
+    assert_equal(config['children_task_1']['interface']['interface_class'],
+                 'IterableLoopInterface')
+    assert_equal(config['children_task_1']['task']['task_class'],
+                 'FormulaTask')
+
+    # Typed values are preserved.
+    values = load_state(dump_state({'a': np.arange(3.), 'b': set([1j])}))
+    np.testing.assert_array_equal(values['a'], np.arange(3.))
+    assert_equal(values['b'], set([1j]))
+
+    # Data which are not a state or would build arbitrary objects are
+    # rejected.
+    assert_raises(ValueError, load_state, 'Not a state')
+    assert_raises(ValueError, load_state, MAGIC + '\xff\x00')
+    assert_raises(UnpicklingError, load_state,
+                  MAGIC + '\x01\x00' + dumps(RootTask, 2))
+
+
+def test_adaptive_sampler():
+    # The value measured after each point is the one of the point.
+    current = [0.0]
+
+    def peak():
+        return 1/(1 + ((current[0] - 0.37)/0.01)**2)
+
+    for criterion in ('gradient', 'curvature'):
+        sampler = AdaptiveSampler(start=0.0, stop=1.0, initial_points=11,
+                                  max_points=60, criterion=criterion,
+                                  measure=peak)
+        assert_equal(len(sampler), 60)
+        for point in sampler:
+            current[0] = point
+
+        points = np.array(sampler.points)
+        assert_equal(len(points), 60)
+        assert_true((np.diff(points) > 0).all())
+        assert_true(np.sum(abs(points - 0.37) < 0.05) > 30)
+
+    # The refinement stops when no interval can be split without going below
+    # the minimal step.
+    sampler = AdaptiveSampler(start=0.0, stop=1.0, initial_points=3,
+                              max_points=50, min_step=0.2,
+                              measure=lambda: 0.0)
+    assert_equal(list(sampler), [0.0, 0.5, 1.0, 0.75, 0.25])
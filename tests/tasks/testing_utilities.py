@@ -6,7 +6,7 @@
 # =============================================================================
 """
 """
-from atom.api import Bool, Value, Int, Float
+from atom.api import Bool, Value, Int, Float, Str
 from hqc_meas.tasks.api import SimpleTask
 from time import sleep
 
@@ -23,6 +23,8 @@ class CheckTask(SimpleTask):
 
     time = Float(0.01)
 
+    database_reads = ()
+
     def check(self, *args, **kwargs):
 
         self.check_called = True
@@ -36,6 +38,13 @@ class CheckTask(SimpleTask):
         sleep(self.time)
 
 
+class StringCheckTask(CheckTask):
+    """
+    """
+
+    string = Str().tag(pref=True)
+
+
 class ExceptionTask(SimpleTask):
 
     def perform(self):
@@ -44,9 +53,4 @@ class ExceptionTask(SimpleTask):
 
 def join_threads(root):
     for pool_name in root.threads:
-        with root.threads.safe_access(pool_name) as pool:
-            for thread in pool:
-                try:
-                    thread.join()
-                except Exception:
-                    pass
+        root.threads[pool_name].wait()
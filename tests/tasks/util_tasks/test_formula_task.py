@@ -68,6 +68,19 @@ class TestFormulaTask(object):
         assert_equal(self.task.get_from_database('Test_1'), 2.0)
         assert_equal(self.task.get_from_database('Test_2'), 1.0)
 
+    def test_check_numpy(self):
+        # Test the numpy functions usable in formulas.
+        self.task.formulas = [('1', 'np.linspace(0, 1, 3)[1]'),
+                              ('2', 'np.percentile(np.arange(5), 50)'),
+                              ('3', 'np.loadtxt("data.txt")')]
+
+        test, traceback = self.task.check()
+        assert_false(test)
+        assert_equal(len(traceback), 1)
+        assert_in('loadtxt', traceback['root/Test-3'])
+        assert_equal(self.task.get_from_database('Test_1'), 0.5)
+        assert_equal(self.task.get_from_database('Test_2'), 2.0)
+
     def test_perform(self):
         # Test performing.
         self.task.formulas = [('1', '2.0'), ('2', "['a', 1.0]")]